@@ -0,0 +1,65 @@
+import sys
+import time
+import argparse
+import itertools
+
+import planetx_game.db_ops as db_ops
+from planetx_game.db_backends import MySQLBackend, SQLiteBackend
+from planetx_game.game_codes import GameCodeAllocator
+
+parser = argparse.ArgumentParser(description="Time a workload of uploading games, picking games and playing sessions against a database backend.")
+parser.add_argument("backend", choices=["sqlite", "mysql"], help="The backend to run the workload against. The workload adds games and sessions to the database.")
+parser.add_argument("-i", "--input", type=str, help="A file of encoded games, one per line, to upload", required=True)
+parser.add_argument("-p", "--path", type=str, default=":memory:", help="With sqlite, the database file (default: in memory)", required=False)
+parser.add_argument("-n", "--num-games", type=int, default=10000, help="The number of games to upload, repeating the file if needed (default: 10000)", required=False)
+parser.add_argument("--picks", type=int, default=10000, help="The number of random games to pick (default: 10000)", required=False)
+parser.add_argument("--sessions", type=int, default=200, help="The number of sessions to play (default: 200)", required=False)
+parser.add_argument("--players", type=int, default=4, help="The number of players in each session (default: 4)", required=False)
+parser.add_argument("--moves", type=int, default=20, help="The number of moves each player makes (default: 20)", required=False)
+
+def report(name, num_ops, start):
+    """
+    Prints the number of operations per second since start
+    """
+    elapsed = time.perf_counter() - start
+    print(name + ": " + str(num_ops) + " in " + str(round(elapsed, 3)) + "s (" +
+          str(round(num_ops / max(elapsed, 1e-9))) + "/s)", flush=True)
+
+if __name__ == "__main__":
+    args = parser.parse_args(sys.argv[1:])
+    if args.backend == "sqlite":
+        db_ops.set_backend(SQLiteBackend(args.path))
+    else:
+        db_ops.set_backend(MySQLBackend())
+
+    with open(args.input, "r") as f:
+        game_strs = [line.rstrip("\r\n") for line in f if len(line.strip()) > 0]
+    game_strs = list(itertools.islice(itertools.cycle(game_strs), args.num_games))
+    board_size = int(game_strs[0].split("&")[0])
+    # Random codes of length 12 are very unlikely to collide with existing games
+    codes = GameCodeAllocator(12).allocate(len(game_strs))
+
+    start = time.perf_counter()
+    db_ops.bulk_add_games_by_str([(game_strs, codes)])
+    report("Games uploaded", len(game_strs), start)
+
+    start = time.perf_counter()
+    for i in range(args.picks):
+        db_ops.pick_game(board_size)
+    report("Games picked", args.picks, start)
+
+    session_codes = GameCodeAllocator(12).allocate(args.sessions)
+    start = time.perf_counter()
+    num_ops = 0
+    for session_code in session_codes:
+        gid, game_code, game = db_ops.pick_game(board_size)
+        db_ops.create_session(session_code, board_size, gid)
+        player_ids = [db_ops.new_player(session_code, "Player " + str(i), i == 0)[2] for i in range(args.players)]
+        num_ops += 2 + args.players
+        for move in range(args.moves):
+            for player_id in player_ids:
+                db_ops.advance_player(player_id, 1 + move % 3)
+                db_ops.get_players_for_session_code(session_code)
+                num_ops += 2
+    report("Session operations", num_ops, start)
+    print("Connection pool: " + str(db_ops.connection_pool().stats()))
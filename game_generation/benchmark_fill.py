@@ -0,0 +1,193 @@
+import sys
+import time
+import argparse
+
+from planetx_game.board import SpaceObject, Board, CompactBoard
+from planetx_game.utilities import *
+from planetx_game.utilities import _fill_no_touch, _fill_no_within, _fill_no_self_touch
+
+parser = argparse.ArgumentParser(description="Time the backtracking board fill helpers against the old recursive ones.")
+parser.add_argument("sectors", type=int, nargs="?", default=24, help="The number of sectors on the board to fill (default: 24)")
+parser.add_argument("-r", "--repeat", type=int, default=3, help="The number of times to time each helper, keeping the fastest (default: 3)", required=False)
+parser.add_argument("--compact", action="store_true", help="Fill CompactBoards rather than Boards", required=False)
+
+# The recursive fill helpers the backtracking ones in utilities replaced, kept to time them against
+
+def add_one_no_touch_old(obj1, obj2, num_obj1, board, start_i=0):
+    # No more object left to add, current board is fine
+    if num_obj1 == 0:
+        yield board
+        return
+
+    for i in range(start_i, len(board)):
+        # Add object at position i if allowed
+        if board[i] is None and board[i-1] != obj2 and board[i+1] != obj2:
+            board_copy = board.copy()
+            board_copy[i] = obj1
+            # Continue adding objects after i
+            yield from add_one_no_touch_old(obj1, obj2, num_obj1 - 1, board_copy, i+1)
+
+def add_one_no_self_touch_old(obj, num_obj, board, start_i=0):
+    # No more object left to add, current board is fine
+    if num_obj == 0:
+        yield board
+        return
+
+    for i in range(start_i, len(board)):
+        # Add object at position i if allowed
+        if board[i] is None and board[i-1] != obj and board[i+1] != obj:
+            board_copy = board.copy()
+            board_copy[i] = obj
+            # Continue adding objects after i
+            yield from add_one_no_self_touch_old(obj, num_obj - 1, board_copy, i+2)
+
+def _fill_no_touch_old(prev, counts, holes, no_touch_objs, t=0):
+    if len(counts.keys()) == 0:
+        if all(holes):
+            # If valid so far and all holes left, fill in Nones for holes
+            if len(holes) == 0 or \
+            (holes[0][0] == prev or holes[0][0] not in no_touch_objs or prev not in no_touch_objs):
+                yield [None]*len(holes)
+        return
+    else:
+        # If we're at a hole and valid
+        if holes[0] and (holes[0][0] == prev or holes[0][0] not in no_touch_objs or prev not in no_touch_objs):
+            # Add a hole and continue
+            for p in _fill_no_touch_old(holes[0][-1], counts, holes[1:], no_touch_objs, t+1):
+                yield [None] + p
+        else:
+            # Loop through each object and check if we're allowed to put it next
+            first_objs = list(counts.keys())
+            for obj in first_objs:
+                if obj == prev or prev not in no_touch_objs or obj not in no_touch_objs:
+                    counts[obj] -= 1
+                    if counts[obj] == 0:
+                        del counts[obj]
+
+                    # Place object next and continue
+                    for p in _fill_no_touch_old(obj, counts, holes[1:], no_touch_objs, t+1):
+                        yield [obj] + p
+
+                    if obj in counts:
+                        counts[obj] += 1
+                    else:
+                        counts[obj] = 1
+
+def _fill_no_self_touch_old(prev, holes, obj, num_obj, num_none, t=0):
+    if num_obj == 0 and num_none == 0:
+        if all(holes):
+            # If there are only holes left and the hole doesn't conflict with the previous object,
+            # add the holes
+            if len(holes) == 0 or \
+            (holes[0][0] != prev or holes[0][0] != obj or prev != obj):
+                yield [None]*len(holes)
+        return
+    else:
+        # If there is a hole it doesn't conflict with the previous object, add it
+        if holes[0] and (holes[0][0] != prev or holes[0][0] != obj or prev != obj or prev is None):
+            for p in _fill_no_self_touch_old(holes[0][-1], holes[1:], obj, num_obj, num_none, t+1):
+                yield [None] + p
+        else:
+            # If we have objects left and the last thing wasn't this object, we can add it
+            if num_obj > 0 and (obj != prev or prev is None):
+                for p in _fill_no_self_touch_old(obj, holes[1:], obj, num_obj - 1, num_none, t+1):
+                    yield [obj] + p
+            # If we have empties left, we can add one
+            if num_none > 0:
+                for p in _fill_no_self_touch_old(None, holes[1:], obj, num_obj, num_none - 1, t+1):
+                    yield [None] + p
+
+def _fill_no_within_old(prev, countdown, counts, no_within_objs, board, n, i):
+    if (i == len(board)):
+        yield []
+        return
+
+    if board[i] != None:
+        if board[i] in no_within_objs:
+            if board[i] != prev and countdown != 0:
+                # Already violates rule
+                return
+            # Restart countdown, encountered an object in the set again
+            new_prev = board[i]
+            new_countdown = n
+        else:
+            # Moved further from an object, decrease countdown
+            new_prev = prev
+            new_countdown = max(0, countdown - 1)
+        # Fill in board where possible starting after this index
+        for p in _fill_no_within_old(new_prev, new_countdown, counts, no_within_objs, board, n, i+1):
+            yield [board[i]] + p
+        return
+
+    obj_choices = list(counts.keys())
+    for obj in obj_choices:
+        restricted_obj = obj in no_within_objs
+        # Check if object is allowed to be placed here
+        if obj == prev or not restricted_obj or countdown == 0:
+            counts[obj] -= 1
+            if counts[obj] == 0:
+                del counts[obj]
+
+            if restricted_obj:
+                new_countdown = n
+                new_prev = obj
+            else:
+                new_countdown = max(0, countdown - 1)
+                new_prev = prev
+
+            # Fill in board starting after the index adding this object
+            for p in _fill_no_within_old(new_prev, new_countdown, counts, no_within_objs, board, n, i+1):
+                yield [obj] + p
+
+            if obj in counts:
+                counts[obj] += 1
+            else:
+                counts[obj] = 1
+
+def time_generator(make_generator, repeat):
+    """
+    Returns the fastest time to run a generator to the end, and the number of values it yields
+    """
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        num_values = sum(1 for value in make_generator())
+        best = min(best, time.perf_counter() - start)
+    return best, num_values
+
+if __name__ == "__main__":
+    args = parser.parse_args(sys.argv[1:])
+    board_class = CompactBoard if args.compact else Board
+    board = board_class.from_objects([None] * args.sectors)
+    holes = [False] * args.sectors
+    num_none = args.sectors - 5
+
+    cases = [
+        ("add_one_no_touch",
+         lambda: add_one_no_touch(SpaceObject.DwarfPlanet, SpaceObject.PlanetX, 4, board),
+         lambda: add_one_no_touch_old(SpaceObject.DwarfPlanet, SpaceObject.PlanetX, 4, board)),
+        ("add_one_no_self_touch",
+         lambda: add_one_no_self_touch(SpaceObject.Asteroid, 6, board),
+         lambda: add_one_no_self_touch_old(SpaceObject.Asteroid, 6, board)),
+        ("_fill_no_touch",
+         lambda: _fill_no_touch({SpaceObject.DwarfPlanet: 4, SpaceObject.PlanetX: 1, None: num_none}, holes,
+                                [SpaceObject.DwarfPlanet, SpaceObject.PlanetX]),
+         lambda: _fill_no_touch_old(None, {SpaceObject.DwarfPlanet: 4, SpaceObject.PlanetX: 1, None: num_none}, holes,
+                                    [SpaceObject.DwarfPlanet, SpaceObject.PlanetX])),
+        ("_fill_no_self_touch",
+         lambda: _fill_no_self_touch(holes, SpaceObject.Asteroid, 6, args.sectors - 6),
+         lambda: _fill_no_self_touch_old(None, holes, SpaceObject.Asteroid, 6, args.sectors - 6)),
+        ("_fill_no_within",
+         lambda: _fill_no_within({SpaceObject.DwarfPlanet: 4, SpaceObject.PlanetX: 1, None: num_none},
+                                 [SpaceObject.DwarfPlanet, SpaceObject.PlanetX], [None] * args.sectors, 2),
+         lambda: _fill_no_within_old(None, 0, {SpaceObject.DwarfPlanet: 4, SpaceObject.PlanetX: 1, None: num_none},
+                                     [SpaceObject.DwarfPlanet, SpaceObject.PlanetX], [None] * args.sectors, 2, 0))
+    ]
+
+    for name, make_new, make_old in cases:
+        new_time, num_new = time_generator(make_new, args.repeat)
+        old_time, num_old = time_generator(make_old, args.repeat)
+        if num_new != num_old:
+            print(name + ": generated " + str(num_new) + " values, but the old version generated " + str(num_old))
+        print(name + ": " + str(num_new) + " values, " + str(round(old_time, 3)) + "s -> " + str(round(new_time, 3)) +
+              "s (" + str(round(old_time / new_time, 2)) + "x)", flush=True)
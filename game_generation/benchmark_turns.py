@@ -0,0 +1,82 @@
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import planetx_game.db_ops as db_ops
+from planetx_game.db_backends import MySQLBackend, SQLiteBackend
+from planetx_game.game_codes import GameCodeAllocator
+from planetx_game.session import *
+
+parser = argparse.ArgumentParser(description="Compare refreshing a session's turns and theories in full with fetching only what changed, over the course of a game.")
+parser.add_argument("backend", choices=["sqlite", "mysql"], help="The backend to run the game against. The game adds a session to the database.")
+parser.add_argument("-i", "--input", type=str, help="A file of encoded games, one per line, the first of which is played", required=True)
+parser.add_argument("-p", "--path", type=str, default=":memory:", help="With sqlite, the database file (default: in memory)", required=False)
+parser.add_argument("-t", "--turns", type=int, default=200, help="The number of turns in the game (default: 200)", required=False)
+parser.add_argument("--players", type=int, default=4, help="The number of players in the game (default: 4)", required=False)
+parser.add_argument("--theory-every", type=int, default=5, help="The number of turns between theories (default: 5)", required=False)
+
+def play_game(session_code, num_turns, num_players, theory_every):
+    """
+    Plays a game of num_turns turns, refreshing the session's turns and theories after every
+    turn both in full and incrementally. Returns the total seconds spent on each refresh.
+    """
+    session_id = db_ops.get_session_by_code(session_code)[0]
+    player_ids = [db_ops.new_player(session_code, "Player " + str(i), False)[2] for i in range(num_players)]
+
+    full_time = 0
+    incremental_time = 0
+    last_action_id = 0
+    last_theory_id = 0
+    turns = []
+    theories = {}
+    for i in range(num_turns):
+        player_id = player_ids[i % num_players]
+        db_ops.create_action(ActionType.PLAYER_TURN, player_id)
+        action_id = db_ops.get_current_action(player_id).action_id
+        db_ops.commit_turn(session_id, action_id, Turn(TurnType.SURVEY, "E", (1, 4), player_id, datetime.now()),
+                           moves=[(player_id, 1)], advance_theories=(i % num_players == 0))
+        if i % theory_every == 0:
+            db_ops.create_theory(session_id, player_id, "A", i % 12)
+
+        start = time.perf_counter()
+        full_turns = db_ops.get_previous_turns(session_id)
+        full_theories = db_ops.get_theories_for_session(session_id)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        last_action_id, new_turns = db_ops.get_turns_since(session_id, last_action_id)
+        turns.extend(new_turns)
+        last_theory_id, new_theories = db_ops.get_theories_since(session_id, last_theory_id)
+        for theory in new_theories:
+            theories[theory.theory_id] = theory
+        incremental_time += time.perf_counter() - start
+
+        if len(turns) != len(full_turns) or len(theories) != len(full_theories):
+            raise ValueError("Incremental refresh disagrees with full refresh after turn " + str(i + 1))
+
+    return full_time, incremental_time
+
+if __name__ == "__main__":
+    args = parser.parse_args(sys.argv[1:])
+    try:
+        if args.backend == "sqlite":
+            db_ops.set_backend(SQLiteBackend(args.path))
+        else:
+            db_ops.set_backend(MySQLBackend())
+        db_ops.migrate()
+
+        with open(args.input, "r") as f:
+            game_str = f.readline().rstrip("\r\n")
+        game_code, session_code = GameCodeAllocator(12).allocate(2)
+        db_ops.add_games_by_str([game_str], [game_code])
+        gid, game = db_ops.get_game(game_code)
+        db_ops.create_session(session_code, len(game.board), gid)
+
+        full_time, incremental_time = play_game(session_code, args.turns, args.players, args.theory_every)
+        print("Full refresh: " + str(round(full_time, 3)) + "s (" +
+              str(round(full_time / args.turns * 1e6)) + "us/turn)")
+        print("Incremental refresh: " + str(round(incremental_time, 3)) + "s (" +
+              str(round(incremental_time / args.turns * 1e6)) + "us/turn)")
+    except Exception as e:
+        print(e)
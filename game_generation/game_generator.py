@@ -1,10 +1,37 @@
 from planetx_game.game import *
+from planetx_game.board_file import is_board_file, BoardFileReader, HEADER
+from planetx_game.game_codes import GameCodeAllocator
 import planetx_game.db_ops as db_ops
 
+import os
+import json
+import time
+import random
+import itertools
+import collections
+import multiprocessing
+
 class GameGenerator:
     @classmethod
-    def _chunked_read(cls, board_filename, chunk_size):
-        board_file = open(board_filename, "r")
+    def _chunked_read(cls, board_filename, chunk_size, offset=0):
+        """
+        Read the boards in a board file, yielding each board with the byte offset just past it
+        in the file, so that progress can be measured against the file size
+        
+        board_filename: A binary board file, or a text file with one board per line
+        chunk_size: The number of boards to pull into memory from a text file at any given time
+        offset: The byte offset to start reading from, as yielded with an earlier board
+        """
+        if is_board_file(board_filename):
+            # Binary board files are memory mapped, so don't need to be read in chunks
+            with BoardFileReader(board_filename) as reader:
+                start = max(0, (offset - HEADER.size) // reader.record_size)
+                for i in range(start, len(reader)):
+                    yield reader[i], HEADER.size + (i + 1) * reader.record_size
+            return
+        
+        board_file = open(board_filename, "rb")
+        board_file.seek(offset)
         more_boards = True
         boards = []
         
@@ -12,12 +39,14 @@ class GameGenerator:
             # Bring in next chunk of boards into memory
             if len(boards) == 0:
                 while len(boards) < chunk_size:
-                    board_str = board_file.readline().rstrip("\r\n")
+                    line = board_file.readline()
+                    board_str = line.rstrip(b"\r\n")
                     if len(board_str) == 0:
                         more_boards = False
                         break
                     else:
-                        boards.append(Board.parse(board_str))
+                        offset += len(line)
+                        boards.append((Board.parse(board_str.decode()), offset))
             
             for board in boards:
                 yield board
@@ -26,164 +55,300 @@ class GameGenerator:
             
         board_file.close()
             
+    @staticmethod
+    def _board_seed(seed, board_index):
+        """
+        The seed for the random choices made while generating the game for one board. Each
+        board gets its own random stream, so the game for a board depends only on the seed
+        and the board's position in the file, and not on which process generates it.
+        """
+        return str(seed) + ":" + str(board_index)
+    
     @classmethod
-    def generate_games(cls, board_type, input_filename, output_filename, chunk_size=float('inf')):
+    def _generate_game(cls, board, board_type, seed, board_index):
+        """
+        Generate the game for one board, returning its code, or None if no game was generated
+        """
+        random.seed(cls._board_seed(seed, board_index))
+        game = Game.generate_from_board(board, board_type)
+        if game is None:
+            return None
+        return game.code()
+    
+    @staticmethod
+    def _save_checkpoint(checkpoint_filename, checkpoint):
+        """
+        Saves the progress of game generation. The checkpoint is replaced atomically, so it 
+        always describes a consistent state.
+        """
+        with open(checkpoint_filename + ".tmp", "w") as f:
+            json.dump(checkpoint, f, indent=2)
+        os.replace(checkpoint_filename + ".tmp", checkpoint_filename)
+    
+    @staticmethod
+    def _load_checkpoint(checkpoint_filename, input_filename, seed):
+        """
+        Loads the progress of game generation. Returns None if there is no checkpoint. Raises
+        ValueError if the checkpoint is for a different input file or seed.
+        """
+        if not os.path.exists(checkpoint_filename):
+            return None
+        
+        with open(checkpoint_filename, "r") as f:
+            checkpoint = json.load(f)
+            
+        if checkpoint["input_filename"] != os.path.abspath(input_filename) or \
+        (seed is not None and checkpoint["seed"] != seed):
+            raise ValueError("Checkpoint " + checkpoint_filename + " is for a different input file or seed")
+        
+        return checkpoint
+    
+    @classmethod
+    def _generate_codes(cls, boards, board_type, seed, start, workers, task_size):
+        """
+        Generate the game for each board, yielding the index of each board, its byte offset,
+        and its game code (or None), in board order.
+        
+        boards: An iterable of the boards and their byte offsets, starting at board index start
+        workers: The number of worker processes, or None to generate games in this process
+        task_size: The number of boards to hand to a worker at a time
+        """
+        if workers is None:
+            for board_index, (board, offset) in enumerate(boards, start):
+                yield board_index, offset, cls._generate_game(board, board_type, seed, board_index)
+            return
+        
+        boards = iter(boards)
+        # Results are written in board order, but tasks finish in any order. Tasks are 
+        # submitted in order and held in a reorder buffer until every earlier task has been
+        # written, so a slow task only holds up the output and not the other workers. Only a
+        # few tasks per worker are in flight at once, so the boards are read as they are needed.
+        max_pending = 4 * workers
+        pending = collections.deque()
+        next_index = start
+        
+        with multiprocessing.Pool(workers, initializer=_init_game_worker, initargs=(board_type, seed)) as pool:
+            while True:
+                while len(pending) < max_pending:
+                    task_boards = list(itertools.islice(boards, task_size))
+                    if len(task_boards) == 0:
+                        break
+                    task = (next_index, [str(board) for board, offset in task_boards])
+                    pending.append((next_index, [offset for board, offset in task_boards], 
+                                    pool.apply_async(_game_worker, (task,))))
+                    next_index += len(task_boards)
+                    
+                if len(pending) == 0:
+                    break
+                
+                task_start, offsets, result = pending.popleft()
+                for board_index, (offset, code) in enumerate(zip(offsets, result.get()), task_start):
+                    yield board_index, offset, code
+    
+    @classmethod
+    def generate_games(cls, board_type, input_filename, output_filename, chunk_size=float('inf'), workers=None, 
+                       seed=None, resume=False, task_size=100, checkpoint_interval=1000):
         """
         Generate games from a board file
         
         board_type: A BoardType describing the number of sectors, constraints, and number of rules for the game
         input_filename: The file name for the file with a list of boards, encoded with initials for each sector's
-            object and separated by newlines
+            object and separated by newlines, or a binary board file
         output_filename: The file name to put the produced games in, with each game encoded and separated by a 
             newline
         chunk_size: The number of boards to pull into memory from the file at any given time
+        workers: The number of worker processes to generate games with, or None to generate them in
+            this process
+        seed: The seed for the random choices made in generating games. The same seed gives the same
+            games in the same order for any number of workers. If None, a random seed is chosen.
+        resume: If true, continues from the checkpoint saved next to output_filename
+        task_size: With workers, the number of boards to hand to a worker at a time
+        checkpoint_interval: The number of boards to generate games for between checkpoints
         """
-        # Count number of boards in the file
-        with open(input_filename) as f:
-            for i, line in enumerate(f):
-                pass
-            num_boards = i+1
-                        
-        boards = cls._chunked_read(input_filename, chunk_size)
-        game_file = open(output_filename, "w")
+        checkpoint_filename = output_filename + ".checkpoint.json"
+        checkpoint = None
+        if resume:
+            checkpoint = cls._load_checkpoint(checkpoint_filename, input_filename, seed)
+        
+        if checkpoint is None:
+            if seed is None:
+                seed = random.randrange(2**32)
+            checkpoint = {
+                "input_filename": os.path.abspath(input_filename),
+                "seed": seed,
+                "boards": 0,
+                "input_offset": 0,
+                "games": 0,
+                "output_offset": 0
+            }
+            game_file = open(output_filename, "wb")
+        else:
+            seed = checkpoint["seed"]
+            print("Resuming from board " + str(checkpoint["boards"]), flush=True)
+            game_file = open(output_filename, "r+b")
+            game_file.truncate(checkpoint["output_offset"])
+            game_file.seek(checkpoint["output_offset"])
+        print("Seed: " + str(seed), flush=True)
+        
+        # Progress is measured by how far through the input file the boards are, so the file
+        # is only read once
+        file_size = os.path.getsize(input_filename)
+        boards = cls._chunked_read(input_filename, chunk_size, checkpoint["input_offset"])
         
-        current_board = 0
         last_update = 0
         
-        # Create a game for each board
-        for board in boards:
-            game = Game.generate_from_board(board, board_type)
-            # If a game is generated, add it to the file
-            # Some games cannot be generated, or were not generated based on the 
-            # random choices made
-            if game is not None:
-                game_file.write(game.code() + "\n")
-
-            # Calculate percentage for log
-            current_board += 1
-            current_percentage = round((current_board + 1)*100/num_boards, 2)
-            if current_percentage > last_update:
-                print(str(current_percentage) + "% complete " + str(current_board+1) + "/" + str(num_boards))
-                last_update = current_percentage
+        with game_file:
+            # Create a game for each board
+            for board_index, offset, code in cls._generate_codes(boards, board_type, seed, checkpoint["boards"], 
+                                                                 workers, task_size):
+                # If a game is generated, add it to the file
+                # Some games cannot be generated, or were not generated based on the 
+                # random choices made
+                if code is not None:
+                    game_file.write((code + "\n").encode())
+                    checkpoint["games"] += 1
                     
-        game_file.close()
+                # Periodically record the last board with its game written
+                checkpoint["boards"] = board_index + 1
+                checkpoint["input_offset"] = offset
+                if checkpoint["boards"] % checkpoint_interval == 0:
+                    game_file.flush()
+                    checkpoint["output_offset"] = game_file.tell()
+                    cls._save_checkpoint(checkpoint_filename, checkpoint)
+    
+                # Calculate percentage for log
+                current_percentage = round(offset*100/file_size, 2)
+                if current_percentage > last_update:
+                    print(str(current_percentage) + "% complete " + str(checkpoint["boards"]) + " boards", flush=True)
+                    last_update = current_percentage
+            
+            game_file.flush()
+            checkpoint["output_offset"] = game_file.tell()
+            cls._save_checkpoint(checkpoint_filename, checkpoint)
         
     @staticmethod
-    def _code_to_int(code):
+    def _allocate_codes(num_codes, allocator, code_state_filename):
         """
-        Get the integer corresponding to a game code of the form
-        <letter><number><letter><number>. The letters cannot be O/I, and the 
-        numbers are 2-9. The 0th game code is A2A2...A2 for any given length.
+        Issue new game codes for a chunk of games
         
-        code: The game code 
+        num_codes: The number of game codes to issue
+        allocator: The GameCodeAllocator to issue game codes from
+        code_state_filename: The file to save the allocator to
         """
-        i = 0
-        
-        while len(code) > 0:
-            i *= (8 * 24)
+        # Codes handed out before there was an allocator may already be in the database, so
+        # look up just the new codes and issue more in place of any that are taken
+        codes = []
+        while len(codes) < num_codes:
+            new_codes = allocator.allocate(num_codes - len(codes))
+            existing_codes = set(db_ops.get_existing_game_codes(new_codes))
+            codes += [code for code in new_codes if code not in existing_codes]
             
-            letter = ord(code[0]) - 65
-            digit = int(code[1])
-            
-            i += (digit - 2)
-            
-            if letter < 8:
-                i += letter * 8
-            elif letter < 14:
-                i += (letter - 1) * 8
-            else:
-                i += (letter - 2) * 8
-                
-            code = code[2:]
-        
-        return i
-        
-    @staticmethod
-    def _game_code(i, length):
-        """
-        Construct the ith game code of length length. Game codes are in the format
-        <letter><number><letter><number>... The letters cannot be O/I, and the numbers 
-        are 2-9. The 0th game code is A2A2...A2 for any given length.
-        
-        length: The number of characters for the game code. Must be even.
-        i: The number of the game code to construct
-        """
-        code = ""
-        # Construct code, taking each letter-number pair one by one
-        while i > 0:
-            # Extract number by taking modulo
-            n = (i % 8) + 2
-            i = int(i/8)
-            # Extract letter index by taking modulo
-            l = i % 24
-
-            # Turn letter index into a letter, skipping O and I
-            if l < 8:
-                c = chr(l + 65)
-            elif l < 13:
-                c = chr(l + 66)
-            else:
-                c = chr(l + 67)
-            i = int(i/24)
-            # Prepend letter-number pair to code
-            code = c + str(n) + code
-        # Pad with A2's 
-        if len(code) < length:
-            code = "A2" * ((length - len(code))//2) + code
-        return code 
+        # Save the cursor before adding the games, so that if adding them fails the codes
+        # are skipped rather than issued again
+        allocator.save(code_state_filename)
+        return codes
     
-    @staticmethod
-    def _generate_game_codes(total_games, code_length):
+    @classmethod
+    def _coded_chunks(cls, input_filename, allocator, code_state_filename, chunk_size):
         """
-        Generate a random set of game codes for a given number of games
+        Read the games in a game file in one pass, yielding chunks of the encoded games with
+        a list of new game codes for them
+        
+        input_filename: File containing encoded games, one per line
+        allocator: The GameCodeAllocator to issue game codes from
+        code_state_filename: The file to save the allocator to
+        chunk_size: The number of games in each chunk
         """
-        existing_codes = db_ops.get_game_codes()
-        existing_ints = {GameGenerator._code_to_int(code) for code in existing_codes if len(code) == code_length}
-        max_code = (24*8)**(code_length//2)
-        available_ints = set(range(max_code)) - existing_ints
-
-        # Take a random sample of integers up to the maximum possible for that code length
-        nums = random.sample(available_ints, total_games)
-        # Get game code for each integer 
-        codes = [GameGenerator._game_code(num, code_length) for num in nums]
-        return codes
+        file_size = os.path.getsize(input_filename)
+        num_games = 0
+        some_strs = []
+        
+        with open(input_filename, "rb") as game_file:
+            while True:
+                line = game_file.readline()
+                game_str = line.rstrip(b"\r\n").decode()
+                if len(game_str) > 0:
+                    some_strs.append(game_str)
+                    num_games += 1
+                
+                if len(some_strs) > 0 and (len(some_strs) >= chunk_size or len(line) == 0):
+                    yield some_strs, cls._allocate_codes(len(some_strs), allocator, code_state_filename)
+                    print(str(round(game_file.tell()*100/file_size, 2)) + "% complete " + str(num_games) + " games", 
+                          flush=True)
+                    some_strs = []
+                    
+                if len(line) == 0:
+                    break
         
     @classmethod
-    def add_to_database(cls, input_filename, code_length, chunk_size=float('inf')):
+    def add_to_database(cls, input_filename, code_length, chunk_size=10000, code_state_filename=None, 
+                        mode="insert", rows_per_insert=1000):
         """
-        Add games in game file to database. Assumes that no games exist in the database to 
-        start.
+        Add games in game file to database. The file is read in one pass, holding only one 
+        chunk of games in memory at a time. Logs the number of games added per second.
         
         input_filename: File containing encoded games, one per line
-        chunk_size: The number of games to add to the database at once
+        code_length: The number of characters in each game code
+        chunk_size: The number of games to read (and, in insert mode, add to the database) at once
+        code_state_filename: The file keeping the key and cursor of the game code allocator for
+            the database. Defaults to db_ops.game_code_state_filename(code_length).
+        mode: How to add the games. insert: add each chunk in its own transaction; multirow: add 
+            every game in one transaction of multi-row INSERTs; load: write every game to a tab
+            separated file next to input_filename and load it in bulk (with LOAD DATA LOCAL INFILE 
+            on MySQL). The bulk modes defer unique and foreign key checks.
+        rows_per_insert: In multirow mode, the number of games in each INSERT statement
         """
-        # Count the number of games in the file
-        num_games = 0
-        with open(input_filename, "r") as f:
-            for i, line in enumerate(f):
-                pass
-            num_games = i + 1
-            
-        # Create a unique game code for each game
-        game_codes = GameGenerator._generate_game_codes(num_games, code_length)
-        print("Generated " + str(len(game_codes)) + " codes")
-
-        # Read all game strings
-        game_file = open(input_filename, "r")
-        game_strs = game_file.readlines()
-        game_strs = [game_str.rstrip("\r\n") for game_str in game_strs]
+        if mode not in ["insert", "multirow", "load"]:
+            raise ValueError("Unknown upload mode: " + str(mode))
         
-        if chunk_size == float('inf'):
-            chunk_size = num_games
-            
-        num_chunks = math.ceil(num_games/chunk_size)
+        if code_state_filename is None:
+            code_state_filename = db_ops.game_code_state_filename(code_length)
+        # Create a unique game code for each game as it is added
+        allocator = GameCodeAllocator.load(code_state_filename, code_length)
+        print(str(allocator.remaining()) + " unused codes of length " + str(code_length), flush=True)
         
-        # Add games to database, chunk by chunk
-        for i in range(0, len(game_strs), chunk_size):
-            print("Chunk " + str(i//chunk_size) + "/" + str(num_chunks))
-            some_strs = game_strs[i:i+chunk_size]
-            some_codes = game_codes[i:i+chunk_size]
+        chunks = cls._coded_chunks(input_filename, allocator, code_state_filename, chunk_size)
+        start_time = time.perf_counter()
         
-            db_ops.add_games_by_str(some_strs, some_codes)
-            
-        
\ No newline at end of file
+        # Add games to database, chunk by chunk
+        if mode == "insert":
+            num_games = 0
+            for some_strs, some_codes in chunks:
+                db_ops.add_games_by_str(some_strs, some_codes)
+                num_games += len(some_strs)
+        elif mode == "multirow":
+            num_games = db_ops.bulk_add_games_by_str(chunks, rows_per_insert)
+        else:
+            tsv_filename = input_filename + ".tsv"
+            try:
+                num_games = db_ops.load_games_by_str(chunks, tsv_filename)
+            finally:
+                if os.path.exists(tsv_filename):
+                    os.remove(tsv_filename)
+                
+        elapsed = time.perf_counter() - start_time
+        print("Added " + str(num_games) + " games in " + str(round(elapsed, 2)) + "s (" + 
+              str(round(num_games / max(elapsed, 1e-9))) + " games/s)", flush=True)
+
+# State for game generation worker processes, set by _init_game_worker
+_worker_board_type = None
+_worker_seed = None
+
+def _init_game_worker(board_type, seed):
+    """
+    Initializes a worker process for GameGenerator.generate_games
+    """
+    global _worker_board_type, _worker_seed
+    _worker_board_type = board_type
+    _worker_seed = seed
+    
+def _game_worker(task):
+    """
+    Generates the games for a list of consecutive boards in a worker process. Returns a list
+    of the game codes, with None for each board without a game.
+    
+    task: The index of the first board, and a list of the board strings
+    """
+    start, board_strs = task
+    return [GameGenerator._generate_game(Board.parse(board_str), _worker_board_type, _worker_seed, board_index) 
+            for board_index, board_str in enumerate(board_strs, start)]
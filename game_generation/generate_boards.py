@@ -6,15 +6,26 @@ from planetx_game.board import *
 
 parser = argparse.ArgumentParser(description="Generate Planet X boards of a specific size.")
 parser.add_argument("sectors", type=int, help="The number of sectors on the boards to generate")
-parser.add_argument("-p", "--parallel", nargs=2, type=int, default=(0, 1), help="The core number followed by the total number of cores (default: 0 1)", required=False)
+parser.add_argument("-p", "--parallel", nargs=2, type=int, help="The core number followed by the total number of cores (default: generate every board)", required=False)
 parser.add_argument("-c", "--chunk-size", default=float('inf'), type=int, help="The number of boards to load into memory at one time", required=False)
+parser.add_argument("--compact", action="store_true", help="Hold partial boards in the compact bit-packed representation", required=False)
+parser.add_argument("-w", "--workers", type=int, help="The number of worker processes to generate boards with", required=False)
+parser.add_argument("-s", "--split-stage", type=int, default=1, help="With --workers, the number of constraints to apply before handing boards out to workers (default: 1)", required=False)
+parser.add_argument("-b", "--binary", action="store_true", help="Write the boards as a packed binary board file instead of text", required=False)
+parser.add_argument("-d", "--work-dir", type=str, help="The directory to keep each stage's boards and a progress manifest in", required=False)
+parser.add_argument("-r", "--resume", action="store_true", help="Resume generation from the last checkpoint in --work-dir", required=False)
+parser.add_argument("-m", "--mode", choices=["spill", "stream"], default="spill", help="spill: write the boards meeting each constraint to disk (resumable); stream: fill boards depth first in memory (default: spill)", required=False)
+parser.add_argument("--optimize-order", action="store_true", help="Choose the order to apply constraints in by sampling partial boards, and log its estimates", required=False)
 parser.add_argument("-o", "--out", type=str, help="The output filename", required=True)
 
 if __name__ == "__main__":
     args = parser.parse_args(sys.argv[1:])
     try:
         board_type = sector_types[args.sectors]
-        board_type.generate_boards_to_file(args.out, parallel=args.parallel, chunk_size=args.chunk_size)
+        board_type.generate_boards_to_file(args.out, parallel=args.parallel, chunk_size=args.chunk_size, compact=args.compact,
+                                           workers=args.workers, split_stage=args.split_stage, binary=args.binary,
+                                           work_dir=args.work_dir, resume=args.resume, mode=args.mode,
+                                           optimize_order=args.optimize_order)
     except Exception as e:
         print(e)
 
@@ -8,12 +8,16 @@ parser = argparse.ArgumentParser(description="Generate Planet X games given a se
 parser.add_argument("sectors", type=int, help="The number of sectors on the boards")
 parser.add_argument("-i", "--input", type=str, help="The input file containing one board per line", required=True)
 parser.add_argument("-c", "--chunk-size", default=float('inf'), type=int, help="The number of boards to load into memory at one time", required=False)
+parser.add_argument("-w", "--workers", type=int, help="The number of worker processes to generate games with", required=False)
+parser.add_argument("-s", "--seed", type=int, help="The random seed; the same seed gives the same games for any number of workers (default: random)", required=False)
+parser.add_argument("-r", "--resume", action="store_true", help="Resume generation from the checkpoint saved next to the output file", required=False)
 parser.add_argument("-o", "--out", type=str, help="The output filename", required=True)
 
 if __name__ == "__main__":
     args = parser.parse_args(sys.argv[1:])    
     try:
-        GameGenerator.generate_games(sector_types[args.sectors], args.input, args.out, chunk_size=args.chunk_size)
+        GameGenerator.generate_games(sector_types[args.sectors], args.input, args.out, chunk_size=args.chunk_size,
+                                     workers=args.workers, seed=args.seed, resume=args.resume)
     except Exception as e:
         print(e)
 
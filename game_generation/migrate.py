@@ -0,0 +1,19 @@
+import sys
+import argparse
+
+import planetx_game.db_ops as db_ops
+from planetx_game import migrations
+
+parser = argparse.ArgumentParser(description="Bring the database's schema up to date by applying the migrations it has not had yet. The database is chosen by PLANETX_DB_BACKEND, as for every other operation.")
+parser.add_argument("-t", "--target", type=int, help="The schema version to migrate to (default: the latest, " + str(migrations.latest_version()) + ")", required=False)
+
+if __name__ == "__main__":
+    args = parser.parse_args(sys.argv[1:])
+    try:
+        applied = db_ops.migrate(args.target)
+        for version in applied:
+            print("Applied migration " + str(version) + ": " + migrations.MIGRATIONS[version - 1].description)
+        if len(applied) == 0:
+            print("The schema is already up to date")
+    except Exception as e:
+        print(e)
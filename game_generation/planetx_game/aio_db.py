@@ -0,0 +1,241 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from . import db_ops
+from .connection_pool import AsyncConnectionPool
+from .game_picker import GameIdRanges
+from .session import Turn
+
+# asyncio versions of the db_ops functions used while playing a session, so that one event loop
+# can serve many sessions. They run the same queries as db_ops, through the backend's async
+# driver (aiomysql for MySQL, aiosqlite for SQLite), on connections from an AsyncConnectionPool.
+# A coroutine waiting for the database holds no thread: at most the pool's size of operations
+# are in flight, and the other coroutines wait for a connection in the event loop. (aiosqlite
+# runs each connection on a thread of its own, so a SQLite pool has a thread per connection.)
+# The drivers are only imported when the first connection is opened.
+#
+# The pool belongs to the event loop it was made in. Call close() before that loop ends.
+
+# The number of connections when the backend sets no pool size, such as a SQLite file
+DEFAULT_POOL_SIZE = 4
+
+_pool = None
+_pool_backend = None
+_pool_loop = None
+
+def connection_pool():
+    """
+    Returns the AsyncConnectionPool of db_ops' backend for the running event loop, making a new
+    one when the backend or the event loop has changed. The connections of a pool made for
+    another loop can only be used in that loop, so they are discarded.
+    """
+    global _pool, _pool_backend, _pool_loop
+    backend = db_ops.get_backend()
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_backend is not backend or _pool_loop is not loop:
+        if _pool is not None:
+            _pool.discard()
+        _pool = AsyncConnectionPool(backend.connect_async, backend.pool_size or DEFAULT_POOL_SIZE,
+                                    backend.pool_timeout)
+        _pool_backend = backend
+        _pool_loop = loop
+    return _pool
+
+async def close():
+    """
+    Closes the connections of the pool, such as when the server shuts down. An aiosqlite
+    connection left open keeps the process from exiting.
+    """
+    global _pool, _pool_backend, _pool_loop
+    pool = _pool
+    _pool = None
+    _pool_backend = None
+    _pool_loop = None
+    if pool is not None:
+        await pool.close()
+
+def _forget_pool():
+    """
+    Drops the pool inherited by a forked process, whose connections belong to the parent
+    """
+    global _pool, _pool_backend, _pool_loop
+    _pool = None
+    _pool_backend = None
+    _pool_loop = None
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+@asynccontextmanager
+async def _cursor():
+    """
+    Checks out a connection and opens a cursor on it for the body of an async with statement,
+    yielding a tuple of the connection and cursor
+    """
+    async with connection_pool().checkout() as cxn:
+        cursor = await cxn.cursor()
+        try:
+            yield cxn, cursor
+        finally:
+            await cursor.close()
+
+async def _fetchone(query, params):
+    """
+    Executes a query and returns its first row, or None if it has none
+    """
+    async with _cursor() as (cxn, cursor):
+        await cursor.execute(query, params)
+        return await cursor.fetchone()
+
+async def _fetchall(query, params):
+    """
+    Executes a query and returns a list of its rows
+    """
+    async with _cursor() as (cxn, cursor):
+        await cursor.execute(query, params)
+        return await cursor.fetchall()
+
+async def get_session_by_code(session_code):
+    """
+    Gets the session with a given session code, as db_ops.get_session_by_code
+    """
+    return db_ops._session(await _fetchone(db_ops._session_by_code_query, (session_code,)))
+
+async def get_session_snapshot(session_code):
+    """
+    Gets the whole state of a session in one query, as db_ops.get_session_snapshot
+    """
+    return db_ops._snapshot(await _fetchall(db_ops._snapshot_query, (session_code,) * 5))
+
+async def new_player(session_code, name, creator):
+    """
+    Creates a new player for a session with a particular code, as db_ops.new_player
+    """
+    async with _cursor() as (cxn, cursor):
+        session_id, player_num, player_id = await db_ops.get_backend().new_player_async(cursor, session_code, name)
+
+        if creator:
+            await cursor.execute(db_ops._start_game_query, (player_id,))
+
+        await cxn.commit()
+
+    return session_id, player_num, player_id
+
+async def get_players_for_session(session_id):
+    """
+    Gets the players for a session with a particular session ID, as db_ops.get_players_for_session
+    """
+    return db_ops._players(await _fetchall(db_ops._players_query, (session_id,)))
+
+async def create_theory(session_id, player_id, space_object, sector):
+    """
+    Creates a new theory, as db_ops.create_theory
+    """
+    async with _cursor() as (cxn, cursor):
+        await cursor.execute(db_ops._create_theory_query, (session_id, player_id, space_object, sector, 0))
+        await cxn.commit()
+
+async def resolve_action(action_id, turn):
+    """
+    Resolves action with a given id, as db_ops.resolve_action. Does nothing if action_id is None.
+    """
+    if action_id is None:
+        return
+
+    async with _cursor() as (cxn, cursor):
+        await cursor.execute(db_ops._resolve_action_query, db_ops._resolve_action_params(action_id, turn))
+        await cxn.commit()
+
+async def get_previous_turns(session_id):
+    """
+    Gets a list of previous turns for a session, as db_ops.get_previous_turns
+    """
+    rows = await _fetchall(db_ops._previous_turns_query, (session_id,))
+    return [Turn.parse(row[0], row[1], row[2]) for row in rows]
+
+async def get_turns_since(session_id, after_action_id):
+    """
+    Gets the turns of a session after a particular action, as db_ops.get_turns_since
+    """
+    rows = await _fetchall(db_ops._turns_since_query, (session_id, after_action_id))
+    return db_ops._turns_since(rows, after_action_id)
+
+async def get_theories_since(session_id, after_theory_id):
+    """
+    Gets the new and advancing theories of a session, as db_ops.get_theories_since
+    """
+    rows = await _fetchall(db_ops._theories_since_query, (session_id, after_theory_id))
+    return db_ops._theories_since(rows, after_theory_id)
+
+async def commit_turn(session_id, action_id, turn, moves=(), advance_theories=False, new_actions=(), status=None):
+    """
+    Applies everything a turn changes in one transaction, as db_ops.commit_turn
+    """
+    backend = db_ops.get_backend()
+    async with _cursor() as (cxn, cursor):
+        await cxn.start_transaction()
+
+        if action_id is not None:
+            await cursor.execute(db_ops._resolve_action_query, db_ops._resolve_action_params(action_id, turn))
+        for player_id, sectors in moves:
+            await backend.move_player_async(cursor, player_id, sectors)
+        if advance_theories:
+            await cursor.execute(db_ops._advance_theories_query, (session_id,))
+        for action in new_actions:
+            await cursor.execute(db_ops._create_action_query, (action.action_type.name, action.player_id, False))
+        if status is not None:
+            action, current_sector, first_rot = status
+            await cursor.execute(db_ops._set_current_status_query,
+                                 (first_rot, current_sector, action.action_type.name, action.player_id, session_id))
+
+        await cxn.commit()
+
+async def _load_game_ids(board_size):
+    """
+    Loads the ids of the games of a board size into db_ops' game picker, a batch at a time
+    """
+    ids = GameIdRanges()
+    async with _cursor() as (cxn, cursor):
+        await cursor.execute(db_ops._game_ids_query, (board_size,))
+
+        rows = await cursor.fetchmany(db_ops.FETCH_SIZE)
+        while len(rows) > 0:
+            ids.extend(row[0] for row in rows)
+            rows = await cursor.fetchmany(db_ops.FETCH_SIZE)
+
+    db_ops.game_picker.set_ids(board_size, ids)
+
+async def _get_game_by_id(gid):
+    """
+    Gets the game for a given id, as db_ops.get_game_by_id
+    """
+    cached = db_ops.game_cache.get_by_id(gid)
+    if cached is not None:
+        return cached
+
+    return db_ops._game_by_id(await _fetchone(db_ops._game_by_id_query, (gid,)))
+
+async def pick_game(num_sectors, no_repeats=False):
+    """
+    Picks a random game of a board size, as db_ops.pick_game
+    """
+    for attempt in range(2):
+        if not db_ops.game_picker.has_ids(num_sectors):
+            await _load_game_ids(num_sectors)
+
+        if no_repeats:
+            gid = db_ops.game_picker.deal(num_sectors)
+        else:
+            gid = db_ops.game_picker.pick(num_sectors)
+        if gid is None:
+            return None
+
+        result = await _get_game_by_id(gid)
+        if result is not None:
+            game_code, game = result
+            return gid, game_code, game
+
+        # The game was removed since the ids were loaded, so load them again
+        db_ops.game_picker.invalidate(num_sectors)
+
+    return None
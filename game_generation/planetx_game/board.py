@@ -226,6 +226,15 @@ class Board:
         """
         return Board(copy(self.objects))
     
+    @classmethod
+    def from_objects(cls, objects):
+        """
+        Create a Board with the space objects in objects, starting from sector 1.
+        
+        objects: A list of SpaceObject (or None for unassigned sectors), in order
+        """
+        return cls(list(objects))
+    
     def _calc_num_objects(self):
         objects = {}
         for obj in self.objects:
@@ -292,3 +301,168 @@ class Board:
             }
         }
     
+    
+# Number of bits used to store each sector of a CompactBoard. Code 0 is an
+# unassigned sector, and code n+1 is the SpaceObject with value n.
+SECTOR_BITS = 3
+SECTOR_MASK = (1 << SECTOR_BITS) - 1
+
+_sector_objects = [None] + sorted(SpaceObject, key=lambda obj: obj.value)
+_sector_codes = { obj: code for code, obj in enumerate(_sector_objects) }
+
+class CompactBoard:
+    """
+    Represents a game board with specific objects in its sectors, packed into a single
+    integer with SECTOR_BITS bits per sector. Behaves like a Board, but copying a
+    CompactBoard is O(1) and it takes a fraction of the memory, which makes it suitable
+    for holding many partial boards while enumerating boards.
+    """
+    __slots__ = ("size", "bits", "num_objs", "num_objs_valid")
+    
+    def __init__(self, size, bits=0):
+        """
+        Create a CompactBoard with size sectors.
+        
+        size: The number of sectors on the board
+        bits: The packed representation of the sectors, where sector i is stored in
+            bits SECTOR_BITS*i through SECTOR_BITS*(i+1)-1. Defaults to all sectors 
+            unassigned.
+        """
+        self.size = size
+        self.bits = bits
+        self.num_objs_valid = False
+        
+    @classmethod
+    def from_objects(cls, objects):
+        """
+        Create a CompactBoard with the space objects in objects, starting from sector 1.
+        
+        objects: A list of SpaceObject (or None for unassigned sectors), in order
+        """
+        bits = 0
+        for i, obj in enumerate(objects):
+            bits |= _sector_codes[obj] << (SECTOR_BITS * i)
+        return cls(len(objects), bits)
+    
+    @classmethod
+    def from_board(cls, board):
+        """
+        Create a CompactBoard with the same objects as the Board board.
+        """
+        return cls.from_objects(board.objects)
+    
+    def to_board(self):
+        """
+        Create a Board with the same objects as this CompactBoard.
+        """
+        return Board(list(self))
+    
+    @property
+    def objects(self):
+        return list(self)
+    
+    def __str__(self):
+        return "".join("-" if obj is None else str(obj) for obj in self)
+    
+    def __repr__(self):
+        return "<CompactBoard " + str(self) + ">"
+    
+    def __len__(self):
+        return self.size
+    
+    def __iter__(self):
+        bits = self.bits
+        for i in range(self.size):
+            yield _sector_objects[bits & SECTOR_MASK]
+            bits >>= SECTOR_BITS
+            
+    def __getitem__(self, i):
+        x = i % self.size
+        return _sector_objects[(self.bits >> (SECTOR_BITS * x)) & SECTOR_MASK]
+    
+    def __setitem__(self, i, item):
+        shift = SECTOR_BITS * (i % self.size)
+        self.bits = (self.bits & ~(SECTOR_MASK << shift)) | (_sector_codes[item] << shift)
+        self.num_objs_valid = False
+        
+    def __eq__(self, other):
+        if (isinstance(other, self.__class__)):
+            return self.size == other.size and self.bits == other.bits
+        else:
+            return False
+       
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def __hash__(self):
+        return hash((self.size, self.bits))
+    
+    def mask(self, obj):
+        """
+        Returns an integer bitmask with bit i set if sector i contains the space object obj
+        (or is unassigned, if obj is None).
+        """
+        code = _sector_codes[obj]
+        bits = self.bits
+        mask = 0
+        for i in range(self.size):
+            if bits & SECTOR_MASK == code:
+                mask |= 1 << i
+            bits >>= SECTOR_BITS
+        return mask
+    
+    def check_constraints(self, constraints):
+        """
+        Checks if the board meets a set of constraints. Returns true if 
+        all constraints are met.
+        
+        constraints: A list of Constraint to check against.
+        """
+        for constraint in constraints:
+            if not constraint.is_satisfied(self):
+                return False
+        return True
+    
+    def copy(self):
+        """
+        Create a new CompactBoard with this same objects as this CompactBoard.
+        """
+        return CompactBoard(self.size, self.bits)
+    
+    def _calc_num_objects(self):
+        objects = {}
+        for obj in self:
+            if obj in objects:
+                objects[obj] += 1
+            else:
+                objects[obj] = 1
+        return objects
+    
+    def num_objects(self):
+        """
+        Returns a dictionary mapping SpaceObjects to the number of times that 
+        that SpaceObject appears in this board.
+        """
+        if not self.num_objs_valid:
+            self.num_objs = self._calc_num_objects()
+            self.num_objs_valid = True
+        return self.num_objs
+    
+    @classmethod
+    def parse(cls, board_string):
+        """
+        Creates a CompactBoard by parsing a board string.
+        
+        board_string: A string which contains initials for each space object in
+        the board, or - if that sector has not been assigned a space object yet.
+        """
+        objects = []
+        for char in board_string:
+            if char == "-":
+                objects.append(None)
+            else:
+                obj = SpaceObject.parse(char)
+                if obj is None:
+                    return None
+                objects.append(obj)
+        return cls.from_objects(objects)
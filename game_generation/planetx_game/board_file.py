@@ -0,0 +1,219 @@
+import mmap
+import os
+import struct
+
+from .board import Board, CompactBoard, SECTOR_BITS
+
+# Board files start with a header of the magic bytes, the format version, the number of
+# sectors on each board, and the number of boards in the file. Each board follows as a
+# fixed-width little-endian record of SECTOR_BITS bits per sector. The number of boards in
+# the header is only updated when the file is flushed or closed, so readers count the
+# records in the file instead, which also covers files left behind by a crashed run.
+MAGIC = b"PXBD"
+VERSION = 1
+HEADER = struct.Struct("<4sBHQ")
+
+def record_size(board_length):
+    """
+    Returns the number of bytes used to store one board with board_length sectors
+    """
+    return (board_length * SECTOR_BITS + 7) // 8
+
+def complete_boards(file_size, board_length):
+    """
+    Returns the number of boards completely written in a board file of file_size bytes. The
+    header is behind if the writer did not close the file, so the records are counted instead.
+
+    file_size: The size of the file in bytes
+    board_length: The number of sectors on each board
+    """
+    return max(0, file_size - HEADER.size) // record_size(board_length)
+
+def is_board_file(filename):
+    """
+    Returns true if filename is a binary board file, rather than a text file with one
+    board per line
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+class BoardFileWriter:
+    """
+    Writes boards to a binary board file
+    """
+    def __init__(self, filename, board_length, resume_boards=None):
+        """
+        Creates a new binary board file, overwriting any existing file.
+
+        filename: The name of the file to write
+        board_length: The number of sectors on each board
+        resume_boards: If provided, the existing file is kept up to its first 
+            resume_boards boards, and further boards are appended after them
+        """
+        self.board_length = board_length
+        self.record_size = record_size(board_length)
+        if resume_boards is None:
+            self.num_boards = 0
+            self.file = open(filename, "wb")
+        else:
+            self.num_boards = resume_boards
+            self.file = open(filename, "r+b")
+            self.file.truncate(HEADER.size + resume_boards * self.record_size)
+        self._write_header()
+        self.file.seek(0, os.SEEK_END)
+
+    def _write_header(self):
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.board_length, self.num_boards))
+
+    def write(self, board):
+        """
+        Appends a board to the file.
+
+        board: A Board, CompactBoard, or board string with board_length sectors
+        """
+        if isinstance(board, str):
+            board = CompactBoard.parse(board)
+        elif not isinstance(board, CompactBoard):
+            board = CompactBoard.from_objects(board)
+        self.file.write(board.bits.to_bytes(self.record_size, "little"))
+        self.num_boards += 1
+
+    def tell(self):
+        """
+        Returns the byte offset of the end of the boards written so far
+        """
+        return self.file.tell()
+
+    def flush(self):
+        """
+        Records the number of boards in the header and flushes the file
+        """
+        self._write_header()
+        self.file.seek(0, os.SEEK_END)
+        self.file.flush()
+
+    def close(self):
+        """
+        Records the number of boards in the header and closes the file
+        """
+        self._write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class TextBoardWriter:
+    """
+    Writes boards to a text file, one per line. Has the same interface as BoardFileWriter.
+    """
+    def __init__(self, filename, board_length, resume_boards=None, resume_offset=None):
+        self.board_length = board_length
+        if resume_boards is None:
+            self.num_boards = 0
+            self.file = open(filename, "wb")
+        else:
+            self.num_boards = resume_boards
+            self.file = open(filename, "r+b")
+            self.file.truncate(resume_offset)
+            self.file.seek(resume_offset)
+
+    def write(self, board):
+        self.file.write((str(board) + "\n").encode())
+        self.num_boards += 1
+
+    def tell(self):
+        return self.file.tell()
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def open_board_writer(filename, board_length, binary=False, resume_boards=None, resume_offset=None):
+    """
+    Opens a file to write boards to.
+
+    filename: The name of the file to write
+    board_length: The number of sectors on each board
+    binary: If true, writes a binary board file, otherwise writes one board per line
+    resume_boards: If provided, keeps the first resume_boards boards already in the file
+        and appends after them
+    resume_offset: With resume_boards, the byte offset of the end of those boards
+    """
+    if binary:
+        return BoardFileWriter(filename, board_length, resume_boards)
+    else:
+        return TextBoardWriter(filename, board_length, resume_boards, resume_offset)
+
+class BoardFileReader:
+    """
+    Reads boards from a binary board file by memory-mapping it, so that any board or
+    range of boards can be read without reading the rest of the file.
+    """
+    def __init__(self, filename, board_class=Board):
+        """
+        Opens a binary board file.
+
+        filename: The name of the file to read
+        board_class: The class (Board or CompactBoard) to return boards as
+        """
+        self.board_class = board_class
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.board_length, self.num_boards = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(filename + " is not a board file")
+        if version != VERSION:
+            raise ValueError("Unsupported board file version: " + str(version))
+
+        self.record_size = record_size(self.board_length)
+
+        self.num_boards = complete_boards(len(self.map), self.board_length)
+
+    def _read(self, i):
+        start = HEADER.size + i * self.record_size
+        bits = int.from_bytes(self.map[start:start + self.record_size], "little")
+        board = CompactBoard(self.board_length, bits)
+        if self.board_class is CompactBoard:
+            return board
+        else:
+            return board.to_board()
+
+    def __len__(self):
+        return self.num_boards
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._read(j) for j in range(*i.indices(self.num_boards))]
+
+        if i < 0:
+            i += self.num_boards
+        if i < 0 or i >= self.num_boards:
+            raise IndexError("board index out of range")
+        return self._read(i)
+
+    def __iter__(self):
+        for i in range(self.num_boards):
+            yield self._read(i)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+
+class ConnectionPool:
+    """
+    Hands out database connections to at most size users at a time. A checkout waits for a
+    connection to be returned when they are all in use, and raises a TimeoutError if none is
+    returned in time, rather than failing at once or waiting forever. Checked out connections
+    are always returned, even when the work done with them fails, and the pool keeps gauges
+    of how many are in use and how long checkouts wait.
+    """
+    def __init__(self, connect, size=None, timeout=None):
+        """
+        Creates a ConnectionPool.
+
+        connect: A function returning a connection, such as DatabaseBackend.connect. Closing
+            the connection returns it to wherever it came from.
+        size: The number of connections which can be checked out at once, or None for no limit
+        timeout: The number of seconds to wait for a connection before raising a TimeoutError,
+            or None to wait forever
+        """
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size) if size is not None else None
+        self._lock = threading.Lock()
+
+        self.in_use = 0
+        self.max_in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _acquire(self):
+        """
+        Waits for a free connection slot.
+        """
+        start = time.perf_counter()
+        if self._slots is not None:
+            if self.timeout is None:
+                acquired = self._slots.acquire()
+            else:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            if not acquired:
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError("Timed out after " + str(self.timeout) + "s waiting for one of " +
+                                   str(self.size) + " database connections")
+        wait = time.perf_counter() - start
+
+        with self._lock:
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def _release(self):
+        """
+        Frees a connection slot.
+        """
+        with self._lock:
+            self.in_use -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Checks out a connection for the body of a with statement, and returns it at the end.
+        If the body raises an exception, the connection's transaction is rolled back first.
+        """
+        self._acquire()
+        try:
+            cxn = self.connect()
+        except BaseException:
+            self._release()
+            raise
+
+        try:
+            yield cxn
+        except BaseException:
+            cxn.rollback()
+            raise
+        finally:
+            try:
+                cxn.close()
+            finally:
+                self._release()
+
+    def stats(self):
+        """
+        Returns a dictionary of the number of connections in use (now and at most), the size
+        limit, the number of checkouts and timeouts, and the mean and longest checkout wait
+        in seconds.
+        """
+        with self._lock:
+            return {"in_use": self.in_use, "max_in_use": self.max_in_use, "size": self.size,
+                    "checkouts": self.checkouts, "timeouts": self.timeouts,
+                    "mean_wait": self.total_wait / self.checkouts if self.checkouts > 0 else 0.0,
+                    "max_wait": self.max_wait}
+
+class AsyncConnectionPool:
+    """
+    The asyncio counterpart of ConnectionPool, for the connections of an async database driver.
+    The pool keeps the connections it opens and hands idle ones out again, so at most size are
+    ever open. A checkout waits in the event loop, holding no thread, for a connection to be
+    returned when they are all in use, and raises a TimeoutError if none is returned in time.
+    A pool belongs to the event loop it is used in, like the connections it holds.
+    """
+    def __init__(self, connect, size=None, timeout=None):
+        """
+        Creates an AsyncConnectionPool.
+
+        connect: A coroutine function opening a new connection, such as
+            DatabaseBackend.connect_async. Its connections have coroutine rollback and close
+            methods, and a discard method which closes them without waiting.
+        size: The number of connections which can be checked out at once, or None for no limit
+        timeout: The number of seconds to wait for a connection before raising a TimeoutError,
+            or None to wait forever
+        """
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(size) if size is not None else None
+        self._idle = []
+        self._closed = False
+
+        self.in_use = 0
+        self.max_in_use = 0
+        self.opened = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def _acquire(self):
+        """
+        Waits for a free connection slot.
+        """
+        start = time.perf_counter()
+        if self._slots is not None:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise TimeoutError("Timed out after " + str(self.timeout) + "s waiting for one of " +
+                                   str(self.size) + " database connections")
+        wait = time.perf_counter() - start
+
+        self.in_use += 1
+        self.max_in_use = max(self.max_in_use, self.in_use)
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def _release(self):
+        """
+        Frees a connection slot.
+        """
+        self.in_use -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def checkout(self):
+        """
+        Checks out a connection for the body of an async with statement, and returns it to the
+        pool at the end. Whatever the body did not commit is rolled back first, so the next
+        checkout starts afresh; a connection which cannot be rolled back is closed instead.
+        """
+        if self._closed:
+            raise ValueError("The connection pool is closed")
+
+        await self._acquire()
+        try:
+            if len(self._idle) > 0:
+                cxn = self._idle.pop()
+            else:
+                cxn = await self.connect()
+                self.opened += 1
+        except BaseException:
+            self._release()
+            raise
+
+        try:
+            yield cxn
+        finally:
+            try:
+                await cxn.rollback()
+            except Exception:
+                cxn.discard()
+                cxn = None
+
+            try:
+                if cxn is not None and self._closed:
+                    await cxn.close()
+                elif cxn is not None:
+                    self._idle.append(cxn)
+            finally:
+                self._release()
+
+    async def close(self):
+        """
+        Closes the idle connections, and each checked out connection when it is returned.
+        """
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for cxn in idle:
+            await cxn.close()
+
+    def discard(self):
+        """
+        Closes the idle connections without waiting, for a pool whose event loop has ended.
+        """
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for cxn in idle:
+            cxn.discard()
+
+    def stats(self):
+        """
+        Returns a dictionary of the number of connections in use (now and at most), idle and
+        ever opened, the size limit, the number of checkouts and timeouts, and the mean and longest
+        checkout wait in seconds.
+        """
+        return {"in_use": self.in_use, "max_in_use": self.max_in_use, "idle": len(self._idle),
+                "opened": self.opened, "size": self.size, "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "mean_wait": self.total_wait / self.checkouts if self.checkouts > 0 else 0.0,
+                "max_wait": self.max_wait}
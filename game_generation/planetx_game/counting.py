@@ -0,0 +1,320 @@
+import random
+
+from .rules import *
+from .board import Board
+
+class BoardCounter:
+    """
+    Counts the distinct boards of a BoardType exactly, without generating them. This can be
+    fewer than the number of boards BoardType.generate_all_boards produces, since the
+    generators can produce the same board more than once (e.g. a gas cloud which every
+    rule requires next to an empty sector, with empty sectors on both sides).
+
+    The board is swept sector by sector, keeping track only of the space objects left
+    to place, the object in the previous sector, and which of that object's adjacency
+    requirements are still unmet. Every constraint of a BoardType can be checked with
+    this state, except for band rules, which are handled by splitting the boards up by
+    where their band starts (an "anchor"). The number of boards reachable from each
+    state is memoized, so the whole count takes on the order of the number of distinct
+    states rather than the number of boards.
+    """
+    def __init__(self, constraints, num_objects, board_length):
+        """
+        Creates a BoardCounter for boards following a set of constraints.
+
+        constraints: A list of constraints the boards must follow
+        num_objects: A dictionary mapping space objects to the number of that space
+            object that must appear on the board
+        board_length: The number of sectors on the board
+        """
+        if board_length < 3:
+            raise ValueError("Boards must have at least 3 sectors to be counted")
+
+        self.board_length = board_length
+        self.space_objects = sorted(num_objects, key=lambda obj: obj.value)
+        self.num_objects = [num_objects[obj] for obj in self.space_objects]
+
+        # Remaining objects are stored as a single number, with one digit for each
+        # space object
+        self._radix = []
+        radix = 1
+        for num_object in self.num_objects:
+            self._radix.append(radix)
+            radix *= num_object + 1
+        self._num_states = radix
+
+        self._parse_constraints(constraints)
+        self._memo = {}
+        self._start_offsets = None
+        self._total = None
+
+    def _parse_constraints(self, constraints):
+        """
+        Translates constraints into masks of objects allowed in each sector, pairs of objects
+        that may not be adjacent, and objects which must be adjacent to another object.
+        """
+        n = self.board_length
+        num_types = len(self.space_objects)
+        index = { obj: k for k, obj in enumerate(self.space_objects) }
+
+        # forbidden[k]: mask of objects that may not be adjacent to object k
+        self._forbidden = [0] * num_types
+        # needs[k]: mask of objects that object k must each be adjacent to
+        self._needs = [0] * num_types
+        allowed = [(1 << num_types) - 1] * n
+        band_rules = []
+
+        for constraint in constraints:
+            if isinstance(constraint, SectorsRule):
+                k = index[constraint.space_object]
+                for i in range(n):
+                    if i not in constraint.positions:
+                        allowed[i] &= ~(1 << k)
+            elif isinstance(constraint, AdjacentSelfRule) and constraint.qualifier is not RuleQualifier.AT_LEAST_ONE:
+                k = index[constraint.space_object]
+                if constraint.qualifier is RuleQualifier.NONE:
+                    self._forbidden[k] |= 1 << k
+                else:
+                    self._needs[k] |= 1 << k
+            elif isinstance(constraint, AdjacentRule) and constraint.qualifier is not RuleQualifier.AT_LEAST_ONE:
+                k1 = index[constraint.space_object1]
+                k2 = index[constraint.space_object2]
+                if constraint.qualifier is RuleQualifier.NONE:
+                    self._forbidden[k1] |= 1 << k2
+                    self._forbidden[k2] |= 1 << k1
+                else:
+                    self._needs[k1] |= 1 << k2
+            elif isinstance(constraint, BandRule):
+                band_rules.append(constraint)
+            else:
+                raise ValueError("Cannot count boards with constraint: " + str(constraint))
+
+        if len(band_rules) > 1:
+            raise ValueError("Cannot count boards with more than one band rule")
+
+        # Each anchor is a tuple of the sector the sweep starts in, and the masks of
+        # objects allowed in each sector in sweep order
+        self._anchors = []
+        if len(band_rules) == 0:
+            self._anchors.append((0, allowed))
+        else:
+            band_rule = band_rules[0]
+            k = index[band_rule.space_object]
+            num_object = self.num_objects[k]
+            if band_rule.precision is Precision.STRICT:
+                band_sizes = [ band_rule.band_size ]
+            else:
+                band_sizes = list(range(max(num_object, 1), band_rule.band_size + 1))
+
+            for band_size in band_sizes:
+                # The band is only unique if the gap outside of it is longer than any gap
+                # inside of it. Otherwise boards would be counted once per band.
+                if 2 * band_size - 2 >= n:
+                    raise ValueError("Cannot count boards with a band of " + str(band_size) +
+                                     " in " + str(n) + " sectors")
+                if num_object < 2 and band_size != num_object:
+                    continue
+
+                for start in range(n):
+                    band = {(start + j) % n for j in range(band_size)}
+                    band_allowed = []
+                    for j in range(n):
+                        i = (start + j) % n
+                        if i not in band:
+                            band_allowed.append(allowed[i] & ~(1 << k))
+                        elif j == 0 or j == band_size - 1:
+                            band_allowed.append(allowed[i] & (1 << k))
+                        else:
+                            band_allowed.append(allowed[i])
+                    self._anchors.append((start, band_allowed))
+
+    def _available(self, remaining, k):
+        """
+        Returns the number of object k left to place in remaining
+        """
+        return (remaining // self._radix[k]) % (self.num_objects[k] + 1)
+
+    def _choices(self, anchor, i, prev, unmet, remaining):
+        """
+        Yields each object that can be placed in sweep position i, as a tuple of its index
+        and the state after placing it.
+
+        anchor: The index of the anchor being swept
+        i: The sweep position to fill
+        prev: The index of the object in the previous sweep position
+        unmet: A mask of objects that prev must be adjacent to, but is not yet
+        remaining: The objects left to place
+        """
+        allowed = self._anchors[anchor][1][i]
+        forbidden = self._forbidden[prev]
+        for k in range(len(self.space_objects)):
+            if allowed >> k & 1 and not forbidden >> k & 1 and unmet & ~(1 << k) == 0 \
+            and self._available(remaining, k) > 0:
+                yield k, (self._needs[k] & ~(1 << prev), remaining - self._radix[k])
+
+    def _count(self, anchor, first, first_unmet, i, prev, unmet, remaining):
+        """
+        Counts the ways to fill sweep positions i and onwards.
+
+        anchor: The index of the anchor being swept
+        first: The index of the object in sweep position 0
+        first_unmet: A mask of objects that first must be adjacent to, but is not yet
+        i: The sweep position to fill
+        prev: The index of the object in the previous sweep position
+        unmet: A mask of objects that prev must be adjacent to, but is not yet
+        remaining: The objects left to place
+        """
+        num_types = len(self.space_objects)
+        key = (((((remaining * self.board_length + i) * num_types + prev) << num_types | unmet)
+                << num_types | first_unmet) * num_types + first) * len(self._anchors) + anchor
+        if key in self._memo:
+            return self._memo[key]
+
+        if i == self.board_length:
+            # Wrap around to the first sector
+            count = int(not self._forbidden[prev] >> first & 1 and unmet & ~(1 << first) == 0
+                        and first_unmet & ~(1 << prev) == 0)
+        else:
+            count = 0
+            for k, (next_unmet, next_remaining) in self._choices(anchor, i, prev, unmet, remaining):
+                count += self._count(anchor, first, first_unmet, i+1, k, next_unmet, next_remaining)
+
+        self._memo[key] = count
+        return count
+
+    def _starts(self, anchor):
+        """
+        Yields each way to fill the first two sweep positions for an anchor, as a tuple of
+        the objects in those positions and the arguments to _count for the rest of the sweep.
+        """
+        allowed = self._anchors[anchor][1]
+        remaining = self._num_states - 1
+        for first in range(len(self.space_objects)):
+            if not allowed[0] >> first & 1 or self.num_objects[first] == 0:
+                continue
+            for second, (unmet, next_remaining) in self._choices(anchor, 1, first, 0, remaining - self._radix[first]):
+                first_unmet = self._needs[first] & ~(1 << second)
+                yield (first, second), (anchor, first, first_unmet, 2, second, unmet, next_remaining)
+
+    def _start_table(self):
+        """
+        Returns a list of every way to start the sweep, over every anchor in order, as tuples
+        of the objects in the first two sweep positions, the arguments to _count for the
+        rest of the sweep, and the number of boards before that start. Boards are numbered
+        in this order by rank and unrank.
+        """
+        if self._start_offsets is None:
+            self._start_offsets = []
+            offset = 0
+            for anchor in range(len(self._anchors)):
+                for start, state in self._starts(anchor):
+                    self._start_offsets.append((start, state, offset))
+                    offset += self._count(*state)
+            self._total = offset
+        return self._start_offsets
+
+    def count(self):
+        """
+        Returns the number of distinct boards meeting the constraints.
+        """
+        self._start_table()
+        return self._total
+
+    def sample(self, rng=random):
+        """
+        Returns a Board chosen uniformly at random from all boards meeting the constraints.
+        
+        rng: The random number generator to use
+        """
+        total = self.count()
+        if total == 0:
+            return None
+        return self.unrank(rng.randrange(total))
+
+    def unrank(self, r):
+        """
+        Returns the board with rank r, i.e. the r-th of the boards meeting the constraints.
+
+        r: The rank of the board, from 0 up to (but not including) count()
+        """
+        if r < 0 or r >= self.count():
+            raise IndexError("board rank out of range")
+
+        # Find the start the board is built from, i.e. the last one at or before r
+        starts = self._start_table()
+        lo, hi = 0, len(starts) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if starts[mid][2] <= r:
+                lo = mid
+            else:
+                hi = mid - 1
+        start, state, offset = starts[lo]
+        return self._walk(start, state, r - offset)
+
+    def rank(self, board):
+        """
+        Returns the rank of a board meeting the constraints, so that unrank(rank(board)) == board.
+        Raises a ValueError if the board does not meet the constraints or does not have the
+        right number of each space object.
+
+        board: A full Board or CompactBoard
+        """
+        if len(board) != self.board_length:
+            raise ValueError("Board has " + str(len(board)) + " sectors, not " + str(self.board_length))
+        index = { obj: k for k, obj in enumerate(self.space_objects) }
+        if any(obj not in index for obj in board):
+            raise ValueError("Board has space objects which are not on boards of this type: " + str(board))
+
+        for start, state, offset in self._start_table():
+            anchor, first, first_unmet, i, prev, unmet, remaining = state
+            # The board is swept from the anchor's first sector
+            sweep = [index[board[self._anchors[anchor][0] + j]] for j in range(self.board_length)]
+            if tuple(sweep[:2]) != start:
+                continue
+
+            # Each board meets the constraints from at most one anchor, so this is the only
+            # start it can be built from
+            r = offset
+            while i < self.board_length:
+                for k, (next_unmet, next_remaining) in self._choices(anchor, i, prev, unmet, remaining):
+                    if k == sweep[i]:
+                        break
+                    # Skip the boards with an earlier object in this sweep position
+                    r += self._count(anchor, first, first_unmet, i+1, k, next_unmet, next_remaining)
+                else:
+                    break
+                i, prev, unmet, remaining = i+1, k, next_unmet, next_remaining
+            else:
+                # The board is only valid if it wraps around to the first sector correctly
+                if self._count(anchor, first, first_unmet, i, prev, unmet, remaining) == 1:
+                    return r
+
+        raise ValueError("Board does not meet the constraints: " + str(board))
+    
+    def _walk(self, start, state, r):
+        """
+        Builds the r-th board, in sweep order, among the boards that can be built from a state.
+        
+        start: The indices of the objects in the first two sweep positions
+        state: The arguments to _count for the rest of the sweep
+        r: The index of the board to build
+        """
+        anchor, first, first_unmet, i, prev, unmet, remaining = state
+        sweep = list(start)
+        
+        while i < self.board_length:
+            for k, (next_unmet, next_remaining) in self._choices(anchor, i, prev, unmet, remaining):
+                count = self._count(anchor, first, first_unmet, i+1, k, next_unmet, next_remaining)
+                if r < count:
+                    break
+                r -= count
+            sweep.append(k)
+            i, prev, unmet, remaining = i+1, k, next_unmet, next_remaining
+            
+        # Rotate the sweep back so that it starts at the first sector
+        offset = self._anchors[anchor][0]
+        objects = [None] * self.board_length
+        for j, k in enumerate(sweep):
+            objects[(offset + j) % self.board_length] = self.space_objects[k]
+        return Board(objects)
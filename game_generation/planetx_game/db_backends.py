@@ -0,0 +1,581 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+from .migrations import migrate
+
+dirname = os.path.dirname(__file__)
+
+# The columns of the games table, in the order they are inserted
+GAME_COLUMNS = ["game_code", "board_size", "board_objects", "research", "conference", "starting_information"]
+
+class DatabaseBackend:
+    """
+    A database to keep games and sessions in. The queries in db_ops are written for MySQL,
+    with %s placeholders. A backend provides connections which accept them, and carries out
+    the few operations that differ between databases.
+    """
+    name = None
+    # The number of connections which can be in use at once (None for no limit), and the
+    # number of seconds to wait for one before giving up (None to wait forever)
+    pool_size = None
+    pool_timeout = None
+
+    def connect(self):
+        """
+        Returns a connection to the database, with cursor, commit, rollback, start_transaction
+        and close methods like a mysql.connector connection.
+        """
+        raise NotImplementedError
+
+    def forget_connections(self):
+        """
+        Drops any connections inherited by a forked process, whose connections belong to the
+        parent process.
+        """
+        pass
+
+    async def connect_async(self):
+        """
+        Opens a new connection to the database through the backend's asyncio driver, for an
+        AsyncConnectionPool. Its cursor, commit, rollback, start_transaction and close methods
+        are coroutines, as are its cursors' execute, fetch and close methods, and its discard
+        method closes it without waiting.
+        """
+        raise NotImplementedError
+
+    def truncate(self, cursor, table):
+        """
+        Removes every row from a table, and restarts its ids.
+        """
+        raise NotImplementedError
+
+    def execute_ddl(self, cursor, statement):
+        """
+        Executes a statement from a schema migration. A statement creating an index or procedure
+        which already exists does nothing, so that a migration can be applied to a database
+        made before migrations were kept.
+        """
+        cursor.execute(statement)
+
+    def full_scans(self, cursor, query, params=()):
+        """
+        Returns the list of tables a query would read in full, rather than looking up rows
+        through an index, according to the database's query plan.
+        """
+        raise NotImplementedError
+
+    def defer_checks(self, cursor):
+        """
+        Turns off the checks which can be skipped while loading many games, so that indexes
+        are updated in bulk rather than checked row by row. The game codes are already known
+        to be unique.
+        """
+        pass
+
+    def restore_checks(self, cursor):
+        """
+        Turns the checks back on after defer_checks.
+        """
+        pass
+
+    def new_player(self, cursor, session_code, name):
+        """
+        Adds a player to the session with a session code (the NewPlayer procedure). Returns
+        a tuple of the session id, the player's number and the player's id.
+        """
+        raise NotImplementedError
+
+    def move_player(self, cursor, player_id, sectors):
+        """
+        Moves a player forward a number of sectors, arriving after every other player already
+        in the sector it lands in (the MovePlayer procedure).
+        """
+        raise NotImplementedError
+
+    async def new_player_async(self, cursor, session_code, name):
+        """
+        new_player, with a cursor of a connection from connect_async.
+        """
+        raise NotImplementedError
+
+    async def move_player_async(self, cursor, player_id, sectors):
+        """
+        move_player, with a cursor of a connection from connect_async.
+        """
+        raise NotImplementedError
+
+    def load_games_tsv(self, tsv_filename):
+        """
+        Adds the games in a tab separated file, with a row of GAME_COLUMNS on each line, with
+        checks deferred. Returns the number of games added.
+        """
+        raise NotImplementedError
+
+    def state_filename(self, name):
+        """
+        Returns the name of a file to keep state about this database in, such as the game
+        code allocator.
+        """
+        raise NotImplementedError
+
+# The database is only connected to when it is first used, so that tools which never use it
+# start without mysql-connector, credentials, or a reachable database. Each setting can come
+# from an environment variable, falling back to the credentials file.
+DB_ENVIRONMENT = {
+    "host": ("PLANETX_DB_HOST", "hostname"),
+    "user": ("PLANETX_DB_USER", "username"),
+    "password": ("PLANETX_DB_PASSWORD", "password"),
+    "database": ("PLANETX_DB_NAME", "database")
+}
+
+def db_config():
+    """
+    Returns the settings to connect to the MySQL database with. Each of host, user, password
+    and database is taken from its environment variable (PLANETX_DB_HOST, PLANETX_DB_USER,
+    PLANETX_DB_PASSWORD, PLANETX_DB_NAME) if it is set, and otherwise from the credentials
+    file: PLANETX_DB_CREDS, or creds.json next to this module.
+    """
+    config = {key: os.environ.get(variable) for key, (variable, creds_key) in DB_ENVIRONMENT.items()}
+
+    if any(value is None for value in config.values()):
+        credsfile = os.environ.get("PLANETX_DB_CREDS", os.path.join(dirname, "creds.json"))
+        with open(credsfile, "r") as f:
+            creds = json.load(f)
+        for key, (variable, creds_key) in DB_ENVIRONMENT.items():
+            if config[key] is None:
+                config[key] = creds[creds_key]
+
+    return config
+
+# NewPlayer gives the player's number and id, as node_server expects, and the session id is
+# looked up from the new player
+_mysql_new_player_query = "CALL NewPlayer(%s, %s, @PlayerNum, @PlayerID)"
+_mysql_new_player_result_query = "SELECT session_id, @PlayerNum, @PlayerID FROM players WHERE id = @PlayerID"
+
+class MySQLBackend(DatabaseBackend):
+    """
+    The MySQL database, with the NewPlayer and MovePlayer stored procedures.
+    """
+    name = "mysql"
+
+    def __init__(self, config=None, pool_size=None, pool_timeout=None):
+        """
+        Creates a MySQLBackend. Nothing is connected to until the first connection is needed.
+
+        config: The host, user, password and database to connect with, or None for db_config()
+        pool_size: The number of pooled connections, or None for PLANETX_DB_POOL_SIZE (default: 3)
+        pool_timeout: The number of seconds to wait for a pooled connection when they are all
+            in use, or None for PLANETX_DB_POOL_TIMEOUT (default: 10)
+        """
+        self._config = config
+        self.pool_size = pool_size if pool_size is not None else int(os.environ.get("PLANETX_DB_POOL_SIZE", 3))
+        self.pool_timeout = pool_timeout if pool_timeout is not None else float(os.environ.get("PLANETX_DB_POOL_TIMEOUT", 10))
+        self._cnxpool = None
+        self._pool_lock = threading.Lock()
+
+    def config(self):
+        """
+        Returns the settings to connect to the database with.
+        """
+        if self._config is None:
+            self._config = db_config()
+        return self._config
+
+    def connect(self):
+        with self._pool_lock:
+            if self._cnxpool is None:
+                import mysql.connector.pooling
+                self._cnxpool = mysql.connector.pooling.MySQLConnectionPool(pool_name = "mypool",
+                                                                           pool_size = self.pool_size,
+                                                                           **self.config())
+        return self._cnxpool.get_connection()
+
+    def forget_connections(self):
+        self._cnxpool = None
+
+    async def connect_async(self):
+        import aiomysql
+        config = self.config()
+        cxn = await aiomysql.connect(host=config["host"], user=config["user"], password=config["password"],
+                                     db=config["database"])
+        return _AsyncMySQLConnection(cxn)
+
+    def truncate(self, cursor, table):
+        cursor.execute("TRUNCATE TABLE " + table)
+
+    def execute_ddl(self, cursor, statement):
+        import mysql.connector
+        try:
+            cursor.execute(statement)
+        except mysql.connector.Error as e:
+            # MySQL has no IF NOT EXISTS for indexes and procedures, so ignore duplicate key
+            # names (1061) and procedures which already exist (1304)
+            if e.errno not in (1061, 1304):
+                raise
+
+    def full_scans(self, cursor, query, params=()):
+        cursor.execute("EXPLAIN " + query, params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        # ALL reads every row of the table, and index reads every entry of an index
+        return [row["table"] for row in rows if row["type"] in ("ALL", "index")]
+
+    def defer_checks(self, cursor):
+        cursor.execute("SET unique_checks = 0")
+        cursor.execute("SET foreign_key_checks = 0")
+
+    def restore_checks(self, cursor):
+        cursor.execute("SET unique_checks = 1")
+        cursor.execute("SET foreign_key_checks = 1")
+
+    def new_player(self, cursor, session_code, name):
+        cursor.execute(_mysql_new_player_query, (session_code, name,))
+        cursor.execute(_mysql_new_player_result_query)
+        return cursor.fetchone()
+
+    def move_player(self, cursor, player_id, sectors):
+        cursor.execute("CALL MovePlayer(%s, %s)", (player_id, sectors))
+
+    async def new_player_async(self, cursor, session_code, name):
+        await cursor.execute(_mysql_new_player_query, (session_code, name,))
+        await cursor.execute(_mysql_new_player_result_query)
+        return await cursor.fetchone()
+
+    async def move_player_async(self, cursor, player_id, sectors):
+        await cursor.execute("CALL MovePlayer(%s, %s)", (player_id, sectors))
+
+    def load_games_tsv(self, tsv_filename):
+        load_query = ("LOAD DATA LOCAL INFILE %s INTO TABLE games "
+                      "FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+                      "(" + ", ".join(GAME_COLUMNS) + ")")
+
+        # Pooled connections do not allow local files, so this needs its own connection
+        import mysql.connector
+        cxn = mysql.connector.connect(allow_local_infile=True, **self.config())
+        cursor = cxn.cursor()
+
+        try:
+            self.defer_checks(cursor)
+            cursor.execute(load_query, (os.path.abspath(tsv_filename),))
+            num_games = cursor.rowcount
+            cxn.commit()
+        except Exception:
+            cxn.rollback()
+            raise
+        finally:
+            self.restore_checks(cursor)
+            cursor.close()
+            cxn.close()
+
+        return num_games
+
+    def state_filename(self, name):
+        # Next to the database credentials
+        return os.path.join(dirname, name)
+
+class _AsyncMySQLConnection:
+    """
+    An aiomysql connection with the interface of DatabaseBackend.connect_async.
+    """
+    def __init__(self, cxn):
+        self._cxn = cxn
+
+    async def cursor(self):
+        return await self._cxn.cursor()
+
+    async def start_transaction(self):
+        await self._cxn.begin()
+
+    async def commit(self):
+        await self._cxn.commit()
+
+    async def rollback(self):
+        await self._cxn.rollback()
+
+    async def close(self):
+        await self._cxn.ensure_closed()
+
+    def discard(self):
+        self._cxn.close()
+
+# Resolve times are kept as ISO 8601 text, and read back as datetimes
+sqlite3.register_adapter(datetime, lambda time: time.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+class _SQLiteCursor:
+    """
+    A sqlite3 cursor which accepts queries with %s placeholders.
+    """
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(query.replace("%s", "?"), params)
+
+    def executemany(self, query, values):
+        return self._cursor.executemany(query.replace("%s", "?"), values)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _SQLiteConnection:
+    """
+    A sqlite3 connection with the interface of a pooled mysql.connector connection. Closing it
+    returns it to its SQLiteBackend rather than closing it.
+    """
+    def __init__(self, cxn):
+        self._cxn = cxn
+
+    def cursor(self):
+        return _SQLiteCursor(self._cxn.cursor())
+
+    def start_transaction(self):
+        # sqlite3 starts a transaction at the first change, which lasts until commit
+        pass
+
+    def commit(self):
+        self._cxn.commit()
+
+    def rollback(self):
+        self._cxn.rollback()
+
+    def close(self):
+        pass
+
+# The queries of the NewPlayer and MovePlayer procedures, carried out by SQLiteBackend
+_session_id_query = "SELECT id FROM sessions WHERE session_code = %s"
+_player_count_query = "SELECT COUNT(*) FROM players WHERE session_id = %s"
+_insert_player_query = "INSERT INTO players (session_id, num, name, sector, arrival) VALUES (%s, %s, %s, 0, %s)"
+_player_position_query = ("SELECT players.session_id, players.sector, sessions.game_size FROM players, sessions "
+                          "WHERE players.session_id = sessions.id AND players.id = %s")
+_last_arrival_query = "SELECT COALESCE(MAX(arrival), 0) FROM players WHERE session_id = %s AND sector = %s AND id != %s"
+_place_player_query = "UPDATE players SET sector = %s, arrival = %s WHERE id = %s"
+
+def _session_id(row, session_code):
+    """
+    Returns the session id from a row of _session_id_query, raising a ValueError if there was
+    no session with the code
+    """
+    if row is None:
+        raise ValueError("No session with code " + str(session_code))
+    return row[0]
+
+def _new_sector(row, player_id, sectors):
+    """
+    Returns a tuple of the session id and the sector a player lands in after moving, from a row
+    of _player_position_query, raising a ValueError if there was no player with the id
+    """
+    if row is None:
+        raise ValueError("No player with id " + str(player_id))
+    session_id, sector, game_size = row
+    return session_id, (sector + sectors) % game_size
+
+class _AsyncSQLiteCursor:
+    """
+    An aiosqlite cursor which accepts queries with %s placeholders.
+    """
+    def __init__(self, cursor, cxn):
+        self._cursor = cursor
+        self.connection = cxn
+
+    async def execute(self, query, params=()):
+        return await self._cursor.execute(query.replace("%s", "?"), params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _AsyncSQLiteConnection:
+    """
+    An aiosqlite connection with the interface of DatabaseBackend.connect_async. aiosqlite runs
+    each connection's calls on a thread of its own.
+    """
+    def __init__(self, cxn):
+        self._cxn = cxn
+
+    @property
+    def in_transaction(self):
+        return self._cxn.in_transaction
+
+    async def cursor(self):
+        return _AsyncSQLiteCursor(await self._cxn.cursor(), self)
+
+    async def start_transaction(self):
+        pass
+
+    async def commit(self):
+        await self._cxn.commit()
+
+    async def rollback(self):
+        await self._cxn.rollback()
+
+    async def close(self):
+        await self._cxn.close()
+
+    def discard(self):
+        self._cxn.stop()
+
+class SQLiteBackend(DatabaseBackend):
+    """
+    An embedded SQLite database, with the same tables as the MySQL database and the NewPlayer
+    and MovePlayer procedures carried out in Python. Each thread has its own connection.
+    """
+    name = "sqlite"
+
+    def __init__(self, path=":memory:"):
+        """
+        Creates a SQLiteBackend, bringing the database's schema up to date with the migrations.
+
+        path: The database file, or ":memory:" for a database which lasts as long as the backend
+        """
+        self.path = path
+        self._state_dir = None
+        self._local = threading.local()
+        if path == ":memory:":
+            # Every connection shares the one in-memory database, which lasts as long as a
+            # connection to it is open. Connections sharing a cache fail rather than wait when
+            # another holds a lock, so only one is used at a time.
+            self._uri = "file:planetx_" + str(id(self)) + "?mode=memory&cache=shared"
+            self.pool_size = 1
+            self.pool_timeout = 10
+        else:
+            self._uri = "file:" + os.path.abspath(path)
+        self._keeper = self._open()
+        migrate(self, _SQLiteConnection(self._keeper))
+
+    def _open(self):
+        cxn = sqlite3.connect(self._uri, uri=True, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        cxn.execute("PRAGMA journal_mode = WAL")
+        cxn.execute("PRAGMA synchronous = NORMAL")
+        return cxn
+
+    def connect(self):
+        cxn = getattr(self._local, "cxn", None)
+        if cxn is None:
+            cxn = _SQLiteConnection(self._open())
+            self._local.cxn = cxn
+        return cxn
+
+    def forget_connections(self):
+        self._local = threading.local()
+
+    async def connect_async(self):
+        import aiosqlite
+        cxn = await aiosqlite.connect(self._uri, uri=True, detect_types=sqlite3.PARSE_DECLTYPES)
+        await cxn.execute("PRAGMA synchronous = NORMAL")
+        return _AsyncSQLiteConnection(cxn)
+
+    def truncate(self, cursor, table):
+        cursor.execute("DELETE FROM " + table)
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = %s", (table,))
+
+    def full_scans(self, cursor, query, params=()):
+        # An EXPLAIN is not prepared again when the schema changes, so one reused from the
+        # connection's statement cache would give the plan from before. Naming the schema
+        # version makes the statement new whenever the schema changes.
+        cursor.execute("PRAGMA schema_version")
+        schema_version = cursor.fetchone()[0]
+        cursor.execute("EXPLAIN QUERY PLAN /* schema " + str(schema_version) + " */ " + query, params)
+        # Each step of the plan either SEARCHes a table through an index or SCANs all of it
+        # (or all of an index, which reads as many rows)
+        details = [row[3] for row in cursor.fetchall()]
+        return [detail.split()[1] for detail in details
+                if detail.startswith("SCAN ") and detail != "SCAN CONSTANT ROW"]
+
+    def _begin(self, cursor):
+        """
+        Starts a transaction which holds the write lock, so a procedure's reads and writes
+        are not interleaved with another connection's.
+        """
+        if not cursor.connection.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+
+    async def _begin_async(self, cursor):
+        """
+        _begin, with a cursor of a connection from connect_async.
+        """
+        if not cursor.connection.in_transaction:
+            await cursor.execute("BEGIN IMMEDIATE")
+
+    def new_player(self, cursor, session_code, name):
+        self._begin(cursor)
+        cursor.execute(_session_id_query, (session_code,))
+        session_id = _session_id(cursor.fetchone(), session_code)
+
+        # Players are numbered from 1 in the order they join, and start in sector 0 in that order
+        cursor.execute(_player_count_query, (session_id,))
+        player_num = cursor.fetchone()[0] + 1
+        cursor.execute(_insert_player_query, (session_id, player_num, name, player_num))
+        return session_id, player_num, cursor.lastrowid
+
+    async def new_player_async(self, cursor, session_code, name):
+        await self._begin_async(cursor)
+        await cursor.execute(_session_id_query, (session_code,))
+        session_id = _session_id(await cursor.fetchone(), session_code)
+
+        await cursor.execute(_player_count_query, (session_id,))
+        player_num = (await cursor.fetchone())[0] + 1
+        await cursor.execute(_insert_player_query, (session_id, player_num, name, player_num))
+        return session_id, player_num, cursor.lastrowid
+
+    def move_player(self, cursor, player_id, sectors):
+        self._begin(cursor)
+        cursor.execute(_player_position_query, (player_id,))
+        session_id, new_sector = _new_sector(cursor.fetchone(), player_id, sectors)
+
+        cursor.execute(_last_arrival_query, (session_id, new_sector, player_id))
+        arrival = cursor.fetchone()[0] + 1
+        cursor.execute(_place_player_query, (new_sector, arrival, player_id))
+
+    async def move_player_async(self, cursor, player_id, sectors):
+        await self._begin_async(cursor)
+        await cursor.execute(_player_position_query, (player_id,))
+        session_id, new_sector = _new_sector(await cursor.fetchone(), player_id, sectors)
+
+        await cursor.execute(_last_arrival_query, (session_id, new_sector, player_id))
+        arrival = (await cursor.fetchone())[0] + 1
+        await cursor.execute(_place_player_query, (new_sector, arrival, player_id))
+
+    def load_games_tsv(self, tsv_filename):
+        # SQLite has no bulk file loader, but inserting every row in one transaction is as fast
+        cxn = self.connect()
+        cursor = cxn.cursor()
+        insert_query = ("INSERT INTO games (" + ", ".join(GAME_COLUMNS) + ") "
+                        "VALUES (" + ", ".join(["%s"] * len(GAME_COLUMNS)) + ")")
+
+        try:
+            with open(tsv_filename, "r") as tsv_file:
+                cursor.executemany(insert_query, (line.rstrip("\n").split("\t") for line in tsv_file))
+            num_games = cursor.rowcount
+            cxn.commit()
+        except Exception:
+            cxn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        return num_games
+
+    def state_filename(self, name):
+        if self.path == ":memory:":
+            # The state only needs to last as long as the database
+            if self._state_dir is None:
+                self._state_dir = tempfile.mkdtemp(prefix="planetx_")
+            return os.path.join(self._state_dir, name)
+        return os.path.splitext(os.path.abspath(self.path))[0] + "_" + name
+
+def backend_from_environment():
+    """
+    Returns the backend chosen by PLANETX_DB_BACKEND: "mysql" (the default), or "sqlite" with
+    the database file PLANETX_DB_PATH (default: planetx.db next to this module).
+    """
+    name = os.environ.get("PLANETX_DB_BACKEND", "mysql")
+    if name == "mysql":
+        return MySQLBackend()
+    elif name == "sqlite":
+        return SQLiteBackend(os.environ.get("PLANETX_DB_PATH", os.path.join(dirname, "planetx.db")))
+    else:
+        raise ValueError("Unknown database backend: " + name)
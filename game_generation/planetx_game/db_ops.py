@@ -1,34 +1,143 @@
-import json
 import os
-
-import mysql.connector
-import mysql.connector.pooling
+import threading
+from contextlib import contextmanager
 
 from .board import *
 from .board_type import * 
 from .game import *
 from .session import *
+from .game_cache import GameCache
+from .game_picker import GamePicker
+from .connection_pool import ConnectionPool
+from .db_backends import *
+from . import migrations
 
 dirname = os.path.dirname(__file__)
-credsfile = os.path.join(dirname, "creds.json")
 
-with open(credsfile, "r") as f:
-    creds = json.load(f)
+# The database backend, chosen from the environment when it is first used, so that tools
+# which never use the database start without mysql-connector, credentials, or a database
+_backend = None
+_backend_lock = threading.Lock()
+# The pool of the backend's connections, made when the first connection is checked out
+_pool = None
+
+def get_backend():
+    """
+    Returns the database backend, creating it from the environment on the first call
+    (see db_backends.backend_from_environment)
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = backend_from_environment()
+    return _backend
+
+def set_backend(backend):
+    """
+    Uses a database backend, such as a SQLiteBackend, for every operation from now on
     
-dbconfig = {
-    "password": creds["password"],
-    "database": creds["database"],
-    "user": creds["username"],
-    "host": creds["hostname"]
-}
+    backend: The DatabaseBackend to use
+    """
+    global _backend, _pool
+    with _backend_lock:
+        _backend = backend
+        _pool = None
+    game_cache.clear()
+    game_picker.invalidate()
 
-cnxpool = mysql.connector.pooling.MySQLConnectionPool(pool_name = "mypool", pool_size = 3, **dbconfig)
+def _forget_connections():
+    """
+    Drops the connections inherited by a forked process, whose connections belong to the
+    parent process
+    """
+    global _pool
+    _pool = None
+    if _backend is not None:
+        _backend.forget_connections()
+    
+os.register_at_fork(after_in_child=_forget_connections)
+
+# Parsed games, shared between every lookup of the same game
+game_cache = GameCache(max_size=1024)
+
+# The ids of the games of each board size, to pick random games from
+game_picker = GamePicker(lambda board_size: get_game_ids(board_size))
 
 def get_connection():
     """
-    Gets a mysql database connection to perform operations with
+    Gets a database connection to perform operations with. The connection must be closed
+    when it is finished with; checkout() does so automatically.
+    """
+    return get_backend().connect()
+
+def connection_pool():
+    """
+    Returns the ConnectionPool handing out the backend's connections, limited to the backend's
+    pool size and timeout
+    """
+    global _pool
+    backend = get_backend()
+    with _backend_lock:
+        if _pool is None:
+            _pool = ConnectionPool(backend.connect, backend.pool_size, backend.pool_timeout)
+        return _pool
+
+def checkout():
     """
-    return cnxpool.get_connection()
+    Checks out a database connection for the body of a with statement, waiting for one to be
+    returned if they are all in use. The connection is returned at the end, and its transaction
+    is rolled back if the body raises an exception. Raises a TimeoutError if no connection is
+    returned within the backend's pool timeout.
+    """
+    return connection_pool().checkout()
+
+# The statements executed while record_statements() is in use, as (query, params) pairs
+_recorded_statements = None
+
+class _RecordingCursor:
+    """
+    A cursor which adds the statements it executes to the recorded statements
+    """
+    def __init__(self, cursor, recorded):
+        self._cursor = cursor
+        self._recorded = recorded
+
+    def execute(self, query, params=()):
+        self._recorded.append((query, tuple(params)))
+        return self._cursor.execute(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+@contextmanager
+def record_statements():
+    """
+    Records the statements every operation executes during the body of a with statement, and
+    yields the list of them as (query, params) pairs, for checking what the queries do (as
+    migrations.index_check does). Statements executed many times at once are not recorded.
+    """
+    global _recorded_statements
+    _recorded_statements = []
+    try:
+        yield _recorded_statements
+    finally:
+        _recorded_statements = None
+
+@contextmanager
+def _cursor():
+    """
+    Checks out a connection and opens a cursor on it for the body of a with statement,
+    yielding a tuple of the connection and cursor
+    """
+    with checkout() as cxn:
+        cursor = cxn.cursor()
+        try:
+            if _recorded_statements is not None:
+                yield cxn, _RecordingCursor(cursor, _recorded_statements)
+            else:
+                yield cxn, cursor
+        finally:
+            cursor.close()
 
 def add_game(game, game_code):
     """
@@ -45,32 +154,37 @@ def add_game(game, game_code):
     starting_information = game.starting_info.code()
     
     # Perform mysql command to insert it into the database
-    cxn = get_connection()
-    cursor = cxn.cursor()
+    with _cursor() as (cxn, cursor):
+        add_game_query = ("INSERT INTO games "
+                           "(game_code, board_size, board_objects, research, conference, starting_information) "
+                           "VALUES (%s, %s, %s, %s, %s, %s);")
+        game_data = (game_code, board_size, board_objects, research, conference, starting_information)
     
-    add_game_query = ("INSERT INTO games "
-                       "(game_code, board_size, board_objects, research, conference, starting_information) "
-                       "VALUES (%s, %s, %s, %s, %s, %s);")
-    game_data = (game_code, board_size, board_objects, research, conference, starting_information)
+        cursor.execute(add_game_query, game_data)
+        cxn.commit()
     
-    cursor.execute(add_game_query, game_data)
-    cxn.commit()
+    game_picker.invalidate(board_size)
     
-    cursor.close()
-    cxn.close()
+def migrate(target=None):
+    """
+    Brings the database's schema up to date by applying the migrations it has not had yet.
+    Returns the list of versions applied.
+    
+    target: The schema version to migrate to, or None for the latest version
+    """
+    with checkout() as cxn:
+        return migrations.migrate(get_backend(), cxn, target)
     
 def clear_games():
     """
     Remove all games from the database
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    cursor.execute("TRUNCATE TABLE games")
-    cxn.commit()
+    with _cursor() as (cxn, cursor):
+        get_backend().truncate(cursor, "games")
+        cxn.commit()
     
-    cursor.close()
-    cxn.close()
+    game_cache.clear()
+    game_picker.invalidate()
     
 def add_games(games, game_codes):
     """
@@ -93,14 +207,11 @@ def add_games(games, game_codes):
                        "(game_code, board_size, board_objects, research, conference, starting_information) "
                        "VALUES (%s, %s, %s, %s, %s, %s);")
         
-    cxn = get_connection()
-    cursor = cxn.cursor()
+    with _cursor() as (cxn, cursor):
+        cursor.executemany(add_game_query, values)
+        cxn.commit()
     
-    cursor.executemany(add_game_query, values)
-    cxn.commit()
-    
-    cursor.close()
-    cxn.close()
+    game_picker.invalidate()
     
 def add_games_by_str(games, game_codes):
     """
@@ -109,125 +220,208 @@ def add_games_by_str(games, game_codes):
     games: A list of encoded game strings
     game_codes: A list of game codes for the games
     """
-    values = []
-    
-    # Split the game into parameters by splitting encoded string on & symbol
-    for game_code, game_str in zip(game_codes, games):
-        components = game_str.split("&")
-        values.append((game_code, int(components[0]), components[1], components[2], components[3], components[4]))
+    values = [_game_str_values(game_code, game_str) for game_code, game_str in zip(game_codes, games)]
     
     # Insert all the games into the database
     add_game_query = ("INSERT INTO games "
                        "(game_code, board_size, board_objects, research, conference, starting_information) "
                        "VALUES (%s, %s, %s, %s, %s, %s);")
         
-    cxn = get_connection()
-    cursor = cxn.cursor()
+    with _cursor() as (cxn, cursor):
+        cursor.executemany(add_game_query, values)
+        cxn.commit()
+    
+    game_picker.invalidate()
     
-    cursor.executemany(add_game_query, values)
-    cxn.commit()
+def _game_str_values(game_code, game_str):
+    """
+    Returns the column values for the games table of an encoded game string
+    """
+    # Split the game into parameters by splitting encoded string on & symbol
+    components = game_str.split("&")
+    return (game_code, int(components[0]), components[1], components[2], components[3], components[4])
+
+def bulk_add_games_by_str(chunks, rows_per_insert=1000):
+    """
+    Add games to the database by their encoded strings, in a single transaction of multi-row
+    INSERTs with checks deferred. Returns the number of games added.
     
-    cursor.close()
-    cxn.close()
+    chunks: An iterable of pairs of a list of encoded game strings and a list of game codes
+        for the games, as passed to add_games_by_str
+    rows_per_insert: The number of games to put in each INSERT statement
+    """
+    add_game_query = ("INSERT INTO games "
+                      "(game_code, board_size, board_objects, research, conference, starting_information) "
+                      "VALUES ")
+    row_placeholder = "(%s, %s, %s, %s, %s, %s)"
+    
+    num_games = 0
+    
+    try:
+        with _cursor() as (cxn, cursor):
+            get_backend().defer_checks(cursor)
+            try:
+                cxn.start_transaction()
+                
+                for games, game_codes in chunks:
+                    for i in range(0, len(games), rows_per_insert):
+                        some_games = games[i:i+rows_per_insert]
+                        some_codes = game_codes[i:i+rows_per_insert]
+                        values = []
+                        for game_code, game_str in zip(some_codes, some_games):
+                            values.extend(_game_str_values(game_code, game_str))
+                        cursor.execute(add_game_query + ", ".join([row_placeholder] * len(some_games)), values)
+                        num_games += len(some_games)
+                        
+                cxn.commit()
+            except Exception:
+                cxn.rollback()
+                raise
+            finally:
+                get_backend().restore_checks(cursor)
+    finally:
+        game_picker.invalidate()
+        
+    return num_games
 
+def load_games_by_str(chunks, tsv_filename):
+    """
+    Add games to the database by their encoded strings, by writing them to a tab separated
+    file and loading it in bulk with checks deferred. MySQL loads it with LOAD DATA LOCAL 
+    INFILE, so the server must allow local_infile. Returns the number of games added.
+    
+    chunks: An iterable of pairs of a list of encoded game strings and a list of game codes
+        for the games, as passed to add_games_by_str
+    tsv_filename: The file to write the games to before loading them
+    """
+    # Encoded games and game codes never contain tabs, newlines or backslashes, so need no escaping
+    with open(tsv_filename, "w") as tsv_file:
+        for games, game_codes in chunks:
+            for game_code, game_str in zip(game_codes, games):
+                tsv_file.write("\t".join(str(value) for value in _game_str_values(game_code, game_str)) + "\n")
+    
+    try:
+        return get_backend().load_games_tsv(tsv_filename)
+    finally:
+        game_picker.invalidate()
 
 def query(query):
-    cxn = get_connection()
-    cursor = cxn.cursor()
-     
-    cursor.execute(query)  
+    with _cursor() as (cxn, cursor):
+        cursor.execute(query)
     
-    rows = cursor.fetchall()
-    
-    cursor.close()
-    cxn.close()
+        rows = cursor.fetchall()
     
     return rows
     
-def pick_game(num_sectors):
+def _cache_game(gid, game_code, board_objects, research, conference, starting_information):
     """
-    Pick a random game from the database
-    
-    Returns a tuple of the game code and the Game itself
+    Parses the Game for a row of the games table and adds it to the game cache. Returns the
+    cached Game.
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-
-    cursor.execute("SET @maxID := (SELECT MAX(id) FROM games WHERE board_size = %s);", (num_sectors,))
-    cursor.execute("SET @minID := (SELECT MIN(id) FROM games WHERE board_size = %s);", (num_sectors,))
-    
-    # Select a random id and get the game for that id
-    random_game_query = ("SELECT * "
-                             "FROM games AS r1 JOIN "
-                                 "(SELECT CEIL(RAND() * "
-                                     "(@maxID - @minID) + @minID)  AS id) "
-                                 "AS r2 "
-                             "WHERE r1.id >= r2.id AND board_size = %s "
-                             "ORDER BY r1.id ASC "
-                             "LIMIT 1;")
-    
-    cursor.execute(random_game_query, (num_sectors,))    
-    
-    gid, game_code, board_size, board_objects, research, conference, starting_information, _ = cursor.fetchone()
     game = Game(Board.parse(board_objects), StartingInformation.parse(starting_information), 
                 Research.parse(research), Conference.parse(conference))
+    return game_cache.add(gid, game_code, game)
     
-    cursor.close()
-    cxn.close()
+_game_ids_query = "SELECT id FROM games WHERE board_size = %s ORDER BY id"
+
+# The number of rows fetched at a time when reading many rows
+FETCH_SIZE = 10000
+
+def get_game_ids(board_size):
+    """
+    Yields the ids of the games of a board size, in increasing order
+    """
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_game_ids_query, (board_size,))
+        
+        # Fetch the ids a batch at a time, so they are never all in memory
+        rows = cursor.fetchmany(FETCH_SIZE)
+        while len(rows) > 0:
+            for row in rows:
+                yield row[0]
+            rows = cursor.fetchmany(FETCH_SIZE)
+    
+def pick_game(num_sectors, no_repeats=False):
+    """
+    Pick a random game from the database, uniformly from the games of a board size
+    
+    num_sectors: The board size of the game
+    no_repeats: If true, deal games of this size from a shuffled deck, so that no game is 
+        picked again until every game has been picked
+    
+    Returns a tuple of the game id, game code and the Game itself, or None if there are no 
+    games of that size
+    """
+    # The game ids are picked from in this process, so only the picked game is looked up
+    for attempt in range(2):
+        if no_repeats:
+            gid = game_picker.deal(num_sectors)
+        else:
+            gid = game_picker.pick(num_sectors)
+        if gid is None:
+            return None
+        
+        result = get_game_by_id(gid)
+        if result is not None:
+            game_code, game = result
+            return gid, game_code, game
+        
+        # The game was removed since the ids were loaded, so load them again
+        game_picker.invalidate(num_sectors)
+        
+    return None
+
+_game_by_id_query = "SELECT * from games WHERE id = %s"
+
+def _game_by_id(row):
+    """
+    Returns a tuple of the game code and cached Game for a row of _game_by_id_query, or None
+    if there was no row
+    """
+    if row is None:
+        return None
+    
+    gid, game_code, board_size, board_objects, research, conference, starting_information = row
+    game = _cache_game(gid, game_code, board_objects, research, conference, starting_information)
  
-    return gid, game_code, game
+    return game_code, game
 
 def get_game_by_id(gid):
     """
     Gets the game for a given id
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-
-                      
-    game_query = ("SELECT * from games " 
-                 "WHERE id = %s")
+    cached = game_cache.get_by_id(gid)
+    if cached is not None:
+        return cached
     
-    cursor.execute(game_query, (gid,))
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_game_by_id_query, (gid,))
     
-    result = cursor.fetchone()
-    
-    if result is None:
-        return None
+        result = cursor.fetchone()
     
-    gid, game_code, board_size, board_objects, research, conference, starting_information = result
-    game = Game(Board.parse(board_objects), StartingInformation.parse(starting_information), 
-                Research.parse(research), Conference.parse(conference))
-    
-    cursor.close()
-    cxn.close()
- 
-    return game_code, game
+    return _game_by_id(result)
 
 def get_game(game_code):
     """
     Gets the game for a given game code game_code.
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-
-                      
-    game_query = ("SELECT * from games " 
-                 "WHERE game_code = %s")
+    cached = game_cache.get_by_code(game_code)
+    if cached is not None:
+        return cached
+    
+    with _cursor() as (cxn, cursor):
+        game_query = ("SELECT * from games "
+                     "WHERE game_code = %s")
     
-    cursor.execute(game_query, (game_code,))
+        cursor.execute(game_query, (game_code,))
     
-    result = cursor.fetchone()
+        result = cursor.fetchone()
     
     if result is None:
         return None
     
     gid, game_code, board_size, board_objects, research, conference, starting_information = result
-    game = Game(Board.parse(board_objects), StartingInformation.parse(starting_information), 
-                Research.parse(research), Conference.parse(conference))
-    
-    cursor.close()
-    cxn.close()
+    game = _cache_game(gid, game_code, board_objects, research, conference, starting_information)
  
     return gid, game
 
@@ -235,35 +429,49 @@ def get_game_codes():
     """
     Returns a list of all game codes that currently exist
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
+    with _cursor() as (cxn, cursor):
+        game_code_query = "SELECT game_code FROM games"
     
-    game_code_query = "SELECT game_code FROM games"
+        cursor.execute(game_code_query)
     
-    cursor.execute(game_code_query)    
+        game_codes = [row[0] for row in cursor.fetchall()]
     
-    game_codes = [row[0] for row in cursor.fetchall()]
+    return game_codes
+
+def get_existing_game_codes(game_codes):
+    """
+    Returns the list of game codes from game_codes which already exist
     
-    cursor.close()
-    cxn.close()
+    game_codes: A list of game codes to look up
+    """
+    if len(game_codes) == 0:
+        return []
     
-    return game_codes
+    with _cursor() as (cxn, cursor):
+        game_code_query = "SELECT game_code FROM games WHERE game_code IN (" + ", ".join(["%s"] * len(game_codes)) + ")"
+    
+        cursor.execute(game_code_query, tuple(game_codes))
+    
+        existing_codes = [row[0] for row in cursor.fetchall()]
+    
+    return existing_codes
+
+def game_code_state_filename(code_length):
+    """
+    Returns the file keeping the game code allocator for codes of a length in this database
+    """
+    return get_backend().state_filename("game_codes_" + str(code_length) + ".json")
 
 def get_session_codes():
     """
     Returns a list of all session codes that currently exist
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    session_code_query = "SELECT session_code FROM sessions"
+    with _cursor() as (cxn, cursor):
+        session_code_query = "SELECT session_code FROM sessions"
     
-    cursor.execute(session_code_query)
+        cursor.execute(session_code_query)
     
-    session_codes = [row[0] for row in cursor.fetchall()]
-    
-    cursor.close()
-    cxn.close()
+        session_codes = [row[0] for row in cursor.fetchall()]
     
     return session_codes
 
@@ -271,75 +479,61 @@ def create_session(session_code, num_sectors, gid):
     """
     Creates a session with a particular session code and game id
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    session_query = "INSERT INTO sessions (session_code, game_size, game_id) VALUES (%s, %s, %s);"
+    with _cursor() as (cxn, cursor):
+        session_query = "INSERT INTO sessions (session_code, game_size, game_id) VALUES (%s, %s, %s);"
     
-    cursor.execute(session_query, (session_code, num_sectors, gid))
-    cxn.commit()
+        cursor.execute(session_query, (session_code, num_sectors, gid))
+        cxn.commit()
     
-    session_id = cursor.lastrowid
-
-    cursor.close()
-    cxn.close()
+        session_id = cursor.lastrowid
     
     return session_id
 
+# The columns of the sessions table returned by get_session_by_code and get_session_by_id
+_session_columns = ("SELECT id, session_code, game_size, game_id, first_rotation, current_sector, "
+                    "current_action, action_player FROM sessions ")
+_session_by_code_query = _session_columns + "WHERE session_code = %s"
+
+def _session(row):
+    """
+    Returns a row of _session_columns as a tuple, with first_rot as a bool
+    """
+    session_id, session_code, game_size, game_id, first_rot, current_sector, action_type, action_player = row
+    return session_id, session_code, game_size, game_id, bool(first_rot), current_sector, action_type, action_player
+
 def get_session_by_code(session_code):
     """
     Gets the session with a given session code
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    session_query = "SELECT * FROM sessions WHERE session_code = %s"
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_session_by_code_query, (session_code,))
     
-    cursor.execute(session_query, (session_code,))
+        row = cursor.fetchone()
     
-    session_id, session_code, game_size, game_id, first_rot, \
-    current_sector, action_type, action_player = cursor.fetchone()
-    
-    cursor.close()
-    cxn.close()
-    
-    return session_id, session_code, game_size, game_id, bool(first_rot), current_sector, action_type, action_player
+    return _session(row)
 
 def get_session_by_id(session_id):
     """
     Gets the session with a given session code
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    session_query = "SELECT * FROM sessions WHERE id = %s"
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_session_columns + "WHERE id = %s", (session_id,))
     
-    cursor.execute(session_query, (session_id,))
+        row = cursor.fetchone()
     
-    session_id, session_code, game_size, game_id, first_rot, \
-    current_sector, action_type, action_player = cursor.fetchone()
-    
-    cursor.close()
-    cxn.close()
-    
-    return session_id, session_code, game_size, game_id, bool(first_rot), current_sector, action_type, action_player
+    return _session(row)
 
 def get_theories_for_session(session_id):
     """
     Gets the theories for a session with a particular session ID
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
+    with _cursor() as (cxn, cursor):
+        theory_query = "SELECT * FROM theories WHERE session_id = %s ORDER BY id"
     
-    theory_query = "SELECT * FROM theories WHERE session_id = %s"
+        cursor.execute(theory_query, (session_id,))
     
-    cursor.execute(theory_query, (session_id,))
-    
-    rows = cursor.fetchall()
-    theories = [Theory(SpaceObject.parse(row[3]), row[4], row[2], row[5]) for row in rows]
-    
-    cursor.close()
-    cxn.close()
+        rows = cursor.fetchall()
+        theories = [Theory(SpaceObject.parse(row[3]), row[4], row[2], row[5], theory_id=row[0]) for row in rows]
     
     return theories
 
@@ -347,87 +541,70 @@ def get_theories_for_player_session(player_id):
     """
     Gets the theories for a player's session given the player's ID
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    session_query = "SELECT session_id FROM players where id = %s"
-    cursor.execute(session_query, (player_id,))
+    with _cursor() as (cxn, cursor):
+        session_query = "SELECT session_id FROM players where id = %s"
+        cursor.execute(session_query, (player_id,))
     
-    session_id = cursor.fetchone()[0]
+        session_id = cursor.fetchone()[0]
     
-    theory_query = "SELECT object, sector, player_id, progress FROM theories WHERE session_id = %s;"
+        theory_query = "SELECT object, sector, player_id, progress FROM theories WHERE session_id = %s ORDER BY id;"
 
-    cursor.execute(theory_query, (session_id,))
+        cursor.execute(theory_query, (session_id,))
     
-    rows = cursor.fetchall()
-    theories = [Theory(SpaceObject.parse(row[0]), row[1], row[2], row[3]) for row in rows]
-    
-    cursor.close()
-    cxn.close()
+        rows = cursor.fetchall()
+        theories = [Theory(SpaceObject.parse(row[0]), row[1], row[2], row[3]) for row in rows]
     
     return session_id, theories
     
     
+_players_query = "SELECT * FROM players WHERE session_id = %s ORDER BY id"
+
+def _players(rows):
+    """
+    Returns the Players for rows of the players table
+    """
+    return [Player(row[0], row[2], row[3], row[4], row[5]) for row in rows]
+
 def get_players_for_session(session_id):
     """
     Gets the players for a session with a particular session ID
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    player_query = "SELECT * FROM players WHERE session_id = %s"
-    
-    cursor.execute(player_query, (session_id,))
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_players_query, (session_id,))
     
-    rows = cursor.fetchall()
-    players = [Player(row[0], row[2], row[3], row[4], row[5]) for row in rows]
+        rows = cursor.fetchall()
     
-    cursor.close()
-    cxn.close()
-    
-    return players
+    return _players(rows)
 
 def get_players_for_session_code(session_code):
     """
     Gets the players for a session with a particular session ID
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    player_query = ("SELECT sessions.id, players.id, players.num, players.name, players.sector, players.arrival "
-                    "FROM players, sessions WHERE players.session_id = sessions.id AND sessions.session_code = %s")
-    
-    cursor.execute(player_query, (session_code,))
+    with _cursor() as (cxn, cursor):
+        player_query = ("SELECT sessions.id, players.id, players.num, players.name, players.sector, players.arrival "
+                        "FROM players, sessions WHERE players.session_id = sessions.id AND sessions.session_code = %s "
+                        "ORDER BY players.id")
     
-    rows = cursor.fetchall()
-    players = [Player(row[1], row[2], row[3], row[4], row[5]) for row in rows]
+        cursor.execute(player_query, (session_code,))
     
-    cursor.close()
-    cxn.close()
+        rows = cursor.fetchall()
+        players = [Player(row[1], row[2], row[3], row[4], row[5]) for row in rows]
     
     return rows[0][0], players
     
+_start_game_query = "INSERT INTO actions(action_type, player_id, resolved) VALUES('START_GAME', %s, FALSE);"
+
 def new_player(session_code, name, creator):
     """
     Creates a new player for a session with a particular code
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-
-    new_player_query = "CALL NewPlayer(%s, %s, @SessionID, @PlayerNum, @PlayerID)"
-    cursor.execute(new_player_query, (session_code, name,))
-    cursor.execute("SELECT @SessionID, @PlayerNum, @PlayerID")
-    
-    session_id, player_num, player_id = cursor.fetchone()
+    with _cursor() as (cxn, cursor):
+        session_id, player_num, player_id = get_backend().new_player(cursor, session_code, name)
     
-    if creator:
-        action_query = "INSERT INTO actions(action_type, player_id, resolved) VALUES('START_GAME', %s, FALSE);"
-        cursor.execute(action_query, (player_id,))
-    
-    cxn.commit()
+        if creator:
+            cursor.execute(_start_game_query, (player_id,))
     
-    cursor.close()
-    cxn.close()
+        cxn.commit()
     
     return session_id, player_num, player_id
     
@@ -435,149 +612,260 @@ def move_player(player_id, sector, arrival):
     """
     Moves player with id player_id to sector sector in arrival order arrival
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    player_query = "UPDATE players SET sector = %s, arrival = %s WHERE id = %s;"
+    with _cursor() as (cxn, cursor):
+        player_query = "UPDATE players SET sector = %s, arrival = %s WHERE id = %s;"
     
-    cursor.execute(player_query, (sector, arrival, player_id))
-    cxn.commit()
-    
-    cursor.close()
-    cxn.close()   
+        cursor.execute(player_query, (sector, arrival, player_id))
+        cxn.commit()
     
+_create_theory_query = "INSERT INTO theories (session_id, player_id, object, sector, progress) VALUES (%s, %s, %s, %s, %s);"
+
 def create_theory(session_id, player_id, space_object, sector):
     """
     Creates a new theory
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-
-    theory_query = "INSERT INTO theories (session_id, player_id, object, sector, progress) VALUES (%s, %s, %s, %s, %s);"
-    cursor.execute(theory_query, (session_id, player_id, space_object, sector, 0))
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_create_theory_query, (session_id, player_id, space_object, sector, 0))
     
-    cxn.commit()
+        cxn.commit()
     
-    cursor.close()
-    cxn.close()
+_advance_theories_query = "UPDATE theories SET progress = progress + 1 WHERE progress < 4 AND session_id = %s;"
+
+def _advance_theories(cursor, session_id):
+    cursor.execute(_advance_theories_query, (session_id,))
     
 def advance_theories(session_id):
     """
     Advances all theories for a particular session
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
+    with _cursor() as (cxn, cursor):
+        _advance_theories(cursor, session_id)
     
-    theory_query = "UPDATE theories SET progress = progress + 1 WHERE progress < 4 AND session_id = %s;"
-    cursor.execute(theory_query, (session_id,))
-    
-    cxn.commit()
-    
-    cursor.close()
-    cxn.close()
+        cxn.commit()
     
 def advance_player(player_id, sectors):
     """
     Advance a player sectors sectors
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-
-    new_player_query = "CALL MovePlayer(%s, %s)"
-    cursor.execute(new_player_query, (player_id, sectors))
+    with _cursor() as (cxn, cursor):
+        get_backend().move_player(cursor, player_id, sectors)
         
-    cxn.commit()
-    
-    cursor.close()
-    cxn.close()
+        cxn.commit()
     
 def get_current_actions_for_session(session_id):
     """
     Gets a list of pending actions for a session
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    action_query = ("SELECT actions.id, actions.action_type, actions.player_id FROM actions, players "
-                    "WHERE actions.resolved IS FALSE AND actions.player_id = players.id "
-                    "AND players.session_id = %s")
-    
-    cursor.execute(action_query, (session_id,))
+    with _cursor() as (cxn, cursor):
+        action_query = ("SELECT actions.id, actions.action_type, actions.player_id FROM actions, players "
+                        "WHERE actions.resolved = FALSE AND actions.player_id = players.id "
+                        "AND players.session_id = %s ORDER BY actions.id")
     
-    rows = cursor.fetchall()
-    actions = [Action(ActionType[row[1]], row[2], action_id=row[0]) for row in rows]
+        cursor.execute(action_query, (session_id,))
     
-    cursor.close()
-    cxn.close()
+        rows = cursor.fetchall()
+        actions = [Action(ActionType[row[1]], row[2], action_id=row[0]) for row in rows]
     
     return actions
 
+_previous_turns_query = ("SELECT actions.player_id, actions.resolve_time, actions.resolve_action FROM actions, players "
+                         "WHERE actions.resolved = TRUE AND actions.action_type = 'PLAYER_TURN' "
+                         "AND actions.player_id = players.id AND players.session_id = %s ORDER BY actions.id")
+
 def get_previous_turns(session_id):
     """
     Gets a list of previous turns for a session
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_previous_turns_query, (session_id,))
+    
+        rows = cursor.fetchall()
     
-    turn_query = ("SELECT actions.player_id, actions.resolve_time, actions.resolve_action FROM actions, players "
-                  "WHERE actions.resolved IS TRUE AND actions.action_type = 'PLAYER_TURN' "
-                  "AND actions.player_id = players.id AND players.session_id = %s")
+    return [Turn.parse(row[0], row[1], row[2]) for row in rows]
+
+_turns_since_query = ("SELECT actions.id, actions.player_id, actions.resolve_time, actions.resolve_action "
+                      "FROM actions, players WHERE players.session_id = %s AND actions.player_id = players.id "
+                      "AND actions.resolved = TRUE AND actions.id > %s AND actions.action_type = 'PLAYER_TURN' "
+                      "ORDER BY actions.id")
+
+def _turns_since(rows, after_action_id):
+    """
+    Returns the result of get_turns_since for the rows of _turns_since_query
+    """
+    turns = [Turn.parse(row[1], row[2], row[3]) for row in rows]
+    last_action_id = rows[-1][0] if len(rows) > 0 else after_action_id
     
-    cursor.execute(turn_query, (session_id,))
+    return last_action_id, turns
+
+def get_turns_since(session_id, after_action_id):
+    """
+    Gets the turns of a session resolved by actions after a particular action, so that a client
+    holding the earlier turns only fetches new ones. Returns a tuple of the id of the last action
+    fetched (after_action_id if there are no new turns) and a list of the new turns, in order.
     
-    rows = cursor.fetchall()
-    turns = [Turn.parse(row[0], row[1], row[2]) for row in rows]
+    session_id: The id of the session
+    after_action_id: The last action id returned by the previous call, or 0 for every turn
+    """
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_turns_since_query, (session_id, after_action_id))
+        
+        rows = cursor.fetchall()
+        
+    return _turns_since(rows, after_action_id)
+
+_theories_since_query = ("SELECT id, object, sector, player_id, progress FROM theories "
+                         "WHERE session_id = %s AND (id > %s OR progress < 4) ORDER BY id")
+
+def _theories_since(rows, after_theory_id):
+    """
+    Returns the result of get_theories_since for the rows of _theories_since_query
+    """
+    theories = [Theory(SpaceObject.parse(row[1]), row[2], row[3], row[4], theory_id=row[0]) for row in rows]
+    last_theory_id = max([after_theory_id] + [row[0] for row in rows])
     
-    cursor.close()
-    cxn.close()
+    return last_theory_id, theories
+
+def get_theories_since(session_id, after_theory_id):
+    """
+    Gets the theories of a session which were made after a particular theory or may have
+    advanced since, so that a client holding the earlier theories only fetches changed ones.
+    Theories advance until their progress reaches 4, so every theory with less progress is
+    fetched again. Returns a tuple of the id of the last theory fetched (after_theory_id if
+    there are no new theories) and a list of the theories, in order, with their theory_id set
+    so that they can replace the client's copies.
     
-    return turns
+    session_id: The id of the session
+    after_theory_id: The last theory id returned by the previous call, or 0 for every theory
+    """
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_theories_since_query, (session_id, after_theory_id))
+        
+        rows = cursor.fetchall()
+        
+    return _theories_since(rows, after_theory_id)
+
+# Every part of a session snapshot, as rows of (part, id, two text columns, five number columns,
+# time). Each part is joined to the session by its code, so the whole snapshot is one query.
+_snapshot_query = (
+    "SELECT 0 AS part, s.id, s.session_code, s.current_action, s.game_size, s.game_id, "
+    "s.first_rotation, s.current_sector, s.action_player, NULL "
+    "FROM sessions s WHERE s.session_code = %s "
+    "UNION ALL "
+    "SELECT 1, p.id, p.name, NULL, p.num, p.sector, p.arrival, NULL, NULL, NULL "
+    "FROM players p, sessions s WHERE p.session_id = s.id AND s.session_code = %s "
+    "UNION ALL "
+    "SELECT 2, t.id, t.object, NULL, t.sector, t.player_id, t.progress, NULL, NULL, NULL "
+    "FROM theories t, sessions s WHERE t.session_id = s.id AND s.session_code = %s "
+    "UNION ALL "
+    "SELECT 3, a.id, a.action_type, NULL, a.player_id, NULL, NULL, NULL, NULL, NULL "
+    "FROM actions a, players p, sessions s WHERE a.resolved = FALSE AND a.player_id = p.id "
+    "AND p.session_id = s.id AND s.session_code = %s "
+    "UNION ALL "
+    "SELECT 4, a.id, a.resolve_action, NULL, a.player_id, NULL, NULL, NULL, NULL, a.resolve_time "
+    "FROM actions a, players p, sessions s WHERE a.resolved = TRUE AND a.action_type = 'PLAYER_TURN' "
+    "AND a.player_id = p.id AND p.session_id = s.id AND s.session_code = %s "
+    "ORDER BY part, id")
+
+def _snapshot_text(value):
+    """
+    Returns a text column of a snapshot row as a str. A union of text and NULL columns can come
+    back as bytes.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode()
+    return value
+
+def _snapshot_time(value):
+    """
+    Returns the time column of a snapshot row as a datetime. SQLite does not know the union's
+    column is a timestamp, so it comes back as text.
+    """
+    value = _snapshot_text(value)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+def get_session_snapshot(session_code):
+    """
+    Gets the whole state of a session in one query, rather than one query each for the session,
+    its players, theories, pending actions and previous turns. Returns a SessionSnapshot, or None
+    if there is no session with the code.
+
+    session_code: The code of the session
+    """
+    with _cursor() as (cxn, cursor):
+        cursor.execute(_snapshot_query, (session_code,) * 5)
+
+        rows = cursor.fetchall()
+
+    return _snapshot(rows)
+
+def _snapshot(rows):
+    """
+    Returns the SessionSnapshot for the rows of _snapshot_query, or None if there are none
+    """
+    if len(rows) == 0 or int(rows[0][0]) != 0:
+        return None
+
+    players = []
+    theories = []
+    actions = []
+    turns = []
+    for row in rows[1:]:
+        part, row_id, text = int(row[0]), int(row[1]), _snapshot_text(row[2])
+        if part == 1:
+            players.append(Player(row_id, int(row[4]), text, int(row[5]), int(row[6])))
+        elif part == 2:
+            theories.append(Theory(SpaceObject.parse(text), int(row[4]), int(row[5]), int(row[6]), theory_id=row_id))
+        elif part == 3:
+            actions.append(Action(ActionType[text], int(row[4]), action_id=row_id))
+        else:
+            turns.append(Turn.parse(int(row[4]), _snapshot_time(row[9]), text))
+
+    session_row = rows[0]
+    action_type = _snapshot_text(session_row[3])
+    action_player = session_row[8]
+    return SessionSnapshot(int(session_row[1]), _snapshot_text(session_row[2]), int(session_row[4]),
+                           int(session_row[5]), bool(int(session_row[6])), int(session_row[7]),
+                           None if action_type is None else ActionType[action_type],
+                           None if action_player is None else int(action_player),
+                           players, theories, actions, turns)
+
+_create_action_query = "INSERT INTO actions(action_type, player_id, resolved) VALUES(%s, %s, %s);"
+
+def _create_action(cursor, action_type, player_id):
+    cursor.execute(_create_action_query, (action_type.name, player_id, False))
     
 def create_action(action_type, player_id):
     """
     Create action of type action_type for player with id player_id
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    action_query = "INSERT INTO actions(action_type, player_id, resolved) VALUES(%s, %s, %s);"
-    cursor.execute(action_query, (action_type.name, player_id, False))
+    with _cursor() as (cxn, cursor):
+        _create_action(cursor, action_type, player_id)
     
-    cxn.commit()
-    
-    cursor.close()
-    cxn.close()
+        cxn.commit()
     
 def get_current_action(player_id):
     """
     Get the current action for a certain player, or None if there is none
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    action_query = "SELECT id, action_type, player_id FROM actions WHERE player_id = %s AND resolved IS FALSE"
-    cursor.execute(action_query, (player_id,))
-    
-    row = cursor.fetchone()
+    with _cursor() as (cxn, cursor):
+        action_query = "SELECT id, action_type, player_id FROM actions WHERE player_id = %s AND resolved = FALSE"
+        cursor.execute(action_query, (player_id,))
     
-    cursor.close()
-    cxn.close()
+        row = cursor.fetchone()
     
     if row is None:
         return None
     else:
         return Action(ActionType[row[1]], row[2], action_id=row[0])
     
-def resolve_action(action_id, turn):
+_resolve_action_query = "UPDATE actions SET resolved = TRUE, resolve_time = %s, resolve_action = %s WHERE id = %s;"
+
+def _resolve_action_params(action_id, turn):
     """
-    Resolves action with a given id. Does nothing if action_id is None.
+    Returns the parameters of _resolve_action_query for resolving an action with a turn
     """
-    if action_id is None:
-        return
-    
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
     if turn is None:
         turn_time = datetime.now()
         turn_code = ""
@@ -585,40 +873,75 @@ def resolve_action(action_id, turn):
         turn_time = turn.turn_time
         turn_code = turn.code()
     
-    action_query = "UPDATE actions SET resolved = TRUE, resolve_time = %s, resolve_action = %s WHERE id = %s;"
-    cursor.execute(action_query, (turn_time, turn_code, action_id,))
-    cxn.commit()
+    return turn_time, turn_code, action_id
+
+def _resolve_action(cursor, action_id, turn):
+    cursor.execute(_resolve_action_query, _resolve_action_params(action_id, turn))
+    
+def resolve_action(action_id, turn):
+    """
+    Resolves action with a given id. Does nothing if action_id is None.
+    """
+    if action_id is None:
+        return
     
-    cursor.close()
-    cxn.close()
+    with _cursor() as (cxn, cursor):
+        _resolve_action(cursor, action_id, turn)
+        cxn.commit()
     
 def set_current_action(session_id, action):
     """
     Sets the current action for a session
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    action_query = "UPDATE sessions SET current_action = %s, action_player = %s WHERE id = %s;"
-    cursor.execute(action_query, (action.action_type.name, action.player_id, session_id,))
-    cxn.commit()
+    with _cursor() as (cxn, cursor):
+        action_query = "UPDATE sessions SET current_action = %s, action_player = %s WHERE id = %s;"
+        cursor.execute(action_query, (action.action_type.name, action.player_id, session_id,))
+        cxn.commit()
     
-    cursor.close()
-    cxn.close()
+_set_current_status_query = ("UPDATE sessions SET first_rotation = %s, current_sector = %s, "
+                              "current_action = %s, action_player = %s WHERE id = %s;")
+
+def _set_current_status(cursor, session_id, action, current_sector, first_rot):
+    cursor.execute(_set_current_status_query,
+                   (first_rot, current_sector, action.action_type.name, action.player_id, session_id,))
     
 def set_current_status(session_id, action, current_sector, first_rot):
     """
     Sets the current action for a session
     """
-    cxn = get_connection()
-    cursor = cxn.cursor()
-    
-    action_query = ("UPDATE sessions SET first_rotation = %s, current_sector = %s, "
-                    "current_action = %s, action_player = %s WHERE id = %s;")
-    
-    cursor.execute(action_query, (first_rot, current_sector, action.action_type.name, action.player_id, session_id,))
-    cxn.commit()
-    
-    cursor.close()
-    cxn.close()
-    
\ No newline at end of file
+    with _cursor() as (cxn, cursor):
+        _set_current_status(cursor, session_id, action, current_sector, first_rot)
+        cxn.commit()
+
+def commit_turn(session_id, action_id, turn, moves=(), advance_theories=False, new_actions=(), status=None):
+    """
+    Applies everything a turn changes in one transaction on one connection, so the turn is
+    committed once and other connections never see it half applied. Nothing is changed if
+    any part fails. The changes are made in the order of the arguments.
+    
+    session_id: The id of the session the turn is in
+    action_id: The id of the action the turn resolves, or None to resolve no action
+    turn: The Turn resolving the action, or None, as passed to resolve_action
+    moves: An iterable of pairs of a player id and a number of sectors to advance the player,
+        as passed to advance_player
+    advance_theories: Whether to advance all theories for the session
+    new_actions: An iterable of Actions to create for players
+    status: None to leave the session's status alone, or a tuple of its new current Action,
+        current sector and whether it is still the first rotation, as passed to set_current_status
+    """
+    with _cursor() as (cxn, cursor):
+        cxn.start_transaction()
+        
+        if action_id is not None:
+            _resolve_action(cursor, action_id, turn)
+        for player_id, sectors in moves:
+            get_backend().move_player(cursor, player_id, sectors)
+        if advance_theories:
+            _advance_theories(cursor, session_id)
+        for action in new_actions:
+            _create_action(cursor, action.action_type, action.player_id)
+        if status is not None:
+            action, current_sector, first_rot = status
+            _set_current_status(cursor, session_id, action, current_sector, first_rot)
+            
+        cxn.commit()
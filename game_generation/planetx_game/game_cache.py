@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+class GameCache:
+    """
+    A bounded least-recently-used cache of parsed games, looked up by game id or game code.
+    Games are never changed once they are added to the database, so the same Game instance
+    is shared by every caller that gets it from the cache.
+    """
+    def __init__(self, max_size=1024):
+        """
+        Creates an empty GameCache.
+
+        max_size: The most games to keep. Adding a game beyond this evicts the game that was
+            used longest ago. A max_size of 0 disables the cache.
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Maps game id to (game code, Game), in order from least to most recently used
+        self._games = OrderedDict()
+        # Maps game code to game id
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._games)
+
+    def get_by_id(self, gid):
+        """
+        Returns a tuple of the game code and Game for a game id, or None if it is not cached.
+
+        gid: The game's id
+        """
+        with self._lock:
+            entry = self._games.get(gid)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._games.move_to_end(gid)
+            return entry
+
+    def get_by_code(self, game_code):
+        """
+        Returns a tuple of the game id and Game for a game code, or None if it is not cached.
+
+        game_code: The game's code
+        """
+        with self._lock:
+            gid = self._ids.get(game_code)
+            if gid is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._games.move_to_end(gid)
+            return gid, self._games[gid][1]
+
+    def add(self, gid, game_code, game):
+        """
+        Adds a game to the cache, as the most recently used. Returns the cached Game, which is
+        the one already cached if another caller added the game first.
+
+        gid: The game's id
+        game_code: The game's code
+        game: The parsed Game
+        """
+        with self._lock:
+            if self.max_size <= 0:
+                return game
+            if gid in self._games:
+                self._games.move_to_end(gid)
+                return self._games[gid][1]
+
+            self._games[gid] = (game_code, game)
+            self._ids[game_code] = gid
+            while len(self._games) > self.max_size:
+                old_gid, (old_code, old_game) = self._games.popitem(last=False)
+                del self._ids[old_code]
+            return game
+
+    def clear(self):
+        """
+        Removes every game from the cache, and resets the hit and miss counters.
+        """
+        with self._lock:
+            self._games.clear()
+            self._ids.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Returns a dictionary of the number of hits, misses and cached games, and the size limit.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._games), "max_size": self.max_size}
@@ -0,0 +1,174 @@
+import os
+import json
+import random
+
+from .permutation import KeyedPermutation
+
+# Game codes are letter-number pairs, with the letters A-Z except O and I, and the numbers 2-9
+NUM_LETTERS = 24
+NUM_DIGITS = 8
+
+def num_game_codes(code_length):
+    """
+    Returns the number of possible game codes of a length.
+
+    code_length: The number of characters in the game code. Must be even.
+    """
+    return (NUM_LETTERS * NUM_DIGITS)**(code_length//2)
+
+def code_to_int(code):
+    """
+    Get the integer corresponding to a game code of the form
+    <letter><number><letter><number>. The letters cannot be O/I, and the
+    numbers are 2-9. The 0th game code is A2A2...A2 for any given length.
+
+    code: The game code
+    """
+    i = 0
+
+    while len(code) > 0:
+        i *= (8 * 24)
+
+        letter = ord(code[0]) - 65
+        digit = int(code[1])
+
+        i += (digit - 2)
+
+        if letter < 8:
+            i += letter * 8
+        elif letter < 14:
+            i += (letter - 1) * 8
+        else:
+            i += (letter - 2) * 8
+
+        code = code[2:]
+
+    return i
+
+def int_to_code(i, length):
+    """
+    Construct the ith game code of length length. Game codes are in the format
+    <letter><number><letter><number>... The letters cannot be O/I, and the numbers
+    are 2-9. The 0th game code is A2A2...A2 for any given length.
+
+    i: The number of the game code to construct
+    length: The number of characters for the game code. Must be even.
+    """
+    code = ""
+    # Construct code, taking each letter-number pair one by one
+    while i > 0:
+        # Extract number by taking modulo
+        n = (i % 8) + 2
+        i = int(i/8)
+        # Extract letter index by taking modulo
+        l = i % 24
+
+        # Turn letter index into a letter, skipping O and I
+        if l < 8:
+            c = chr(l + 65)
+        elif l < 13:
+            c = chr(l + 66)
+        else:
+            c = chr(l + 67)
+        i = int(i/24)
+        # Prepend letter-number pair to code
+        code = c + str(n) + code
+    # Pad with A2's
+    if len(code) < length:
+        code = "A2" * ((length - len(code))//2) + code
+    return code
+
+class GameCodeAllocator:
+    """
+    Issues unique game codes of one length in a random-looking order, one at a time in
+    constant time and memory, for any code length. The nth code issued is the nth integer
+    put through a keyed pseudorandom permutation of every code, so a code is never issued
+    twice as long as the key and the cursor (the number of codes issued) are kept.
+    """
+    def __init__(self, code_length, key=None, cursor=0):
+        """
+        Creates a GameCodeAllocator.
+
+        code_length: The number of characters in each game code. Must be even.
+        key: The 64 bit key choosing the permutation of the codes, or None for a random key
+        cursor: The number of codes already issued
+        """
+        self.code_length = code_length
+        self.num_codes = num_game_codes(code_length)
+        self.key = key if key is not None else random.SystemRandom().getrandbits(64)
+        self.cursor = cursor
+        self.permutation = KeyedPermutation(self.num_codes, self.key)
+
+    def code_int(self, index):
+        """
+        Returns the integer of the indexth game code issued.
+
+        index: The position of the code in the order codes are issued in
+        """
+        if index < 0 or index >= self.num_codes:
+            raise IndexError("game code index out of range")
+        return self.permutation[index]
+
+    def code(self, index):
+        """
+        Returns the indexth game code issued.
+
+        index: The position of the code in the order codes are issued in
+        """
+        return int_to_code(self.code_int(index), self.code_length)
+
+    def remaining(self):
+        """
+        Returns the number of game codes which have not been issued.
+        """
+        return self.num_codes - self.cursor
+
+    def allocate(self, num_codes):
+        """
+        Issues the next num_codes game codes, returning them as a list. Raises ValueError if
+        there are not that many codes left.
+
+        num_codes: The number of codes to issue
+        """
+        if num_codes > self.remaining():
+            raise ValueError("Only " + str(self.remaining()) + " unused game codes of length " +
+                             str(self.code_length) + " remain")
+        codes = [self.code(i) for i in range(self.cursor, self.cursor + num_codes)]
+        self.cursor += num_codes
+        return codes
+
+    def save(self, filename):
+        """
+        Saves the key and cursor to a file. The file is replaced atomically, so it always
+        describes a consistent state.
+
+        filename: The file to save the allocator to
+        """
+        state = {
+            "code_length": self.code_length,
+            "key": self.key,
+            "cursor": self.cursor
+        }
+        with open(filename + ".tmp", "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(filename + ".tmp", filename)
+
+    @classmethod
+    def load(cls, filename, code_length):
+        """
+        Loads an allocator saved by save, or creates one with a new random key if the file does
+        not exist. Raises ValueError if the file is for a different code length.
+
+        filename: The file the allocator was saved to
+        code_length: The number of characters in each game code
+        """
+        if not os.path.exists(filename):
+            return cls(code_length)
+
+        with open(filename, "r") as f:
+            state = json.load(f)
+
+        if state["code_length"] != code_length:
+            raise ValueError(filename + " is for game codes of length " + str(state["code_length"]) +
+                             ", not " + str(code_length))
+        return cls(code_length, state["key"], state["cursor"])
@@ -0,0 +1,159 @@
+import bisect
+import random
+import threading
+import time
+
+from .permutation import KeyedPermutation
+
+class GameIdRanges:
+    """
+    A sorted list of game ids, held as runs of consecutive ids. Games are added in bulk, so
+    the ids of each board size are a few long runs, and the ith id can be found in time
+    logarithmic in the number of runs rather than holding every id.
+    """
+    def __init__(self, ids=()):
+        """
+        Creates a GameIdRanges.
+
+        ids: An iterable of distinct game ids, in increasing order
+        """
+        # The first id of each run, and the number of ids before each run
+        self.starts = []
+        self.offsets = []
+        self.num_ids = 0
+        self._last_id = None
+        self.extend(ids)
+
+    def extend(self, ids):
+        """
+        Adds more ids, so that they can be loaded a batch at a time.
+
+        ids: An iterable of distinct game ids, in increasing order, greater than the ids
+            already added
+        """
+        for gid in ids:
+            if self._last_id is None or gid != self._last_id + 1:
+                self.starts.append(gid)
+                self.offsets.append(self.num_ids)
+            self.num_ids += 1
+            self._last_id = gid
+
+    def __len__(self):
+        return self.num_ids
+
+    def __getitem__(self, i):
+        """
+        Returns the ith smallest id.
+        """
+        if i < 0 or i >= self.num_ids:
+            raise IndexError("game id index out of range")
+        run = bisect.bisect_right(self.offsets, i) - 1
+        return self.starts[run] + (i - self.offsets[run])
+
+class GamePicker:
+    """
+    Picks random games of a board size uniformly, without asking the database which games
+    there are on every pick. The ids of the games of each board size are loaded once and kept
+    as GameIdRanges until they are invalidated (when games are added or removed) or are older
+    than max_age. Games can be picked independently, or dealt from a shuffled deck of every
+    game of the size so that no game repeats until every game has been dealt.
+    """
+    def __init__(self, load_ids, max_age=300, rng=random):
+        """
+        Creates a GamePicker.
+
+        load_ids: A function from a board size to an iterable of the ids of the games of that
+            size, in increasing order
+        max_age: The number of seconds to keep the ids of a board size before loading them again,
+            to notice games added by other processes. None keeps them until they are invalidated.
+        rng: The random number generator to pick games and shuffle decks with
+        """
+        self.load_ids = load_ids
+        self.max_age = max_age
+        self.rng = rng
+        # Maps board size to [GameIdRanges, load time, deck KeyedPermutation, deck position]
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def _current(self, entry, now):
+        """
+        Returns true if an entry exists and is not out of date.
+        """
+        return entry is not None and (self.max_age is None or now - entry[1] < self.max_age)
+
+    def _entry(self, board_size):
+        """
+        Returns the entry for a board size, loading its ids if they are missing or out of date.
+        """
+        entry = self._sizes.get(board_size)
+        now = time.monotonic()
+        if not self._current(entry, now):
+            entry = [GameIdRanges(self.load_ids(board_size)), now, None, 0]
+            self._sizes[board_size] = entry
+        return entry
+
+    def has_ids(self, board_size):
+        """
+        Returns true if the ids of a board size are loaded and up to date, so that picking a
+        game of that size does not call load_ids.
+        """
+        with self._lock:
+            return self._current(self._sizes.get(board_size), time.monotonic())
+
+    def set_ids(self, board_size, ids):
+        """
+        Uses ids loaded by the caller for a board size, such as by an asyncio query, rather
+        than calling load_ids.
+
+        board_size: The board size of the games
+        ids: A GameIdRanges of the ids of every game of that size
+        """
+        with self._lock:
+            self._sizes[board_size] = [ids, time.monotonic(), None, 0]
+
+    def count(self, board_size):
+        """
+        Returns the number of games of a board size.
+        """
+        with self._lock:
+            return len(self._entry(board_size)[0])
+
+    def pick(self, board_size):
+        """
+        Returns the id of a game of a board size, picked uniformly at random, or None if
+        there are no games of that size.
+        """
+        with self._lock:
+            ids = self._entry(board_size)[0]
+            if len(ids) == 0:
+                return None
+            return ids[self.rng.randrange(len(ids))]
+
+    def deal(self, board_size):
+        """
+        Returns the id of the next game of a board size from a shuffled deck of every game of
+        that size, or None if there are no games of that size. A new deck is shuffled when
+        every game has been dealt or the ids are loaded again.
+        """
+        with self._lock:
+            entry = self._entry(board_size)
+            ids, loaded, deck, position = entry
+            if len(ids) == 0:
+                return None
+            if deck is None or position >= len(deck):
+                deck = KeyedPermutation(len(ids), self.rng.getrandbits(64))
+                position = 0
+            entry[2] = deck
+            entry[3] = position + 1
+            return ids[deck[position]]
+
+    def invalidate(self, board_size=None):
+        """
+        Forgets the ids of the games of a board size, or of every board size, so that they
+        are loaded again on the next pick.
+        """
+        with self._lock:
+            if board_size is None:
+                self._sizes.clear()
+            else:
+                self._sizes.pop(board_size, None)
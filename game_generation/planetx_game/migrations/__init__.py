@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from . import m0001_schema, m0002_query_indexes
+
+# The migrations which make up the database schema, in order. Migration i + 1 is version i + 1
+# of the schema. Each migration module has a description and lists of the statements to run
+# on each backend, named after the backend. New migrations are added to the end; existing ones
+# are never changed, since databases may already have applied them.
+MIGRATIONS = [m0001_schema, m0002_query_indexes]
+
+# The migrations applied to a database
+_version_table_query = ("CREATE TABLE IF NOT EXISTS schema_migrations ("
+                        "version INTEGER NOT NULL PRIMARY KEY, "
+                        "description VARCHAR(255) NOT NULL, "
+                        "applied_at TIMESTAMP NULL)")
+
+def latest_version():
+    """
+    Returns the version of the schema with every migration applied
+    """
+    return len(MIGRATIONS)
+
+def schema_version(cursor):
+    """
+    Returns the version of a database's schema: the last migration applied to it, or 0 if none
+    have been
+
+    cursor: A cursor on the database
+    """
+    cursor.execute(_version_table_query)
+    cursor.execute("SELECT MAX(version) FROM schema_migrations")
+    version = cursor.fetchone()[0]
+    return 0 if version is None else int(version)
+
+def migrate(backend, cxn, target=None):
+    """
+    Applies the migrations a database has not had yet, up to a version, committing after each
+    one. Migrations are never undone, so a target older than the database's version does
+    nothing. Returns the list of versions applied.
+
+    backend: The DatabaseBackend of the database, which runs the statements for its name
+    cxn: A connection to the database
+    target: The version to migrate to, or None for the latest version
+    """
+    if target is None:
+        target = latest_version()
+    elif target > latest_version():
+        raise ValueError("No schema version " + str(target) + ", the latest is " + str(latest_version()))
+
+    cursor = cxn.cursor()
+    applied = []
+    try:
+        current = schema_version(cursor)
+        for version in range(current + 1, target + 1):
+            migration = MIGRATIONS[version - 1]
+            for statement in getattr(migration, backend.name):
+                backend.execute_ddl(cursor, statement)
+            cursor.execute("INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)",
+                           (version, migration.description, datetime.now().replace(microsecond=0)))
+            cxn.commit()
+            applied.append(version)
+    finally:
+        cursor.close()
+
+    return applied
@@ -0,0 +1,44 @@
+# Checks that the statements db_ops executes look rows up through the indexes the migrations
+# create, by asking the database for each statement's query plan. Record the statements with
+# db_ops.record_statements() while running the operations, then pass them to check_indexes.
+
+# Statements which read whole tables on purpose: listing every game or session code, and
+# emptying the games table
+ALLOWED_FULL_SCANS = {
+    "SELECT game_code FROM games",
+    "SELECT session_code FROM sessions",
+    "DELETE FROM games",
+    "DELETE FROM sqlite_sequence WHERE name = %s"
+}
+
+# Statements which have query plans. Others, such as INSERT ... VALUES and CALL, read no rows
+# themselves.
+_CHECKED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+def check_indexes(backend, cxn, statements, allowed=ALLOWED_FULL_SCANS):
+    """
+    Returns a list of the statements which would read a whole table, as pairs of the query and
+    the list of tables it reads in full. An empty list means every statement uses an index.
+    The plan depends on the data, so on MySQL the check is only meaningful with realistically
+    sized tables; small tables are often scanned anyway.
+
+    backend: The DatabaseBackend of the database
+    cxn: A connection to the database
+    statements: An iterable of (query, params) pairs, as from db_ops.record_statements()
+    allowed: The queries which may read whole tables
+    """
+    cursor = cxn.cursor()
+    failures = []
+    checked = set()
+    try:
+        for query, params in statements:
+            if query in checked or query in allowed or not query.lstrip().upper().startswith(_CHECKED_STATEMENTS):
+                continue
+            checked.add(query)
+            tables = backend.full_scans(cursor, query, params)
+            if len(tables) > 0:
+                failures.append((query, tables))
+    finally:
+        cursor.close()
+
+    return failures
@@ -0,0 +1,191 @@
+# The tables and procedures used by db_ops and node_server (dbOps.js), and the indexes their
+# unique columns need. The columns only node_server uses (the turn numbers, player colours,
+# connections and kicks, and theory accuracy) come after the ones db_ops reads by position.
+
+description = "Create the games, sessions, players, theories, actions, kickvotes and versions tables and the player procedures"
+
+mysql = [
+    """CREATE TABLE IF NOT EXISTS games (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        game_code VARCHAR(32) NOT NULL,
+        board_size INT NOT NULL,
+        board_objects VARCHAR(64) NOT NULL,
+        research TEXT NOT NULL,
+        conference TEXT NOT NULL,
+        starting_information TEXT NOT NULL,
+        UNIQUE KEY games_game_code (game_code)
+    ) ENGINE = InnoDB""",
+
+    """CREATE TABLE IF NOT EXISTS sessions (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        session_code VARCHAR(32) NOT NULL,
+        game_size INT NOT NULL,
+        game_id INT NOT NULL,
+        first_rotation BOOLEAN NOT NULL DEFAULT TRUE,
+        current_sector INT NOT NULL DEFAULT 0,
+        current_action VARCHAR(32),
+        action_player INT,
+        current_turn INT,
+        UNIQUE KEY sessions_session_code (session_code),
+        FOREIGN KEY (game_id) REFERENCES games (id)
+    ) ENGINE = InnoDB""",
+
+    """CREATE TABLE IF NOT EXISTS players (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        session_id INT NOT NULL,
+        num INT NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        sector INT NOT NULL DEFAULT 0,
+        arrival INT NOT NULL DEFAULT 0,
+        color INT,
+        kicked BOOLEAN NOT NULL DEFAULT FALSE,
+        connected BOOLEAN NOT NULL DEFAULT TRUE,
+        UNIQUE KEY players_session_color (session_id, color),
+        FOREIGN KEY (session_id) REFERENCES sessions (id)
+    ) ENGINE = InnoDB""",
+
+    """CREATE TABLE IF NOT EXISTS theories (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        session_id INT NOT NULL,
+        player_id INT NOT NULL,
+        object VARCHAR(8) NOT NULL,
+        sector INT NOT NULL,
+        progress INT NOT NULL DEFAULT 0,
+        accurate BOOLEAN,
+        frozen BOOLEAN NOT NULL DEFAULT FALSE,
+        turn INT,
+        FOREIGN KEY (session_id) REFERENCES sessions (id),
+        FOREIGN KEY (player_id) REFERENCES players (id)
+    ) ENGINE = InnoDB""",
+
+    """CREATE TABLE IF NOT EXISTS actions (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        action_type VARCHAR(32) NOT NULL,
+        player_id INT NOT NULL,
+        resolved BOOLEAN NOT NULL DEFAULT FALSE,
+        resolve_time TIMESTAMP NULL,
+        resolve_action VARCHAR(64),
+        turn INT,
+        FOREIGN KEY (player_id) REFERENCES players (id)
+    ) ENGINE = InnoDB""",
+
+    # Each player's vote on kicking another player out of their session
+    """CREATE TABLE IF NOT EXISTS kickvotes (
+        kick_player INT NOT NULL,
+        vote_player INT NOT NULL,
+        vote BOOLEAN NOT NULL,
+        PRIMARY KEY (kick_player, vote_player),
+        FOREIGN KEY (kick_player) REFERENCES players (id),
+        FOREIGN KEY (vote_player) REFERENCES players (id)
+    ) ENGINE = InnoDB""",
+
+    # The version of the game encoding, which node_server sends with every game
+    """CREATE TABLE IF NOT EXISTS versions (
+        name VARCHAR(32) NOT NULL PRIMARY KEY,
+        version INT NOT NULL
+    ) ENGINE = InnoDB""",
+
+    "INSERT IGNORE INTO versions (name, version) VALUES ('game', 1)",
+
+    # Adds a player to a session, numbered from 1 in the order players join and starting in
+    # sector 0 in that order. The session row is locked so players join one at a time.
+    """CREATE PROCEDURE NewPlayer(IN in_session_code VARCHAR(32), IN in_name VARCHAR(255),
+                                  OUT out_player_num INT, OUT out_player_id INT)
+    BEGIN
+        DECLARE joined_session_id INT;
+        SELECT id INTO joined_session_id FROM sessions WHERE session_code = in_session_code FOR UPDATE;
+        SELECT COUNT(*) + 1 INTO out_player_num FROM players WHERE session_id = joined_session_id;
+        INSERT INTO players (session_id, num, name, sector, arrival)
+            VALUES (joined_session_id, out_player_num, in_name, 0, out_player_num);
+        SET out_player_id = LAST_INSERT_ID();
+    END""",
+
+    # Moves a player forward a number of sectors around the board, arriving after every other
+    # player already in the sector it lands in
+    """CREATE PROCEDURE MovePlayer(IN in_player_id INT, IN in_sectors INT)
+    BEGIN
+        DECLARE moved_session_id INT;
+        DECLARE new_sector INT;
+        DECLARE new_arrival INT;
+        SELECT players.session_id, MOD(players.sector + in_sectors, sessions.game_size)
+            INTO moved_session_id, new_sector
+            FROM players, sessions WHERE players.session_id = sessions.id AND players.id = in_player_id
+            FOR UPDATE;
+        SELECT COALESCE(MAX(arrival), 0) + 1 INTO new_arrival FROM players
+            WHERE session_id = moved_session_id AND sector = new_sector AND id != in_player_id;
+        UPDATE players SET sector = new_sector, arrival = new_arrival WHERE id = in_player_id;
+    END"""
+]
+
+sqlite = [
+    """CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        game_code TEXT NOT NULL UNIQUE,
+        board_size INTEGER NOT NULL,
+        board_objects TEXT NOT NULL,
+        research TEXT NOT NULL,
+        conference TEXT NOT NULL,
+        starting_information TEXT NOT NULL
+    )""",
+
+    """CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_code TEXT NOT NULL UNIQUE,
+        game_size INTEGER NOT NULL,
+        game_id INTEGER NOT NULL REFERENCES games (id),
+        first_rotation BOOLEAN NOT NULL DEFAULT TRUE,
+        current_sector INTEGER NOT NULL DEFAULT 0,
+        current_action TEXT,
+        action_player INTEGER,
+        current_turn INTEGER
+    )""",
+
+    """CREATE TABLE IF NOT EXISTS players (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL REFERENCES sessions (id),
+        num INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        sector INTEGER NOT NULL DEFAULT 0,
+        arrival INTEGER NOT NULL DEFAULT 0,
+        color INTEGER,
+        kicked BOOLEAN NOT NULL DEFAULT FALSE,
+        connected BOOLEAN NOT NULL DEFAULT TRUE,
+        UNIQUE (session_id, color)
+    )""",
+
+    """CREATE TABLE IF NOT EXISTS theories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER NOT NULL REFERENCES sessions (id),
+        player_id INTEGER NOT NULL REFERENCES players (id),
+        object TEXT NOT NULL,
+        sector INTEGER NOT NULL,
+        progress INTEGER NOT NULL DEFAULT 0,
+        accurate BOOLEAN,
+        frozen BOOLEAN NOT NULL DEFAULT FALSE,
+        turn INTEGER
+    )""",
+
+    """CREATE TABLE IF NOT EXISTS actions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action_type TEXT NOT NULL,
+        player_id INTEGER NOT NULL REFERENCES players (id),
+        resolved BOOLEAN NOT NULL DEFAULT FALSE,
+        resolve_time TIMESTAMP,
+        resolve_action TEXT,
+        turn INTEGER
+    )""",
+
+    """CREATE TABLE IF NOT EXISTS kickvotes (
+        kick_player INTEGER NOT NULL REFERENCES players (id),
+        vote_player INTEGER NOT NULL REFERENCES players (id),
+        vote BOOLEAN NOT NULL,
+        PRIMARY KEY (kick_player, vote_player)
+    )""",
+
+    """CREATE TABLE IF NOT EXISTS versions (
+        name TEXT NOT NULL PRIMARY KEY,
+        version INTEGER NOT NULL
+    )""",
+
+    "INSERT OR IGNORE INTO versions (name, version) VALUES ('game', 1)"
+]
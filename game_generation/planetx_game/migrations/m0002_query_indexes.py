@@ -0,0 +1,25 @@
+# Indexes for every query pattern in db_ops, so that none of them reads a whole table. Each
+# index ends with the column its queries order by or fetch after (usually the id).
+#     games (board_size, id): picking games of a board size
+#     players (session_id, sector, arrival): the players of a session, and who arrived last
+#         in a sector when a player moves
+#     theories (session_id, id): the theories of a session, and those after an id
+#     actions (player_id, resolved, id): a player's pending action, and a session's pending
+#         actions and turns after an id (through its players)
+# Games and sessions are looked up by code through their unique indexes.
+
+description = "Add composite indexes for the db_ops queries"
+
+mysql = [
+    "CREATE INDEX games_board_size ON games (board_size, id)",
+    "CREATE INDEX players_session_sector ON players (session_id, sector, arrival)",
+    "CREATE INDEX theories_session_id ON theories (session_id, id)",
+    "CREATE INDEX actions_player_resolved ON actions (player_id, resolved, id)"
+]
+
+sqlite = [
+    "CREATE INDEX IF NOT EXISTS games_board_size ON games (board_size, id)",
+    "CREATE INDEX IF NOT EXISTS players_session_sector ON players (session_id, sector, arrival)",
+    "CREATE INDEX IF NOT EXISTS theories_session_id ON theories (session_id, id)",
+    "CREATE INDEX IF NOT EXISTS actions_player_resolved ON actions (player_id, resolved, id)"
+]
@@ -0,0 +1,59 @@
+MASK_64 = (1 << 64) - 1
+
+def mix64(x):
+    """
+    Scrambles the bits of a 64 bit integer (the splitmix64 finalizer)
+    """
+    x = (x + 0x9E3779B97F4A7C15) & MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return x ^ (x >> 31)
+
+class KeyedPermutation:
+    """
+    A pseudorandom permutation of the integers from 0 to n-1, chosen by a 64 bit key. Any
+    position can be looked up in constant time and memory, so the permutation can be walked
+    through without shuffling a list of every integer.
+    """
+    ROUNDS = 4
+
+    def __init__(self, n, key):
+        """
+        Creates a KeyedPermutation.
+
+        n: The number of integers to permute
+        key: The 64 bit key choosing the permutation
+        """
+        self.n = n
+        self.key = key
+
+        # The permutation is a Feistel network over the integers below the smallest even
+        # power of 2 which is at least n
+        self.half_bits = max(1, ((n - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+        self.round_keys = [mix64(key + r) for r in range(self.ROUNDS)]
+
+    def __len__(self):
+        return self.n
+
+    def _permute(self, x):
+        """
+        Maps an integer below 4**half_bits to another, as a permutation of those integers
+        """
+        left, right = x >> self.half_bits, x & self.half_mask
+        for round_key in self.round_keys:
+            left, right = right, left ^ (mix64(right ^ round_key) & self.half_mask)
+        return (left << self.half_bits) | right
+
+    def __getitem__(self, i):
+        """
+        Returns the integer at position i of the permutation. Integers from the Feistel network
+        which are n or more are put through it again until they are not (cycle walking), which
+        keeps the order a permutation of just 0 to n-1 and takes under 4 steps on average.
+        """
+        if i < 0 or i >= self.n:
+            raise IndexError("permutation index out of range")
+        x = self._permute(i)
+        while x >= self.n:
+            x = self._permute(x)
+        return x
@@ -1510,8 +1510,8 @@ class WithinRule(RelationRule):
         if self.space_object2 in board.num_objects():
             num_obj2 -= board.num_objects()[self.space_object2]
                 
-        return [Board(b) for b in fill_no_within({self.space_object1: num_obj1, self.space_object2: num_obj2}, \
-                                                 board, self.num_sectors)]
+        return [board.from_objects(b) for b in fill_no_within({self.space_object1: num_obj1, self.space_object2: num_obj2}, \
+                                                            board, self.num_sectors)]
    
     def _fill_board_every(self, board, num_obj1, num_objects_left, start_i=0):
         # num_obj1: how many should be on the board starting from start_i
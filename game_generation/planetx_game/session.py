@@ -116,7 +116,8 @@ class Player:
         }
     
 class Theory:
-    def __init__(self, space_object, sector, player_id=None, progress=0):
+    def __init__(self, space_object, sector, player_id=None, progress=0, theory_id=None):
+        self.theory_id = theory_id
         self.space_object = space_object
         self.sector = sector
         self.progress = progress
@@ -139,4 +140,29 @@ class Theory:
             "progress": self.progress,
             "revealed": self.revealed(),
             "playerID": self.player_id
-        }
\ No newline at end of file
+        }
+    
+class SessionSnapshot:
+    """
+    The whole state of a session at one time: the session itself, with its players,
+    theories, pending actions and previous turns
+    """
+    def __init__(self, session_id, session_code, game_size, game_id, first_rotation, current_sector,
+                 action_type, action_player, players, theories, actions, turns):
+        self.session_id = session_id
+        self.session_code = session_code
+        self.game_size = game_size
+        self.game_id = game_id
+        self.first_rotation = first_rotation
+        self.current_sector = current_sector
+        # The ActionType of the session's current action, or None
+        self.action_type = action_type
+        self.action_player = action_player
+        self.players = players
+        self.theories = theories
+        self.actions = actions
+        self.turns = turns
+        
+    def __repr__(self):
+        return "<Session " + self.session_code + ": " + str(len(self.players)) + " players, " + \
+                str(len(self.theories)) + " theories, " + str(len(self.turns)) + " turns>"
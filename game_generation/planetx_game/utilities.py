@@ -53,43 +53,85 @@ def permutations_multi(counts):
     if not obj_choices:
         yield []          
         
+# Marks keeping a run of existing objects in a slot while backtracking
+_HOLE = object()
+
 def sum_counts(d):
     s = 0
     for k in d:
         s += d[k]
     return s
                             
-def _fill_no_touch(prev, counts, holes, no_touch_objs, t=0):
-    if len(counts.keys()) == 0:
-        if all(holes):
-            # If valid so far and all holes left, fill in Nones for holes
-            if len(holes) == 0 or \
-            (holes[0][0] == prev or holes[0][0] not in no_touch_objs or prev not in no_touch_objs):
-                yield [None]*len(holes)
-        return
-    else:
-        # If we're at a hole and valid
-        if holes[0] and (holes[0][0] == prev or holes[0][0] not in no_touch_objs or prev not in no_touch_objs):
-            # Add a hole and continue
-            for p in _fill_no_touch(holes[0][-1], counts, holes[1:], no_touch_objs, t+1):
-                yield [None] + p
+def _fill_no_touch(counts, holes, no_touch_objs):
+    """
+    Generates every way to fill in the slots of holes (False for an empty sector, or the
+    tuple of objects in a run of existing objects) with the objects in counts, such that
+    no two different objects in no_touch_objs touch. Yields a tuple with the object for
+    each slot, or None for runs of existing objects.
+    
+    Backtracks over one working list instead of recursing, taking objects out of counts 
+    as they are placed and putting them back on the way back.
+    """
+    counts = dict(counts)
+    no_touch_objs = set(no_touch_objs)
+    num_left = sum_counts(counts)
+    num_slots = len(holes)
+    
+    def allowed(obj, prev):
+        return obj == prev or prev not in no_touch_objs or obj not in no_touch_objs
+    
+    p = [None] * num_slots
+    # prevs[d]: the object before slot d
+    prevs = [None] * (num_slots + 1)
+    # options[d]: the objects to try in slot d, or [_HOLE] to keep a run of existing objects
+    options = [None] * (num_slots + 1)
+    next_option = [0] * (num_slots + 1)
+    
+    d = 0
+    entering = True
+    while d >= 0:
+        if entering:
+            entering = False
+            next_option[d] = 0
+            if num_left == 0:
+                # If valid so far and all holes left, fill in Nones for holes
+                options[d] = []
+                if all(holes[d:]) and (d == num_slots or allowed(holes[d][0], prevs[d])):
+                    yield tuple(p[:d]) + (None,) * (num_slots - d)
+            elif d == num_slots:
+                options[d] = []
+            elif holes[d]:
+                # Keep the hole if it doesn't touch the previous object
+                options[d] = [_HOLE] if allowed(holes[d][0], prevs[d]) else []
+            else:
+                prev = prevs[d]
+                if prev in no_touch_objs:
+                    options[d] = [obj for obj, count in counts.items() if count > 0 and (obj == prev or obj not in no_touch_objs)]
+                else:
+                    options[d] = [obj for obj, count in counts.items() if count > 0]
+        
+        if next_option[d] < len(options[d]):
+            # Place the next option in slot d and continue
+            obj = options[d][next_option[d]]
+            next_option[d] += 1
+            if obj is _HOLE:
+                p[d] = None
+                prevs[d+1] = holes[d][-1]
+            else:
+                p[d] = obj
+                counts[obj] -= 1
+                num_left -= 1
+                prevs[d+1] = obj
+            d += 1
+            entering = True
         else:
-            # Loop through each object and check if we're allowed to put it next
-            first_objs = list(counts.keys())
-            for obj in first_objs:
-                if obj == prev or prev not in no_touch_objs or obj not in no_touch_objs:
-                    counts[obj] -= 1
-                    if counts[obj] == 0:
-                        del counts[obj]
-                
-                    # Place object next and continue
-                    for p in _fill_no_touch(obj, counts, holes[1:], no_touch_objs, t+1):
-                        yield [obj] + p
-            
-                    if obj in counts:
-                        counts[obj] += 1
-                    else:
-                        counts[obj] = 1
+            # Out of options, so undo the option placed in the slot before
+            d -= 1
+            if d >= 0:
+                obj = options[d][next_option[d] - 1]
+                if obj is not _HOLE:
+                    counts[obj] += 1
+                    num_left += 1
 
 def fill_no_touch(counts, board):
     # Create list of holes
@@ -125,7 +167,7 @@ def fill_no_touch(counts, board):
             if put_counts[obj] == 0:
                 del put_counts[obj]
         # Fill without touching
-        for p in _fill_no_touch(None, put_counts, holes, counts.keys()):
+        for p in _fill_no_touch(put_counts, holes, counts.keys()):
             first_val = p[0] if holes[0] == False else holes[0][0]
             last_val = p[-1] if holes[-1] == False else holes[-1][-1]
 
@@ -146,15 +188,33 @@ def add_one_no_touch(obj1, obj2, num_obj1, board, start_i=0):
     # No more object left to add, current board is fine
     if num_obj1 == 0:
         yield board
-        return 
+        return
     
-    for i in range(start_i, len(board)):
-        # Add object at position i if allowed
-        if board[i] is None and board[i-1] != obj2 and board[i+1] != obj2:
-            board_copy = board.copy()
-            board_copy[i] = obj1
-            # Continue adding objects after i
-            yield from add_one_no_touch(obj1, obj2, num_obj1 - 1, board_copy, i+1)
+    # Place objects on one working board, undoing them to try later positions, and only
+    # copy the board once every object is placed
+    board = board.copy()
+    positions = []
+    i = start_i
+    while True:
+        # Stop trying positions once there isn't room for the rest of the objects
+        if len(board) - i >= num_obj1 - len(positions):
+            # Add object at position i if allowed
+            if board[i] is None and board[i-1] != obj2 and board[i+1] != obj2:
+                board[i] = obj1
+                if len(positions) + 1 == num_obj1:
+                    yield board.copy()
+                    board[i] = None
+                else:
+                    # Continue adding objects after i
+                    positions.append(i)
+            i += 1
+        elif len(positions) > 0:
+            # Move the last object placed to its next position
+            i = positions.pop()
+            board[i] = None
+            i += 1
+        else:
+            return
 
 def add_two_no_touch(obj1, obj2, num_obj1, num_obj2, board):
     # Add the object 1's 
@@ -167,66 +227,109 @@ def add_one_no_self_touch(obj, num_obj, board, start_i=0):
     # No more object left to add, current board is fine
     if num_obj == 0:
         yield board
-        return 
-    
-    for i in range(start_i, len(board)):
-        # Add object at position i if allowed
-        if board[i] is None and board[i-1] != obj and board[i+1] != obj:
-            board_copy = board.copy()
-            board_copy[i] = obj
-            # Continue adding objects after i
-            yield from add_one_no_self_touch(obj, num_obj - 1, board_copy, i+2)
-                    
-def _fill_no_within(prev, countdown, counts, no_within_objs, board, n, i):
-    if (i == len(board)):
-        yield []
         return
     
-    if board[i] != None:
-        if board[i] in no_within_objs:
-            if board[i] != prev and countdown != 0:
-                # Already violates rule
-                return
-            # Restart countdown, encountered an object in the set again
-            new_prev = board[i]
-            new_countdown = n
+    # Place objects on one working board, undoing them to try later positions, and only
+    # copy the board once every object is placed
+    board = board.copy()
+    positions = []
+    i = start_i
+    while True:
+        # Stop trying positions once there isn't room for the rest of the objects
+        if len(board) - i >= num_obj - len(positions):
+            # Add object at position i if allowed
+            if board[i] is None and board[i-1] != obj and board[i+1] != obj:
+                board[i] = obj
+                if len(positions) + 1 == num_obj:
+                    yield board.copy()
+                    board[i] = None
+                    i += 1
+                else:
+                    # Continue adding objects after i, skipping the sector next to it
+                    positions.append(i)
+                    i += 2
+            else:
+                i += 1
+        elif len(positions) > 0:
+            # Move the last object placed to its next position
+            i = positions.pop()
+            board[i] = None
+            i += 1
         else:
-            # Moved further from an object, decrease countdown
-            new_prev = prev
-            new_countdown = max(0, countdown - 1)
-        # Fill in board where possible starting after this index
-        for p in _fill_no_within(new_prev, new_countdown, counts, no_within_objs, board, n, i+1):
-            yield [board[i]] + p
-        return
-        
-    obj_choices = list(counts.keys())
-    for obj in obj_choices:
-        restricted_obj = obj in no_within_objs
-        # Check if object is allowed to be placed here
-        if obj == prev or not restricted_obj or countdown == 0:
-            counts[obj] -= 1
-            if counts[obj] == 0:
-                del counts[obj]
-                
-            if restricted_obj:
-                new_countdown = n
-                new_prev = obj
+            return
+
+def _fill_no_within(counts, no_within_objs, board, n):
+    """
+    Generates every way to fill in the unassigned sectors of board with the objects in 
+    counts, such that no two different objects in no_within_objs are within n sectors of 
+    each other (not counting wraparound). Yields a tuple of the objects in each sector.
+    
+    Backtracks over one working list instead of recursing, taking objects out of counts 
+    as they are placed and putting them back on the way back.
+    """
+    counts = dict(counts)
+    no_within_objs = set(no_within_objs)
+    size = len(board)
+    
+    p = [None] * size
+    # prevs[i] and countdowns[i]: the last object in no_within_objs before sector i, and 
+    # how many more sectors until another object in no_within_objs is allowed
+    prevs = [None] * (size + 1)
+    countdowns = [0] * (size + 1)
+    # options[i]: the objects to try in sector i
+    options = [None] * (size + 1)
+    next_option = [0] * (size + 1)
+    
+    i = 0
+    entering = True
+    while i >= 0:
+        if entering:
+            entering = False
+            next_option[i] = 0
+            if i == size:
+                options[i] = []
+                yield tuple(p)
+            elif board[i] is not None:
+                if board[i] in no_within_objs and board[i] != prevs[i] and countdowns[i] != 0:
+                    # Already violates rule
+                    options[i] = []
+                else:
+                    options[i] = [board[i]]
             else:
-                new_countdown = max(0, countdown - 1)
-                new_prev = prev
-                
-            # Fill in board starting after the index adding this object
-            for p in _fill_no_within(new_prev, new_countdown, counts, no_within_objs, board, n, i+1):
-                yield [obj] + p
-            
-            if obj in counts:
-                counts[obj] += 1
+                # Check which objects are allowed to be placed here
+                prev = prevs[i]
+                if countdowns[i] == 0:
+                    options[i] = [obj for obj, count in counts.items() if count > 0]
+                else:
+                    options[i] = [obj for obj, count in counts.items() if count > 0 and 
+                                  (obj == prev or obj not in no_within_objs)]
+        
+        if next_option[i] < len(options[i]):
+            # Place the next option in sector i and continue
+            obj = options[i][next_option[i]]
+            next_option[i] += 1
+            p[i] = obj
+            if board[i] is None:
+                counts[obj] -= 1
+            if obj in no_within_objs:
+                # Restart countdown, placed an object in the set
+                prevs[i+1] = obj
+                countdowns[i+1] = n
             else:
-                counts[obj] = 1
+                # Moved further from an object, decrease countdown
+                prevs[i+1] = prevs[i]
+                countdowns[i+1] = max(0, countdowns[i] - 1)
+            i += 1
+            entering = True
+        else:
+            # Out of options, so undo the option placed in the sector before
+            i -= 1
+            if i >= 0 and board[i] is None:
+                counts[options[i][next_option[i] - 1]] += 1
 
 def fill_no_within(counts, board, n):
     num_none = len([obj for obj in board if obj is None]) - sum_counts(counts)
-    for p in _fill_no_within(None, 0, {**counts, None: num_none}, counts.keys(), board, n, 0):
+    for p in _fill_no_within({**counts, None: num_none}, counts.keys(), board, n):
         # Ensure the objects aren't too close to each other due to wraparound
         try:
             first_i = next(i for i, obj in enumerate(p) if obj in counts)
@@ -238,29 +341,78 @@ def fill_no_within(counts, board, n):
             # Not >= 2 objects in counts in the board
             yield p
             
-def _fill_no_self_touch(prev, holes, obj, num_obj, num_none, t=0):
-    if num_obj == 0 and num_none == 0:
-        if all(holes):
-            # If there are only holes left and the hole doesn't conflict with the previous object,
-            # add the holes
-            if len(holes) == 0 or \
-            (holes[0][0] != prev or holes[0][0] != obj or prev != obj):
-                yield [None]*len(holes)
-        return
-    else:
-        # If there is a hole it doesn't conflict with the previous object, add it
-        if holes[0] and (holes[0][0] != prev or holes[0][0] != obj or prev != obj or prev is None):
-            for p in _fill_no_self_touch(holes[0][-1], holes[1:], obj, num_obj, num_none, t+1):
-                yield [None] + p
+def _fill_no_self_touch(holes, obj, num_obj, num_none):
+    """
+    Generates every way to fill in the slots of holes (False for an empty sector, or the
+    tuple of objects in a run of existing objects) with num_obj obj's and num_none Nones, 
+    such that no two obj's touch. Yields a tuple with the object for each slot, or None 
+    for runs of existing objects.
+    
+    Backtracks over one working list instead of recursing.
+    """
+    num_slots = len(holes)
+    
+    def allowed(hole_obj, prev):
+        return hole_obj != prev or hole_obj != obj or prev != obj or prev is None
+    
+    p = [None] * num_slots
+    # prevs[d]: the object before slot d
+    prevs = [None] * (num_slots + 1)
+    # options[d]: the objects to try in slot d, or [_HOLE] to keep a run of existing objects
+    options = [None] * (num_slots + 1)
+    next_option = [0] * (num_slots + 1)
+    
+    d = 0
+    entering = True
+    while d >= 0:
+        if entering:
+            entering = False
+            next_option[d] = 0
+            if num_obj == 0 and num_none == 0:
+                # If there are only holes left and the hole doesn't conflict with the 
+                # previous object, add the holes
+                options[d] = []
+                if all(holes[d:]) and (d == num_slots or allowed(holes[d][0], prevs[d])):
+                    yield tuple(p[:d]) + (None,) * (num_slots - d)
+            elif d == num_slots:
+                options[d] = []
+            elif holes[d]:
+                # Keep the hole if it doesn't conflict with the previous object
+                options[d] = [_HOLE] if allowed(holes[d][0], prevs[d]) else []
+            else:
+                options[d] = []
+                # If we have objects left and the last thing wasn't this object, we can add it
+                if num_obj > 0 and (obj != prevs[d] or prevs[d] is None):
+                    options[d].append(obj)
+                # If we have empties left, we can add one
+                if num_none > 0:
+                    options[d].append(None)
+        
+        if next_option[d] < len(options[d]):
+            # Place the next option in slot d and continue
+            option = options[d][next_option[d]]
+            next_option[d] += 1
+            if option is _HOLE:
+                p[d] = None
+                prevs[d+1] = holes[d][-1]
+            else:
+                p[d] = option
+                prevs[d+1] = option
+                if option is None:
+                    num_none -= 1
+                else:
+                    num_obj -= 1
+            d += 1
+            entering = True
         else:
-            # If we have objects left and the last thing wasn't this object, we can add it
-            if num_obj > 0 and (obj != prev or prev is None):
-                for p in _fill_no_self_touch(obj, holes[1:], obj, num_obj - 1, num_none, t+1):
-                    yield [obj] + p
-            # If we have empties left, we can add one
-            if num_none > 0:
-                for p in _fill_no_self_touch(None, holes[1:], obj, num_obj, num_none - 1, t+1):
-                    yield [None] + p
+            # Out of options, so undo the option placed in the slot before
+            d -= 1
+            if d >= 0:
+                option = options[d][next_option[d] - 1]
+                if option is None:
+                    num_none += 1
+                elif option is not _HOLE:
+                    num_obj += 1
 
 def fill_no_self_touch(obj, num_obj, board):
     # Build list of holes
@@ -290,7 +442,7 @@ def fill_no_self_touch(obj, num_obj, board):
         return []
     else:
         # Fill without self-touch (array)
-        for p in _fill_no_self_touch(None, holes, obj, num_obj, empty):
+        for p in _fill_no_self_touch(holes, obj, num_obj, empty):
             # Make sure first and last aren't both obj
             if p[0] != p[-1] or p[0] != obj or p[-1] != obj:
                 # Make sure holes at start/end don't make the first and last be both obj
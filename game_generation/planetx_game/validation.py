@@ -0,0 +1,264 @@
+import numpy as np
+
+from .rules import *
+from .board import SpaceObject, SECTOR_BITS, SECTOR_MASK, _sector_codes
+from .board_file import HEADER, VERSION, is_board_file, record_size, complete_boards
+
+# Boards are held as an (N, sectors) int8 array of the same sector codes CompactBoard
+# uses: 0 for an unassigned sector and value+1 for each SpaceObject. Characters which
+# are not space object initials are loaded as -1.
+_char_codes = np.full(256, -1, dtype=np.int8)
+_char_codes[ord("-")] = _sector_codes[None]
+for _obj in SpaceObject:
+    _char_codes[ord(_obj.initial())] = _sector_codes[_obj]
+
+def load_boards(filename, board_length):
+    """
+    Loads every board in a board file as an (N, board_length) int8 array of sector codes.
+
+    filename: A binary board file, or a text file with one board per line
+    board_length: The number of sectors on each board
+    """
+    if is_board_file(filename):
+        return _load_binary_boards(filename, board_length)
+
+    data = np.fromfile(filename, dtype=np.uint8)
+    if len(data) == 0:
+        return np.zeros((0, board_length), dtype=np.int8)
+
+    # Every line has the same width, so the file can be reshaped into one row per board
+    line_ending = np.frombuffer(b"\r\n" if len(data) > board_length and data[board_length] == ord("\r") else b"\n", dtype=np.uint8)
+    if data[-1] != ord("\n"):
+        data = np.concatenate([data, line_ending])
+    line_length = board_length + len(line_ending)
+    if len(data) % line_length != 0:
+        raise ValueError(filename + " does not have one board of " + str(board_length) + " sectors per line")
+    lines = data.reshape(-1, line_length)
+    if np.any(lines[:, board_length:] != line_ending):
+        raise ValueError(filename + " does not have one board of " + str(board_length) + " sectors per line")
+    return _char_codes[lines[:, :board_length]]
+
+def _load_binary_boards(filename, board_length):
+    """
+    Loads every board in a binary board file as an (N, board_length) int8 array of sector codes.
+    """
+    with open(filename, "rb") as f:
+        magic, version, file_board_length, _ = HEADER.unpack(f.read(HEADER.size))
+    if version != VERSION:
+        raise ValueError("Unsupported board file version: " + str(version))
+    if file_board_length != board_length:
+        raise ValueError(filename + " has boards of " + str(file_board_length) + " sectors, not " + str(board_length))
+
+    size = record_size(board_length)
+    records = np.fromfile(filename, dtype=np.uint8, offset=HEADER.size)
+    num_boards = complete_boards(HEADER.size + len(records), board_length)
+    records = records[:num_boards * size].reshape(num_boards, size)
+
+    # Records are little-endian, so the bits of each sector are in order from the lowest bit
+    bits = np.unpackbits(records, axis=1, bitorder="little")[:, :board_length * SECTOR_BITS]
+    bits = bits.reshape(num_boards, board_length, SECTOR_BITS).astype(np.int8)
+    codes = np.zeros((num_boards, board_length), dtype=np.int8)
+    for b in range(SECTOR_BITS):
+        codes |= bits[:, :, b] << b
+    return codes
+
+def _object_masks(boards):
+    """
+    Returns a dictionary mapping each SpaceObject to a (sectors, N) boolean array which is
+    true where a board has that space object. Sectors are the first axis, so that checking
+    every sector of a board combines whole rows at a time.
+
+    boards: An (N, sectors) array of sector codes, as from load_boards
+    """
+    sectors = np.ascontiguousarray(boards.T)
+    return { obj: sectors == _sector_codes[obj] for obj in SpaceObject }
+
+def _adjacent(mask):
+    """
+    Returns a mask of the sectors next to a sector in mask, wrapping around the board.
+    """
+    return np.roll(mask, 1, axis=0) | np.roll(mask, -1, axis=0)
+
+def _smallest_band(mask):
+    """
+    Returns the size of the smallest band containing every sector in mask, for each board.
+    Matches BandRule._smallest_band, including boards with none of the object.
+    """
+    board_length = mask.shape[0]
+    absent = ~mask
+    # Find the longest run between objects, going around the board twice so that runs
+    # which wrap around are counted
+    run = np.zeros(mask.shape[1], dtype=np.int8)
+    longest_run = np.zeros(mask.shape[1], dtype=np.int8)
+    for i in range(2 * board_length):
+        run += 1
+        run *= absent[i % board_length]
+        np.maximum(longest_run, run, out=longest_run)
+    return np.where(mask.any(axis=0), board_length - longest_run, board_length)
+
+def _violations(constraint, masks):
+    """
+    Returns a boolean array which is true for each board that does not satisfy constraint,
+    given the boards' masks from _object_masks.
+    """
+    if isinstance(constraint, SectorsRule):
+        mask = masks[constraint.space_object]
+        disallowed = [i for i in range(mask.shape[0]) if i not in constraint.positions]
+        return np.any(mask[disallowed], axis=0)
+    elif isinstance(constraint, AdjacentSelfRule):
+        mask = masks[constraint.space_object]
+        adjacent = mask & _adjacent(mask)
+        if constraint.qualifier is RuleQualifier.NONE:
+            return np.any(adjacent, axis=0)
+        elif constraint.qualifier is RuleQualifier.AT_LEAST_ONE:
+            return ~np.any(adjacent, axis=0)
+        else:
+            return np.any(mask & ~adjacent, axis=0)
+    elif isinstance(constraint, AdjacentRule):
+        mask1 = masks[constraint.space_object1]
+        adjacent = mask1 & _adjacent(masks[constraint.space_object2])
+        if constraint.qualifier is RuleQualifier.NONE:
+            return np.any(adjacent, axis=0)
+        elif constraint.qualifier is RuleQualifier.AT_LEAST_ONE:
+            return ~np.any(adjacent, axis=0)
+        else:
+            return np.any(mask1 & ~adjacent, axis=0)
+    elif isinstance(constraint, BandRule):
+        smallest_band = _smallest_band(masks[constraint.space_object])
+        if constraint.precision is Precision.STRICT:
+            return smallest_band != constraint.band_size
+        else:
+            return smallest_band > constraint.band_size
+    else:
+        raise ValueError("Cannot validate boards with constraint: " + str(constraint))
+
+def constraint_violations(constraint, boards):
+    """
+    Returns a boolean array which is true for each board that does not satisfy constraint.
+
+    constraint: A SectorsRule (e.g. CometRule), AdjacentSelfRule, AdjacentRule or BandRule
+    boards: An (N, sectors) array of sector codes, as from load_boards
+    """
+    return _violations(constraint, _object_masks(boards))
+
+def _void_duplicates(boards):
+    """
+    Returns a boolean array which is true for each board that is the same as an earlier
+    board, by sorting the boards sector by sector.
+    """
+    rows = np.ascontiguousarray(boards).view(np.dtype((np.void, boards.shape[1]))).ravel()
+    _, first = np.unique(rows, return_index=True)
+    duplicate = np.ones(len(rows), dtype=bool)
+    duplicate[first] = False
+    return duplicate
+
+def duplicate_boards(boards):
+    """
+    Returns the indices of the boards which are the same as an earlier board.
+
+    boards: An (N, sectors) array of sector codes, as from load_boards
+    """
+    num_boards, board_length = boards.shape
+    if num_boards == 0:
+        return np.zeros(0, dtype=np.intp)
+
+    # Pack the sectors of each board into 64 bit keys (-1 is packed the same as a black
+    # hole, but boards with it have the wrong objects anyway)
+    sectors = np.ascontiguousarray(boards.T)
+    keys = []
+    sectors_per_key = 64 // SECTOR_BITS
+    for start in range(0, board_length, sectors_per_key):
+        key = np.zeros(num_boards, dtype=np.uint64)
+        for i in range(start, min(board_length, start + sectors_per_key)):
+            key |= (sectors[i].astype(np.uint64) & np.uint64(SECTOR_MASK)) << np.uint64(SECTOR_BITS * (i - start))
+        keys.append(key)
+
+    # Sorting one 64 bit hash of the keys is much faster than sorting by every key, so
+    # equal boards are found as neighbors with the same hash
+    hashes = keys[0].copy()
+    for key in keys[1:]:
+        hashes = (hashes * np.uint64(0x9E3779B97F4A7C15)) ^ key
+    order = np.argsort(hashes)
+    same_hash = hashes[order][1:] == hashes[order][:-1]
+    same = same_hash.copy()
+    for key in keys:
+        same &= key[order][1:] == key[order][:-1]
+    if np.any(same_hash != same):
+        # Different boards share a hash, so equal boards may not be neighbors
+        return np.flatnonzero(_void_duplicates(boards))
+
+    # Number each run of equal boards, so that the earliest board in each is the original
+    # and any others are duplicates
+    run = np.empty(num_boards, dtype=np.intp)
+    run[order] = np.cumsum(np.concatenate(([0], ~same)))
+    first = np.full(num_boards, num_boards, dtype=np.intp)
+    np.minimum.at(first, run, np.arange(num_boards))
+    return np.flatnonzero(first[run] != np.arange(num_boards))
+
+class ValidationReport:
+    """
+    The result of validating an array of boards against a BoardType.
+    """
+    def __init__(self, num_boards, wrong_objects, violations, duplicates):
+        """
+        Creates a ValidationReport.
+
+        num_boards: The number of boards validated
+        wrong_objects: Indices of the boards without the right number of each space object
+        violations: A list of tuples of each constraint and the indices of the boards
+            which do not satisfy it
+        duplicates: Indices of the boards which are the same as an earlier board
+        """
+        self.num_boards = num_boards
+        self.wrong_objects = wrong_objects
+        self.violations = violations
+        self.duplicates = duplicates
+
+    def is_valid(self):
+        """
+        Returns true if every board is valid and there are no duplicates.
+        """
+        return len(self.wrong_objects) == 0 and len(self.duplicates) == 0 and \
+            all(len(indices) == 0 for constraint, indices in self.violations)
+
+    def __str__(self):
+        lines = [str(self.num_boards) + " boards",
+                 str(len(self.wrong_objects)) + " with the wrong number of space objects"]
+        for constraint, indices in self.violations:
+            lines.append(str(len(indices)) + " violating: " + str(constraint))
+        lines.append(str(len(self.duplicates)) + " duplicates")
+        return "\n".join(lines)
+
+def validate_boards(board_type, boards):
+    """
+    Checks every board in an array against a BoardType: that it has the right number of
+    each space object, and that it satisfies each of the board type's constraints. Also
+    finds duplicate boards. Returns a ValidationReport.
+
+    board_type: The BoardType the boards should be
+    boards: An (N, sectors) array of sector codes, as from load_boards
+    """
+    if boards.shape[1] != board_type.board_length:
+        raise ValueError("Boards have " + str(boards.shape[1]) + " sectors, not " + str(board_type.board_length))
+
+    masks = _object_masks(boards)
+    
+    # Every sector must be assigned, so counting each object also catches unassigned sectors
+    wrong_objects = np.zeros(len(boards), dtype=bool)
+    for obj in SpaceObject:
+        num_object = board_type.num_objects.get(obj, 0)
+        wrong_objects |= np.count_nonzero(masks[obj], axis=0) != num_object
+
+    violations = [(constraint, np.flatnonzero(_violations(constraint, masks)))
+                  for constraint in board_type.constraints]
+
+    return ValidationReport(len(boards), np.flatnonzero(wrong_objects), violations, duplicate_boards(boards))
+
+def validate_board_file(board_type, filename):
+    """
+    Checks every board in a board file against a BoardType. Returns a ValidationReport.
+
+    board_type: The BoardType the boards should be
+    filename: A binary board file, or a text file with one board per line
+    """
+    return validate_boards(board_type, load_boards(filename, board_type.board_length))
@@ -0,0 +1,80 @@
+from planetx_game.board import *
+from planetx_game.board_type import twelve_type
+from planetx_game.rules import *
+
+from .assertion_utils import *
+
+# CompactBoard
+# Testing strategy:
+#     - partition: sectors unassigned, sectors assigned
+#     - partition: index in range, index wraps around (negative, >= size)
+#     - partition: copy modified, original modified
+#     - partition: num_objects: counted, cached, after a sector is set
+
+# sectors unassigned
+def test_compact_board_empty():
+    board = CompactBoard(5)
+    assert len(board) == 5
+    assert list(board) == [None] * 5
+    assert str(board) == "-----"
+
+# sectors assigned, index in range
+def test_compact_board_set_get():
+    board = CompactBoard(4)
+    board[1] = SpaceObject.Comet
+    board[3] = SpaceObject.BlackHole
+    assert list(board) == [None, SpaceObject.Comet, None, SpaceObject.BlackHole]
+    board[1] = None
+    assert list(board) == [None, None, None, SpaceObject.BlackHole]
+
+# index wraps around
+def test_compact_board_wraparound():
+    board = CompactBoard.parse("EA-G")
+    assert board[-1] is SpaceObject.GasCloud
+    assert board[5] is SpaceObject.Asteroid
+    board[-2] = SpaceObject.PlanetX
+    assert str(board) == "EAXG"
+
+# copy modified
+def test_compact_board_copy():
+    board = CompactBoard.parse("EA--")
+    board_copy = board.copy()
+    board_copy[2] = SpaceObject.DwarfPlanet
+    assert str(board) == "EA--"
+    assert str(board_copy) == "EAD-"
+    assert board != board_copy
+
+# sectors assigned, round trip through Board
+def test_compact_board_round_trip():
+    board = Board.parse("XEGDAACC-B")
+    compact = CompactBoard.from_board(board)
+    assert compact.to_board() == board
+    assert str(compact) == str(board)
+    assert compact.num_objects() == board.num_objects()
+    assert compact == CompactBoard.parse(str(board))
+    assert hash(compact) == hash(CompactBoard.parse(str(board)))
+
+# num_objects: counted, cached, after a sector is set
+def test_compact_board_num_objects():
+    board = CompactBoard.parse("AE-AA")
+    assert board.num_objects() == {SpaceObject.Asteroid: 3, SpaceObject.Empty: 1, None: 1}
+    assert board.num_objects() is board.num_objects()
+    board_copy = board.copy()
+    board[2] = SpaceObject.Comet
+    assert board.num_objects() == {SpaceObject.Asteroid: 3, SpaceObject.Empty: 1, SpaceObject.Comet: 1}
+    assert board_copy.num_objects()[None] == 1
+
+# mask
+def test_compact_board_mask():
+    board = CompactBoard.parse("AE-AA")
+    assert board.mask(SpaceObject.Asteroid) == 0b11001
+    assert board.mask(None) == 0b00100
+    assert board.mask(SpaceObject.Comet) == 0
+
+# fill_board runs natively on CompactBoard
+def test_compact_board_fill_board():
+    for constraint in twelve_type.constraints:
+        boards = list(constraint.fill_board(Board([None] * 12), twelve_type.num_objects))
+        compact_boards = list(constraint.fill_board(CompactBoard(12), twelve_type.num_objects))
+        assert all(isinstance(board, CompactBoard) for board in compact_boards)
+        assert sorted(str(board) for board in compact_boards) == sorted(str(board) for board in boards)
@@ -0,0 +1,97 @@
+from planetx_game.board_file import *
+from planetx_game.board_type import twelve_type
+
+import os
+import pytest
+
+# BoardFileWriter / BoardFileReader
+# Testing strategy:
+#     - partition: number of boards: 0, 1, > 1
+#     - partition: index: positive, negative, slice, out of range
+#     - partition: board_class: Board, CompactBoard
+#     - partition: file: closed, not closed, ends in a partial board
+
+boards = [Board.parse("XEEGGDAAAACC"), Board.parse("CCAAAADGGEEX"), Board.parse("EXEGAGADACAC")]
+
+def _write(filename, boards, board_length=12):
+    with BoardFileWriter(filename, board_length) as writer:
+        for board in boards:
+            writer.write(board)
+
+# number of boards: 0
+def test_board_file_empty(tmp_path):
+    filename = str(tmp_path / "boards.bin")
+    _write(filename, [])
+    assert is_board_file(filename)
+    with BoardFileReader(filename) as reader:
+        assert len(reader) == 0
+        assert list(reader) == []
+
+# number of boards: 1, index: positive
+def test_board_file_single(tmp_path):
+    filename = str(tmp_path / "boards.bin")
+    _write(filename, boards[:1])
+    with BoardFileReader(filename) as reader:
+        assert len(reader) == 1
+        assert reader[0] == boards[0]
+
+# number of boards > 1, index: negative, slice, out of range
+def test_board_file_indexing(tmp_path):
+    filename = str(tmp_path / "boards.bin")
+    _write(filename, boards)
+    with BoardFileReader(filename) as reader:
+        assert list(reader) == boards
+        assert reader[-1] == boards[-1]
+        assert reader[1:] == boards[1:]
+        with pytest.raises(IndexError):
+            reader[3]
+
+# file: not closed, ends in a partial board
+def test_board_file_not_closed(tmp_path):
+    filename = str(tmp_path / "boards.bin")
+    writer = BoardFileWriter(filename, 12)
+    try:
+        writer.write(boards[0])
+        writer.write(boards[1])
+        writer.flush()
+        with open(filename, "rb") as f:
+            assert HEADER.unpack(f.read(HEADER.size))[3] == 2
+
+        # As if the run crashed before the next flush, partway through writing a board
+        writer.write(boards[2])
+        writer.file.write(b"\x01")
+        writer.file.flush()
+        with BoardFileReader(filename) as reader:
+            assert list(reader) == boards
+    finally:
+        writer.file.close()
+
+# board_class: CompactBoard, boards written from strings
+def test_board_file_compact(tmp_path):
+    filename = str(tmp_path / "boards.bin")
+    _write(filename, [str(board) for board in boards])
+    with BoardFileReader(filename, CompactBoard) as reader:
+        assert [board.to_board() for board in reader] == boards
+
+# size: records are 3 bits per sector
+def test_board_file_size(tmp_path):
+    filename = str(tmp_path / "boards.bin")
+    _write(filename, boards)
+    assert os.path.getsize(filename) == HEADER.size + 3 * record_size(12)
+    assert record_size(24) == 9
+
+# text files are not board files
+def test_is_board_file_text(tmp_path):
+    filename = str(tmp_path / "boards.txt")
+    with open(filename, "w") as f:
+        f.write(str(boards[0]) + "\n")
+    assert not is_board_file(filename)
+
+# generate_boards_to_file with binary output
+def test_generate_boards_to_file_binary(tmp_path):
+    twelve_type.generate_boards_to_file(str(tmp_path / "boards.txt"))
+    twelve_type.generate_boards_to_file(str(tmp_path / "boards.bin"), binary=True)
+    with open(tmp_path / "boards.txt") as f:
+        text_boards = [line.rstrip("\n") for line in f]
+    with BoardFileReader(str(tmp_path / "boards.bin")) as reader:
+        assert [str(board) for board in reader] == text_boards
@@ -0,0 +1,311 @@
+from planetx_game.board_type import *
+
+import os
+import sys
+import json
+import subprocess
+import random
+import pytest
+
+# generate_boards_to_file
+# Testing strategy:
+#     - partition: workers: none, > 1
+#     - partition: split_stage: 0, > 0
+#     - partition: workers with parallel, with chunk_size
+#     - partition: called from: library, generate_boards.py
+
+def _read_boards(filename):
+    with open(filename) as f:
+        return sorted(line.rstrip("\r\n") for line in f)
+
+# workers > 1, split_stage > 0
+def test_generate_boards_to_file_workers(tmp_path):
+    twelve_type.generate_boards_to_file(str(tmp_path / "serial.txt"))
+    twelve_type.generate_boards_to_file(str(tmp_path / "workers.txt"), workers=2, split_stage=2)
+    assert _read_boards(tmp_path / "serial.txt") == _read_boards(tmp_path / "workers.txt")
+
+# workers > 1, split_stage = 0
+def test_generate_boards_to_file_workers_no_split(tmp_path):
+    twelve_type.generate_boards_to_file(str(tmp_path / "serial.txt"))
+    twelve_type.generate_boards_to_file(str(tmp_path / "workers.txt"), workers=2, split_stage=0)
+    assert _read_boards(tmp_path / "serial.txt") == _read_boards(tmp_path / "workers.txt")
+
+# workers > 1, called from generate_boards.py with its default arguments
+def test_generate_boards_script_workers(tmp_path):
+    twelve_type.generate_boards_to_file(str(tmp_path / "serial.txt"))
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "generate_boards.py")
+    result = subprocess.run([sys.executable, script, "12", "-w", "2", "-o", str(tmp_path / "workers.txt")],
+                            cwd=os.path.dirname(script), capture_output=True, text=True)
+    assert "Cannot" not in result.stdout
+    assert _read_boards(tmp_path / "serial.txt") == _read_boards(tmp_path / "workers.txt")
+
+# workers with parallel, with chunk_size
+def test_generate_boards_to_file_workers_split(tmp_path):
+    with pytest.raises(ValueError):
+        twelve_type.generate_boards_to_file(str(tmp_path / "workers.txt"), workers=2, parallel=(0, 2))
+    with pytest.raises(ValueError):
+        twelve_type.generate_boards_to_file(str(tmp_path / "workers.txt"), workers=2, chunk_size=1000)
+
+# count_boards
+# Testing strategy:
+#     - partition: band rule: none, strict, within
+#     - partition: constraints supported, constraints not supported
+#     - partition: generated boards: all distinct, some repeated
+
+small_numbers = {
+    SpaceObject.Comet: 1,
+    SpaceObject.Asteroid: 2,
+    SpaceObject.DwarfPlanet: 2,
+    SpaceObject.PlanetX: 1,
+    SpaceObject.GasCloud: 1,
+    SpaceObject.Empty: 1
+}
+
+def _small_type(band_rule):
+    constraints = [CometRule(8), AdjacentSelfRule(SpaceObject.Asteroid, RuleQualifier.EVERY),
+                   AdjacentRule(SpaceObject.PlanetX, SpaceObject.DwarfPlanet, RuleQualifier.NONE),
+                   AdjacentRule(SpaceObject.GasCloud, SpaceObject.Empty, RuleQualifier.EVERY)]
+    if band_rule is not None:
+        constraints.append(band_rule)
+    return BoardType(constraints, small_numbers, 1, 1, 3, [])
+
+def _brute_force_boards(board_type):
+    boards = [Board(perm) for perm in permutations_multi(board_type.num_objects.copy())]
+    return [board for board in boards if board.check_constraints(board_type.constraints)]
+
+# band rule: none
+def test_count_boards_no_band():
+    board_type = _small_type(None)
+    assert board_type.count_boards() == len(_brute_force_boards(board_type))
+
+# band rule: strict
+def test_count_boards_strict_band():
+    board_type = _small_type(BandRule(SpaceObject.DwarfPlanet, 3, Precision.STRICT))
+    assert board_type.count_boards() == len(_brute_force_boards(board_type))
+    
+# band rule: within
+def test_count_boards_within_band():
+    board_type = _small_type(BandRule(SpaceObject.DwarfPlanet, 4, Precision.WITHIN))
+    assert board_type.count_boards() == len(_brute_force_boards(board_type))
+
+# standard board type, matches enumeration
+def test_count_boards_twelve():
+    boards = twelve_type.generate_all_boards()
+    assert twelve_type.count_boards() == len({str(board) for board in boards})
+
+# generated boards: some repeated
+def test_count_boards_repeated():
+    # A gas cloud between two empty sectors is generated once for each of them
+    numbers = dict(small_numbers)
+    numbers[SpaceObject.Empty] = 2
+    board_type = BoardType([CometRule(9), AdjacentSelfRule(SpaceObject.Asteroid, RuleQualifier.EVERY),
+                            AdjacentRule(SpaceObject.GasCloud, SpaceObject.Empty, RuleQualifier.EVERY)],
+                           numbers, 1, 1, 3, [])
+    boards = board_type.generate_all_boards()
+    assert len(boards) > len({str(board) for board in boards})
+    assert board_type.count_boards() == len({str(board) for board in boards}) == len(_brute_force_boards(board_type))
+
+# constraints not supported
+def test_count_boards_unsupported():
+    board_type = _small_type(OppositeRule(SpaceObject.PlanetX, SpaceObject.GasCloud, RuleQualifier.NONE))
+    with pytest.raises(ValueError):
+        board_type.count_boards()
+
+# generate_random_board
+# Testing strategy:
+#     - partition: constraints supported, constraints not supported
+#     - partition: band rule: none, strict
+
+# constraints supported, band rule: strict
+def test_generate_random_board_uniform():
+    board_type = _small_type(BandRule(SpaceObject.DwarfPlanet, 3, Precision.STRICT))
+    rng = random.Random(0)
+    boards = {str(board) for board in _brute_force_boards(board_type)}
+    samples = {}
+    for i in range(len(boards) * 50):
+        board = str(board_type.generate_random_board(rng))
+        samples[board] = samples.get(board, 0) + 1
+    assert set(samples) == boards
+    # Each board should be drawn about 50 times
+    assert all(20 <= n <= 90 for n in samples.values())
+
+# constraints supported, band rule: none
+def test_generate_random_board_twelve():
+    rng = random.Random(0)
+    for i in range(100):
+        board = twelve_type.generate_random_board(rng)
+        assert board.check_constraints(twelve_type.constraints)
+        assert board.num_objects() == twelve_type.num_objects
+
+# constraints not supported
+def test_generate_random_board_unsupported():
+    board_type = _small_type(OppositeRule(SpaceObject.PlanetX, SpaceObject.GasCloud, RuleQualifier.NONE))
+    board = board_type.generate_random_board(random.Random(0))
+    assert board.check_constraints(board_type.constraints)
+
+# rank / unrank
+# Testing strategy:
+#     - partition: band rule: none, strict, within
+#     - partition: board: valid, breaks a constraint, wrong objects
+#     - partition: rank: in range, out of range
+
+@pytest.mark.parametrize("band_rule", [None, BandRule(SpaceObject.DwarfPlanet, 3, Precision.STRICT),
+                                       BandRule(SpaceObject.DwarfPlanet, 4, Precision.WITHIN)], ids=str)
+def test_rank_unrank_bijection(band_rule):
+    board_type = _small_type(band_rule)
+    boards = _brute_force_boards(board_type)
+    ranks = sorted(board_type.rank(board) for board in boards)
+    assert ranks == list(range(board_type.count_boards()))
+    for board in boards:
+        assert board_type.unrank(board_type.rank(board)) == board
+        
+# band rule: none, board: valid
+def test_rank_unrank_twelve():
+    rng = random.Random(0)
+    for i in range(50):
+        r = rng.randrange(twelve_type.count_boards())
+        board = twelve_type.unrank(r)
+        assert board.check_constraints(twelve_type.constraints)
+        assert twelve_type.rank(board) == r
+        assert twelve_type.rank(CompactBoard.from_board(board)) == r
+        
+# board: breaks a constraint, wrong objects
+def test_rank_invalid():
+    with pytest.raises(ValueError):
+        twelve_type.rank(Board.parse("AAAACCXEEGGD"))
+    with pytest.raises(ValueError):
+        twelve_type.rank(Board.parse("AAAACCXEEGGG"))
+    with pytest.raises(ValueError):
+        twelve_type.rank(Board.parse("AAAACCXEEGG"))
+        
+# rank: out of range
+def test_unrank_out_of_range():
+    with pytest.raises(IndexError):
+        twelve_type.unrank(twelve_type.count_boards())
+    with pytest.raises(IndexError):
+        twelve_type.unrank(-1)
+
+# generate_boards_to_file with work_dir
+# Testing strategy:
+#     - partition: resume: from no manifest, after an interrupted stage
+#     - partition: output: text, binary
+
+class _Interrupt(Exception):
+    pass
+
+def _interrupt_after(monkeypatch, calls):
+    finish_board = BoardType._finish_board
+    count = [0]
+    def interrupted_finish_board(self, board):
+        count[0] += 1
+        if count[0] > calls:
+            raise _Interrupt()
+        return finish_board(self, board)
+    monkeypatch.setattr(BoardType, "_finish_board", interrupted_finish_board)
+
+# resume after an interrupted stage, output: text
+def test_generate_boards_to_file_resume(tmp_path, monkeypatch):
+    twelve_type.generate_boards_to_file(str(tmp_path / "expected.txt"))
+    
+    work_dir = str(tmp_path / "work")
+    with monkeypatch.context() as m:
+        _interrupt_after(m, 25)
+        with pytest.raises(_Interrupt):
+            twelve_type.generate_boards_to_file(str(tmp_path / "boards.txt"), work_dir=work_dir, checkpoint_interval=10)
+            
+    with open(os.path.join(work_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert len(manifest["stage_counts"]) == len(twelve_type.constraints)
+    assert manifest["checkpoint"]["input_boards"] == 20
+    
+    twelve_type.generate_boards_to_file(str(tmp_path / "boards.txt"), work_dir=work_dir, resume=True)
+    with open(tmp_path / "expected.txt") as f, open(tmp_path / "boards.txt") as g:
+        assert f.read() == g.read()
+
+# resume after an interrupted stage, output: binary
+def test_generate_boards_to_file_resume_binary(tmp_path, monkeypatch):
+    twelve_type.generate_boards_to_file(str(tmp_path / "expected.bin"), binary=True)
+    
+    work_dir = str(tmp_path / "work")
+    with monkeypatch.context() as m:
+        _interrupt_after(m, 25)
+        with pytest.raises(_Interrupt):
+            twelve_type.generate_boards_to_file(str(tmp_path / "boards.bin"), work_dir=work_dir, 
+                                                checkpoint_interval=10, binary=True)
+            
+    twelve_type.generate_boards_to_file(str(tmp_path / "boards.bin"), work_dir=work_dir, resume=True, binary=True)
+    with open(tmp_path / "expected.bin", "rb") as f, open(tmp_path / "boards.bin", "rb") as g:
+        assert f.read() == g.read()
+
+# resume from no manifest
+def test_generate_boards_to_file_resume_fresh(tmp_path):
+    twelve_type.generate_boards_to_file(str(tmp_path / "expected.txt"))
+    work_dir = str(tmp_path / "work")
+    twelve_type.generate_boards_to_file(str(tmp_path / "boards.txt"), work_dir=work_dir, resume=True)
+    with open(tmp_path / "expected.txt") as f, open(tmp_path / "boards.txt") as g:
+        assert f.read() == g.read()
+    with open(os.path.join(work_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert manifest["stage_counts"][-1] == twelve_type.count_boards()
+
+# generate_boards_to_file with mode
+# Testing strategy:
+#     - partition: mode: stream, unknown
+#     - partition: parallel: none, > 1 core
+
+# mode: stream, parallel: none
+def test_generate_boards_to_file_stream(tmp_path):
+    twelve_type.generate_boards_to_file(str(tmp_path / "spill.txt"))
+    twelve_type.generate_boards_to_file(str(tmp_path / "stream.txt"), mode="stream")
+    assert _read_boards(tmp_path / "spill.txt") == _read_boards(tmp_path / "stream.txt")
+    
+# mode: stream, parallel: > 1 core
+def test_generate_boards_to_file_stream_parallel(tmp_path):
+    twelve_type.generate_boards_to_file(str(tmp_path / "spill.txt"))
+    twelve_type.generate_boards_to_file(str(tmp_path / "stream0.txt"), mode="stream", parallel=(0, 2))
+    twelve_type.generate_boards_to_file(str(tmp_path / "stream1.txt"), mode="stream", parallel=(1, 2))
+    assert _read_boards(tmp_path / "spill.txt") == \
+        sorted(_read_boards(tmp_path / "stream0.txt") + _read_boards(tmp_path / "stream1.txt"))
+    
+# mode: unknown
+def test_generate_boards_to_file_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        twelve_type.generate_boards_to_file(str(tmp_path / "boards.txt"), mode="unknown")
+
+# plan_constraint_order
+# Testing strategy:
+#     - partition: board type: small, standard
+#     - partition: budget: spent, not spent
+#     - partition: generation: all boards in memory, to file
+
+# board type: small
+def test_plan_constraint_order_small():
+    board_type = _small_type(BandRule(SpaceObject.DwarfPlanet, 3, Precision.STRICT))
+    constraints, estimates = board_type.plan_constraint_order()
+    assert sorted(str(c) for c in constraints) == sorted(str(c) for c in board_type.constraints)
+    assert len(estimates) == len(constraints) + 1
+
+# board type: standard, budget: not spent
+@pytest.mark.parametrize("board_type", [twelve_type, eighteen_type])
+def test_plan_constraint_order_estimates(board_type):
+    constraints, estimates = board_type.plan_constraint_order()
+    count = board_type.count_boards()
+    assert abs(estimates[-1] - count) < count / 4
+
+# board type: standard, budget: spent
+def test_plan_constraint_order_budget():
+    constraints, estimates = eighteen_type.plan_constraint_order(budget=0)
+    assert sorted(str(c) for c in constraints) == sorted(str(c) for c in eighteen_type.constraints)
+    assert len(estimates) == len(constraints) + 1 and estimates[-1] > 0
+    
+# board type: standard, generation: to file
+def test_generate_boards_to_file_optimize_order(tmp_path):
+    twelve_type.generate_boards_to_file(str(tmp_path / "static.txt"))
+    twelve_type.generate_boards_to_file(str(tmp_path / "planned.txt"), optimize_order=True)
+    assert _read_boards(tmp_path / "static.txt") == _read_boards(tmp_path / "planned.txt")
+    
+# board type: small, generation: all boards in memory
+def test_generate_all_boards_optimize_order():
+    board_type = _small_type(None)
+    boards = board_type.generate_all_boards(optimize_order=True)
+    assert sorted(str(board) for board in boards) == sorted(str(board) for board in _brute_force_boards(board_type))
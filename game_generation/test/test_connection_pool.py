@@ -0,0 +1,179 @@
+from planetx_game.connection_pool import ConnectionPool, AsyncConnectionPool
+
+import asyncio
+import threading
+import pytest
+
+# ConnectionPool
+# Testing strategy:
+#     - partition: size: None, limited
+#     - partition: checkout: free connection, waits for a connection, times out
+#     - partition: body of the checkout: succeeds, raises
+#     - partition: connect: succeeds, raises
+
+class FakeConnection:
+    """
+    Records what is done with a connection
+    """
+    def __init__(self):
+        self.closed = False
+        self.rolled_back = False
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+# size: None, checkout: free connection, body: succeeds
+def test_checkout_unlimited():
+    connections = []
+    pool = ConnectionPool(lambda: connections.append(FakeConnection()) or connections[-1])
+    with pool.checkout() as cxn1:
+        with pool.checkout() as cxn2:
+            assert cxn1 is not cxn2
+            assert pool.stats()["in_use"] == 2
+    assert all(cxn.closed and not cxn.rolled_back for cxn in connections)
+    stats = pool.stats()
+    assert (stats["in_use"], stats["max_in_use"], stats["checkouts"], stats["size"]) == (0, 2, 2, None)
+
+# size: limited, body: raises
+def test_checkout_rolls_back_and_releases():
+    pool = ConnectionPool(FakeConnection, size=1, timeout=0.1)
+    with pytest.raises(ValueError):
+        with pool.checkout() as cxn:
+            raise ValueError("failed")
+    assert cxn.rolled_back and cxn.closed
+    # The connection was released, so the next checkout does not time out
+    with pool.checkout() as cxn:
+        pass
+    assert pool.stats()["in_use"] == 0
+
+# size: limited, checkout: times out
+def test_checkout_timeout():
+    pool = ConnectionPool(FakeConnection, size=1, timeout=0.05)
+    with pool.checkout():
+        with pytest.raises(TimeoutError):
+            with pool.checkout():
+                pass
+    stats = pool.stats()
+    assert (stats["timeouts"], stats["checkouts"], stats["in_use"]) == (1, 1, 0)
+
+# size: limited, checkout: waits for a connection
+def test_checkout_waits():
+    pool = ConnectionPool(FakeConnection, size=1, timeout=5)
+    checked_out = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.checkout():
+            checked_out.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    checked_out.wait()
+    threading.Timer(0.05, release.set).start()
+    with pool.checkout():
+        assert pool.stats()["in_use"] == 1
+    thread.join()
+    stats = pool.stats()
+    assert stats["checkouts"] == 2 and stats["max_in_use"] == 1 and stats["max_wait"] > 0
+
+# connect: raises
+def test_checkout_connect_fails():
+    def connect():
+        raise ConnectionError("no database")
+    pool = ConnectionPool(connect, size=1, timeout=0.05)
+    for i in range(2):
+        with pytest.raises(ConnectionError):
+            with pool.checkout():
+                pass
+    assert pool.stats()["in_use"] == 0
+
+# AsyncConnectionPool
+# Testing strategy:
+#     - partition: checkout: idle connection, new connection, waits for a connection, times out
+#     - partition: body of the checkout: succeeds, raises
+#     - partition: rollback: succeeds, raises
+#     - partition: pool: open, closed
+
+class FakeAsyncConnection:
+    """
+    Records what is done with an async connection
+    """
+    def __init__(self, fail_rollback=False):
+        self.fail_rollback = fail_rollback
+        self.rollbacks = 0
+        self.closed = False
+        self.discarded = False
+
+    async def rollback(self):
+        self.rollbacks += 1
+        if self.fail_rollback:
+            raise ConnectionError("connection lost")
+
+    async def close(self):
+        self.closed = True
+
+    def discard(self):
+        self.discarded = True
+
+def _async_pool(size=None, timeout=None, **kwargs):
+    connections = []
+    async def connect():
+        connections.append(FakeAsyncConnection(**kwargs))
+        return connections[-1]
+    return AsyncConnectionPool(connect, size, timeout), connections
+
+# checkout: new connection, idle connection, body: succeeds, raises, pool: closed
+def test_async_checkout_reuses_connections():
+    async def run():
+        pool, connections = _async_pool(size=2)
+        async with pool.checkout() as cxn1:
+            async with pool.checkout() as cxn2:
+                assert cxn1 is not cxn2
+        async with pool.checkout() as cxn3:
+            assert cxn3 in (cxn1, cxn2)
+        with pytest.raises(ValueError):
+            async with pool.checkout():
+                raise ValueError("failed")
+        stats = pool.stats()
+        assert (stats["opened"], stats["idle"], stats["checkouts"], stats["in_use"]) == (2, 2, 4, 0)
+        # Every return rolls back what was not committed
+        assert sum(cxn.rollbacks for cxn in connections) == 4
+
+        await pool.close()
+        assert all(cxn.closed for cxn in connections)
+        with pytest.raises(ValueError):
+            async with pool.checkout():
+                pass
+    asyncio.run(run())
+
+# checkout: waits for a connection, times out
+def test_async_checkout_waits_and_times_out():
+    async def hold(pool, seconds):
+        async with pool.checkout():
+            await asyncio.sleep(seconds)
+
+    async def run():
+        pool, connections = _async_pool(size=1, timeout=1)
+        await asyncio.gather(hold(pool, 0.05), hold(pool, 0.05), hold(pool, 0))
+        stats = pool.stats()
+        assert (stats["opened"], stats["max_in_use"], stats["checkouts"]) == (1, 1, 3) and stats["max_wait"] > 0
+
+        pool.timeout = 0.01
+        with pytest.raises(TimeoutError):
+            await asyncio.gather(hold(pool, 0.1), hold(pool, 0))
+        await asyncio.sleep(0.1)
+        assert pool.stats()["timeouts"] == 1 and pool.stats()["in_use"] == 0
+    asyncio.run(run())
+
+# rollback: raises
+def test_async_checkout_rollback_fails():
+    async def run():
+        pool, connections = _async_pool(fail_rollback=True)
+        async with pool.checkout():
+            pass
+        assert connections[0].discarded and pool.stats()["idle"] == 0
+    asyncio.run(run())
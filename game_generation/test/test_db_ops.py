@@ -0,0 +1,235 @@
+import planetx_game.db_ops as db_ops
+from planetx_game.db_backends import SQLiteBackend
+from planetx_game.game import Game
+from planetx_game.board_type import twelve_type
+from planetx_game.session import *
+
+from datetime import datetime
+import pytest
+
+# db_ops with the SQLite backend
+# Testing strategy:
+#     - partition: games: added one at a time, by string, multi-row, loaded from a file
+#     - partition: lookup: by id, by code, random pick, missing
+#     - partition: sessions and players: new players, moving within and around the board,
+#       theories, actions and turns
+#     - partition: commit_turn: every change, no changes, a failing change
+#     - partition: turns and theories since: nothing new, new rows, theories still advancing
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "planetx.db"))
+    db_ops.set_backend(backend)
+    yield backend
+    db_ops.set_backend(None)
+
+@pytest.fixture(scope="module")
+def game_strs():
+    # Generating a game makes random choices, so keep trying boards until some games are made
+    games = []
+    i = 0
+    while len(games) < 4:
+        game = Game.generate_from_board(twelve_type.unrank(i * 131), twelve_type)
+        if game is not None:
+            games.append(game.code())
+        i += 1
+    return games
+
+def _game_rows(backend):
+    cursor = backend.connect().cursor()
+    cursor.execute("SELECT game_code, board_size FROM games ORDER BY id")
+    return cursor.fetchall()
+
+# games: added one at a time, by string, lookup: by id, by code, missing
+def test_add_and_get_games(backend, game_strs):
+    db_ops.add_game(Game.parse(game_strs[0]), "A2A2")
+    db_ops.add_games_by_str(game_strs[1:], ["B2B2", "C2C2", "D2D2"])
+    assert _game_rows(backend) == [("A2A2", 12), ("B2B2", 12), ("C2C2", 12), ("D2D2", 12)]
+
+    gid, game = db_ops.get_game("C2C2")
+    assert game.code() == game_strs[2]
+    game_code, same_game = db_ops.get_game_by_id(gid)
+    assert game_code == "C2C2" and same_game is game
+    assert db_ops.get_game("Z9Z9") is None
+    assert db_ops.get_game_by_id(1000) is None
+    # Connections are returned even by lookups which find nothing
+    assert db_ops.connection_pool().stats()["in_use"] == 0
+    assert sorted(db_ops.get_existing_game_codes(["A2A2", "Z9Z9", "D2D2"])) == ["A2A2", "D2D2"]
+
+    db_ops.clear_games()
+    assert _game_rows(backend) == []
+    # Ids restart after the games are cleared
+    db_ops.add_game(Game.parse(game_strs[0]), "A2A2")
+    assert db_ops.get_game("A2A2")[0] == 1
+
+# games: multi-row, loaded from a file, lookup: random pick
+def test_bulk_add_games(backend, game_strs, tmp_path):
+    assert db_ops.pick_game(12) is None
+    chunks = [(game_strs[:3], ["A2A2", "B2B2", "C2C2"]), (game_strs[3:], ["D2D2"])]
+    assert db_ops.bulk_add_games_by_str(chunks, rows_per_insert=2) == 4
+    assert db_ops.load_games_by_str([(game_strs[:2], ["E2E2", "F2F2"])], str(tmp_path / "games.tsv")) == 2
+    assert [row[0] for row in _game_rows(backend)] == ["A2A2", "B2B2", "C2C2", "D2D2", "E2E2", "F2F2"]
+
+    picked = {db_ops.pick_game(12)[1] for i in range(100)}
+    assert picked <= {"A2A2", "B2B2", "C2C2", "D2D2", "E2E2", "F2F2"} and len(picked) > 1
+    dealt = [db_ops.pick_game(12, no_repeats=True)[1] for i in range(6)]
+    assert sorted(dealt) == ["A2A2", "B2B2", "C2C2", "D2D2", "E2E2", "F2F2"]
+    assert db_ops.pick_game(18) is None
+
+# sessions and players
+def test_sessions_and_players(backend, game_strs):
+    db_ops.add_games_by_str(game_strs[:1], ["A2A2"])
+    gid, game = db_ops.get_game("A2A2")
+    session_id = db_ops.create_session("S2S2", 12, gid)
+    assert db_ops.get_session_codes() == ["S2S2"]
+    assert db_ops.get_session_by_code("S2S2") == db_ops.get_session_by_id(session_id)
+
+    assert db_ops.new_player("S2S2", "Ada", True) == (session_id, 1, 1)
+    assert db_ops.new_player("S2S2", "Grace", False) == (session_id, 2, 2)
+    players = db_ops.get_players_for_session(session_id)
+    assert [(p.num, p.name, p.sector, p.arrival) for p in players] == [(1, "Ada", 0, 1), (2, "Grace", 0, 2)]
+
+    # Players arrive after everyone already in a sector, and wrap around the board
+    db_ops.advance_player(2, 3)
+    db_ops.advance_player(1, 3)
+    db_ops.advance_player(2, 10)
+    session_code_id, players = db_ops.get_players_for_session_code("S2S2")
+    assert session_code_id == session_id
+    assert [(p.sector, p.arrival) for p in players] == [(3, 2), (1, 1)]
+
+    db_ops.create_theory(session_id, 1, "A", 5)
+    db_ops.advance_theories(session_id)
+    theories = db_ops.get_theories_for_session(session_id)
+    assert [(t.space_object, t.sector, t.player_id, t.progress) for t in theories] == [(SpaceObject.Asteroid, 5, 1, 1)]
+    assert db_ops.get_theories_for_player_session(2)[0] == session_id
+
+    # The creator's START_GAME action is pending until it is resolved with a turn
+    action = db_ops.get_current_action(1)
+    assert action.action_type is ActionType.START_GAME
+    db_ops.resolve_action(action.action_id, None)
+    assert db_ops.get_current_action(1) is None
+    db_ops.create_action(ActionType.PLAYER_TURN, 2)
+    action = db_ops.get_current_action(2)
+    assert [a.player_id for a in db_ops.get_current_actions_for_session(session_id)] == [2]
+    turn_time = datetime(2021, 3, 4, 5, 6, 7)
+    db_ops.resolve_action(action.action_id, Turn(TurnType.SURVEY, "E", (1, 4), 2, turn_time))
+    turns = db_ops.get_previous_turns(session_id)
+    assert len(turns) == 1 and turns[0].turn_time == turn_time and turns[0].code() == "SE1,4"
+
+    db_ops.set_current_status(session_id, Action(ActionType.PLAYER_TURN, 2), 4, False)
+    assert db_ops.get_session_by_id(session_id) == (session_id, "S2S2", 12, gid, False, 4, "PLAYER_TURN", 2)
+
+# sessions and players: snapshot
+def test_session_snapshot(backend, game_strs):
+    assert db_ops.get_session_snapshot("S2S2") is None
+    db_ops.add_games_by_str(game_strs[:1], ["A2A2"])
+    gid, game = db_ops.get_game("A2A2")
+    session_id = db_ops.create_session("S2S2", 12, gid)
+    db_ops.create_session("T2T2", 12, gid)
+    db_ops.new_player("S2S2", "Ada", True)
+    db_ops.new_player("S2S2", "Grace", False)
+    db_ops.new_player("T2T2", "Alan", True)
+    db_ops.advance_player(2, 3)
+    db_ops.create_theory(session_id, 1, "A", 5)
+    db_ops.create_theory(session_id, 2, "C", 7)
+    db_ops.advance_theories(session_id)
+    db_ops.create_action(ActionType.PLAYER_TURN, 2)
+    turn_time = datetime(2021, 3, 4, 5, 6, 7)
+    db_ops.resolve_action(db_ops.get_current_action(2).action_id, Turn(TurnType.SURVEY, "E", (1, 4), 2, turn_time))
+    db_ops.create_action(ActionType.PLAYER_TURN, 1)
+    db_ops.set_current_status(session_id, Action(ActionType.PLAYER_TURN, 1), 4, False)
+
+    snapshot = db_ops.get_session_snapshot("S2S2")
+    assert (snapshot.session_id, snapshot.session_code, snapshot.game_size, snapshot.game_id, snapshot.first_rotation,
+            snapshot.current_sector, snapshot.action_type.name, snapshot.action_player) == db_ops.get_session_by_code("S2S2")
+    assert snapshot.action_type is ActionType.PLAYER_TURN
+    assert [(p.player_id, p.num, p.name, p.sector, p.arrival) for p in snapshot.players] == \
+        [(p.player_id, p.num, p.name, p.sector, p.arrival) for p in db_ops.get_players_for_session(session_id)]
+    assert [(t.space_object, t.sector, t.player_id, t.progress) for t in snapshot.theories] == \
+        [(SpaceObject.Asteroid, 5, 1, 1), (SpaceObject.Comet, 7, 2, 1)]
+    assert [(a.action_type, a.player_id, a.action_id) for a in snapshot.actions] == \
+        [(a.action_type, a.player_id, a.action_id) for a in db_ops.get_current_actions_for_session(session_id)]
+    assert [(t.player_id, t.turn_time, t.code()) for t in snapshot.turns] == [(2, turn_time, "SE1,4")]
+
+    # A new session has no current action, turns or theories
+    snapshot = db_ops.get_session_snapshot("T2T2")
+    assert snapshot.action_type is None and snapshot.action_player is None
+    assert [p.name for p in snapshot.players] == ["Alan"]
+    assert snapshot.theories == [] and snapshot.turns == []
+    assert [a.action_type for a in snapshot.actions] == [ActionType.START_GAME]
+
+# commit_turn: every change, no changes, a failing change
+def test_commit_turn(backend, game_strs):
+    db_ops.add_games_by_str(game_strs[:1], ["A2A2"])
+    gid, game = db_ops.get_game("A2A2")
+    session_id = db_ops.create_session("S2S2", 12, gid)
+    db_ops.new_player("S2S2", "Ada", True)
+    db_ops.new_player("S2S2", "Grace", False)
+    db_ops.create_theory(session_id, 1, "A", 5)
+
+    db_ops.commit_turn(session_id, None, None)
+    assert db_ops.get_session_snapshot("S2S2").current_sector == 0
+
+    turn_time = datetime(2021, 3, 4, 5, 6, 7)
+    start_action = db_ops.get_current_action(1)
+    db_ops.commit_turn(session_id, start_action.action_id, Turn(TurnType.SURVEY, "E", (1, 4), 1, turn_time),
+                       moves=[(1, 3), (2, 14)], advance_theories=True,
+                       new_actions=[Action(ActionType.PLAYER_TURN, 2)],
+                       status=(Action(ActionType.PLAYER_TURN, 2), 2, False))
+    snapshot = db_ops.get_session_snapshot("S2S2")
+    assert [(p.sector, p.arrival) for p in snapshot.players] == [(3, 1), (2, 1)]
+    assert [t.progress for t in snapshot.theories] == [1]
+    assert [(a.action_type, a.player_id) for a in snapshot.actions] == [(ActionType.PLAYER_TURN, 2)]
+    assert [t.code() for t in snapshot.turns] == []
+    assert (snapshot.action_type, snapshot.action_player, snapshot.current_sector, snapshot.first_rotation) == \
+        (ActionType.PLAYER_TURN, 2, 2, False)
+
+    # A move of a missing player undoes the rest of the turn
+    turn_action = db_ops.get_current_action(2)
+    with pytest.raises(Exception):
+        db_ops.commit_turn(session_id, turn_action.action_id, Turn(TurnType.TARGET, "", (4,), 2, turn_time),
+                           moves=[(1, 1), (1000, 1)], advance_theories=True)
+    assert db_ops.get_session_snapshot("S2S2").players[0].sector == 3
+    assert db_ops.get_session_snapshot("S2S2").theories[0].progress == 1
+    assert db_ops.get_current_action(2).action_id == turn_action.action_id
+
+# turns and theories since: nothing new, new rows, theories still advancing
+def test_turns_and_theories_since(backend, game_strs):
+    assert db_ops.migrate() == []
+    db_ops.add_games_by_str(game_strs[:1], ["A2A2"])
+    gid, game = db_ops.get_game("A2A2")
+    session_id = db_ops.create_session("S2S2", 12, gid)
+    other_id = db_ops.create_session("T2T2", 12, gid)
+    db_ops.new_player("S2S2", "Ada", False)
+    db_ops.new_player("T2T2", "Alan", False)
+    assert db_ops.get_turns_since(session_id, 0) == (0, [])
+    assert db_ops.get_theories_since(session_id, 0) == (0, [])
+
+    def play_turn(player_id, code):
+        db_ops.create_action(ActionType.PLAYER_TURN, player_id)
+        action_id = db_ops.get_current_action(player_id).action_id
+        db_ops.resolve_action(action_id, Turn.parse(player_id, datetime(2021, 3, 4), code))
+        return action_id
+
+    first_id = play_turn(1, "SE1,4")
+    play_turn(2, "T4")
+    second_id = play_turn(1, "RA")
+    last_id, turns = db_ops.get_turns_since(session_id, 0)
+    assert last_id == second_id and [t.code() for t in turns] == ["SE1,4", "RA"]
+    assert [t.code() for t in db_ops.get_turns_since(session_id, first_id)[1]] == ["RA"]
+    assert db_ops.get_turns_since(session_id, second_id) == (second_id, [])
+    assert [t.code() for t in db_ops.get_turns_since(session_id, 0)[1]] == [t.code() for t in db_ops.get_previous_turns(session_id)]
+
+    db_ops.create_theory(session_id, 1, "A", 5)
+    db_ops.create_theory(other_id, 2, "C", 2)
+    for i in range(4):
+        db_ops.advance_theories(session_id)
+    db_ops.create_theory(session_id, 1, "C", 7)
+    last_id, theories = db_ops.get_theories_since(session_id, 0)
+    assert [(t.theory_id, t.space_object, t.progress) for t in theories] == \
+        [(1, SpaceObject.Asteroid, 4), (3, SpaceObject.Comet, 0)]
+    # Finished theories are not fetched again, but advancing ones are
+    assert last_id == 3
+    assert [(t.theory_id, t.progress) for t in db_ops.get_theories_since(session_id, last_id)[1]] == [(3, 0)]
+    db_ops.advance_theories(session_id)
+    assert [(t.theory_id, t.progress) for t in db_ops.get_theories_since(session_id, last_id)[1]] == [(3, 1)]
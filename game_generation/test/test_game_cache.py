@@ -0,0 +1,60 @@
+from planetx_game.game_cache import GameCache
+
+# GameCache
+# Testing strategy:
+#     - partition: lookup: by id, by code
+#     - partition: result: hit, miss
+#     - partition: size: below max_size, at max_size (evicts), max_size 0
+#     - partition: adding a game that is already cached
+
+# Games are never inspected by the cache, so any object can stand in for a Game
+game1, game2, game3 = object(), object(), object()
+
+# lookup: by id, by code, result: hit, miss
+def test_game_cache_lookup():
+    cache = GameCache(max_size=4)
+    assert cache.get_by_id(1) is None
+    assert cache.get_by_code("A2B3") is None
+
+    assert cache.add(1, "A2B3", game1) is game1
+    assert cache.get_by_id(1) == ("A2B3", game1)
+    assert cache.get_by_code("A2B3") == (1, game1)
+    assert cache.get_by_id(2) is None
+    assert cache.stats() == {"hits": 2, "misses": 3, "size": 1, "max_size": 4}
+
+# size: at max_size, evicts the least recently used game
+def test_game_cache_evicts_least_recently_used():
+    cache = GameCache(max_size=2)
+    cache.add(1, "A2A2", game1)
+    cache.add(2, "B2B2", game2)
+    # Using game 1 makes game 2 the least recently used
+    assert cache.get_by_code("A2A2") == (1, game1)
+    cache.add(3, "C2C2", game3)
+    assert len(cache) == 2
+    assert cache.get_by_id(2) is None
+    assert cache.get_by_code("B2B2") is None
+    assert cache.get_by_id(1) == ("A2A2", game1)
+    assert cache.get_by_id(3) == ("C2C2", game3)
+
+# adding a game that is already cached returns the shared instance
+def test_game_cache_add_existing():
+    cache = GameCache()
+    assert cache.add(1, "A2A2", game1) is game1
+    assert cache.add(1, "A2A2", game2) is game1
+    assert len(cache) == 1
+
+# max_size 0
+def test_game_cache_disabled():
+    cache = GameCache(max_size=0)
+    assert cache.add(1, "A2A2", game1) is game1
+    assert len(cache) == 0
+    assert cache.get_by_id(1) is None
+
+def test_game_cache_clear():
+    cache = GameCache()
+    cache.add(1, "A2A2", game1)
+    cache.get_by_id(1)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get_by_code("A2A2") is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "size": 0, "max_size": 1024}
@@ -0,0 +1,93 @@
+from planetx_game.game_codes import *
+
+import re
+import pytest
+
+# code_to_int / int_to_code
+# Testing strategy:
+#     - partition: code length: 2, > 2
+#     - partition: integer: 0, middle, last code
+
+code_pattern = re.compile("^([A-HJ-NP-Z][2-9])*$")
+
+# code length: 2, integer: 0, middle, last code
+def test_game_code_round_trip_short():
+    assert int_to_code(0, 2) == "A2"
+    assert code_to_int("A2") == 0
+    codes = [int_to_code(i, 2) for i in range(num_game_codes(2))]
+    assert codes[-1] == "Z9"
+    assert len(set(codes)) == num_game_codes(2) == 192
+    assert all(code_pattern.match(code) for code in codes)
+    assert [code_to_int(code) for code in codes] == list(range(192))
+
+# code length > 2, integer: 0, middle, last code
+def test_game_code_round_trip_long():
+    assert int_to_code(0, 8) == "A2A2A2A2"
+    assert int_to_code(num_game_codes(8) - 1, 8) == "Z9Z9Z9Z9"
+    for i in [1, 12345, 987654321, num_game_codes(8) - 1]:
+        code = int_to_code(i, 8)
+        assert len(code) == 8 and code_pattern.match(code)
+        assert code_to_int(code) == i
+
+# GameCodeAllocator
+# Testing strategy:
+#     - partition: code length: 2, 4, 8
+#     - partition: codes allocated: some, all, more than remain
+#     - partition: state file: missing, saved, different code length
+
+# code length: 2, 4, codes allocated: all
+@pytest.mark.parametrize("code_length", [2, 4])
+def test_allocator_permutes_every_code(code_length):
+    allocator = GameCodeAllocator(code_length, key=1234)
+    codes = allocator.allocate(num_game_codes(code_length))
+    assert len(set(codes)) == num_game_codes(code_length)
+    assert all(len(code) == code_length and code_pattern.match(code) for code in codes)
+    assert allocator.remaining() == 0
+    # The codes are shuffled
+    assert codes != sorted(codes, key=code_to_int)
+
+# code length: 8, codes allocated: some
+def test_allocator_long_codes():
+    allocator = GameCodeAllocator(8, key=99)
+    codes = allocator.allocate(10000)
+    assert len(set(codes)) == 10000
+    assert all(len(code) == 8 and code_pattern.match(code) for code in codes)
+    assert allocator.cursor == 10000
+    assert allocator.remaining() == num_game_codes(8) - 10000
+
+# same key gives the same codes, different keys give different codes
+def test_allocator_key():
+    assert GameCodeAllocator(6, key=5).allocate(100) == GameCodeAllocator(6, key=5).allocate(100)
+    assert GameCodeAllocator(6, key=5).allocate(100) != GameCodeAllocator(6, key=6).allocate(100)
+    assert GameCodeAllocator(6).key != GameCodeAllocator(6).key
+
+# codes allocated: more than remain
+def test_allocator_exhausted():
+    allocator = GameCodeAllocator(2, key=0, cursor=190)
+    with pytest.raises(ValueError):
+        allocator.allocate(3)
+    assert allocator.cursor == 190
+    assert len(allocator.allocate(2)) == 2
+    with pytest.raises(IndexError):
+        allocator.code(192)
+
+# state file: missing, saved
+def test_allocator_save_load(tmp_path):
+    filename = str(tmp_path / "codes.json")
+    allocator = GameCodeAllocator.load(filename, 6)
+    assert allocator.cursor == 0
+    first = allocator.allocate(50)
+    allocator.save(filename)
+
+    resumed = GameCodeAllocator.load(filename, 6)
+    assert resumed.key == allocator.key and resumed.cursor == 50
+    rest = resumed.allocate(50)
+    assert rest == GameCodeAllocator(6, key=allocator.key).allocate(100)[50:]
+    assert not set(first) & set(rest)
+
+# state file: different code length
+def test_allocator_load_wrong_length(tmp_path):
+    filename = str(tmp_path / "codes.json")
+    GameCodeAllocator(6).save(filename)
+    with pytest.raises(ValueError):
+        GameCodeAllocator.load(filename, 8)
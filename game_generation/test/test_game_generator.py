@@ -0,0 +1,73 @@
+from game_generator import GameGenerator
+from planetx_game.board_type import twelve_type
+from planetx_game.board_file import BoardFileWriter
+from planetx_game.game import Game
+
+import json
+import pytest
+
+# GameGenerator.generate_games
+# Testing strategy:
+#     - partition: input: text board file, binary board file
+#     - partition: workers: None, > 1
+#     - partition: resume: no checkpoint, partial checkpoint
+
+boards = [twelve_type.unrank(i * 97) for i in range(40)]
+
+@pytest.fixture
+def board_filename(tmp_path):
+    filename = str(tmp_path / "boards.txt")
+    with open(filename, "w") as f:
+        for board in boards:
+            f.write(str(board) + "\n")
+    return filename
+
+def _generate(board_filename, output_filename, **kwargs):
+    GameGenerator.generate_games(twelve_type, board_filename, output_filename, seed=11, checkpoint_interval=10, **kwargs)
+    with open(output_filename, "r") as f:
+        return f.read().splitlines()
+
+# input: text board file, workers: None
+def test_generate_games(board_filename, tmp_path):
+    games = _generate(board_filename, str(tmp_path / "games.txt"))
+    assert 0 < len(games) <= len(boards)
+    parsed = [Game.parse(game) for game in games]
+    assert all(game.board in boards for game in parsed)
+    # Same seed, same games
+    assert _generate(board_filename, str(tmp_path / "again.txt")) == games
+    with open(str(tmp_path / "games.txt.checkpoint.json"), "r") as f:
+        checkpoint = json.load(f)
+    assert checkpoint["boards"] == len(boards) and checkpoint["games"] == len(games)
+
+# input: binary board file, workers > 1
+def test_generate_games_workers(board_filename, tmp_path):
+    binary_filename = str(tmp_path / "boards.bin")
+    with BoardFileWriter(binary_filename, 12) as writer:
+        for board in boards:
+            writer.write(board)
+    games = _generate(board_filename, str(tmp_path / "games.txt"))
+    assert _generate(binary_filename, str(tmp_path / "binary.txt")) == games
+    assert _generate(board_filename, str(tmp_path / "workers.txt"), workers=2, task_size=3) == games
+
+# resume: no checkpoint, partial checkpoint
+def test_generate_games_resume(board_filename, tmp_path):
+    games = _generate(board_filename, str(tmp_path / "games.txt"))
+
+    # Stop partway by only giving the first boards, then resume with all of them
+    partial_filename = str(tmp_path / "partial.txt")
+    with open(partial_filename, "w") as f:
+        for board in boards[:25]:
+            f.write(str(board) + "\n")
+    output_filename = str(tmp_path / "resumed.txt")
+    _generate(partial_filename, output_filename)
+    with open(output_filename + ".checkpoint.json", "r") as f:
+        checkpoint = json.load(f)
+    checkpoint["input_filename"] = str(tmp_path / "boards.txt")
+    with open(output_filename + ".checkpoint.json", "w") as f:
+        json.dump(checkpoint, f)
+    # Games written after the checkpoint are dropped and generated again
+    with open(output_filename, "a") as f:
+        f.write("partial game\n")
+
+    assert _generate(board_filename, output_filename, resume=True) == games
+    assert _generate(board_filename, str(tmp_path / "fresh.txt"), resume=True) == games
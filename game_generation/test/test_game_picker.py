@@ -0,0 +1,129 @@
+from planetx_game.game_picker import *
+from planetx_game.permutation import KeyedPermutation
+
+import random
+import collections
+import pytest
+
+# KeyedPermutation
+# Testing strategy:
+#     - partition: n: 1, power of 4, not a power of 4
+#     - partition: index: in range, out of range
+
+@pytest.mark.parametrize("n", [1, 16, 1000])
+def test_keyed_permutation(n):
+    permutation = KeyedPermutation(n, 42)
+    assert len(permutation) == n
+    assert sorted(permutation[i] for i in range(n)) == list(range(n))
+    with pytest.raises(IndexError):
+        permutation[n]
+
+# GameIdRanges
+# Testing strategy:
+#     - partition: ids: none, one run, several runs, added in batches
+#     - partition: index: first, last, inside a run, at the start of a run, out of range
+
+def test_game_id_ranges_empty():
+    ids = GameIdRanges([])
+    assert len(ids) == 0
+    with pytest.raises(IndexError):
+        ids[0]
+
+def test_game_id_ranges_runs():
+    id_list = [3, 4, 5, 6, 10, 20, 21, 22]
+    ids = GameIdRanges(id_list)
+    assert len(ids) == len(id_list)
+    assert ids.starts == [3, 10, 20]
+    assert [ids[i] for i in range(len(ids))] == id_list
+    with pytest.raises(IndexError):
+        ids[len(id_list)]
+    with pytest.raises(IndexError):
+        ids[-1]
+
+def test_game_id_ranges_one_run():
+    ids = GameIdRanges(range(100, 200))
+    assert ids.starts == [100]
+    assert ids[0] == 100 and ids[57] == 157 and ids[99] == 199
+
+def test_game_id_ranges_extend():
+    ids = GameIdRanges()
+    ids.extend([3, 4])
+    ids.extend([5, 10])
+    ids.extend([])
+    assert ids.starts == [3, 10]
+    assert [ids[i] for i in range(len(ids))] == [3, 4, 5, 10]
+
+# GamePicker
+# Testing strategy:
+#     - partition: games of the size: none, some
+#     - partition: pick, deal
+#     - partition: ids: loaded, cached, invalidated, too old, set by the caller
+
+class IdLoader:
+    """
+    Stands in for the database, counting the number of times ids are loaded
+    """
+    def __init__(self, ids_by_size):
+        self.ids_by_size = ids_by_size
+        self.loads = 0
+
+    def __call__(self, board_size):
+        self.loads += 1
+        return iter(self.ids_by_size.get(board_size, []))
+
+# games of the size: none
+def test_game_picker_no_games():
+    picker = GamePicker(IdLoader({}))
+    assert picker.count(12) == 0
+    assert picker.pick(12) is None
+    assert picker.deal(12) is None
+
+# pick, ids: loaded, cached
+def test_game_picker_pick_uniform():
+    ids = list(range(1, 6)) + list(range(100, 105))
+    loader = IdLoader({12: ids, 18: [50]})
+    picker = GamePicker(loader, rng=random.Random(0))
+    counts = collections.Counter(picker.pick(12) for i in range(10000))
+    assert set(counts) == set(ids)
+    # Each game is picked about 1000 times, regardless of the gap in ids
+    assert all(800 < count < 1200 for count in counts.values())
+    assert picker.pick(18) == 50
+    assert loader.loads == 2
+
+# deal
+def test_game_picker_deal_no_repeats():
+    ids = [2, 3, 5, 7, 11, 13, 17]
+    picker = GamePicker(IdLoader({24: ids}), rng=random.Random(1))
+    first_deck = [picker.deal(24) for i in range(len(ids))]
+    second_deck = [picker.deal(24) for i in range(len(ids))]
+    assert sorted(first_deck) == ids
+    assert sorted(second_deck) == ids
+
+# ids: invalidated, too old
+def test_game_picker_reload():
+    loader = IdLoader({12: [1, 2, 3]})
+    picker = GamePicker(loader)
+    assert picker.count(12) == 3
+    loader.ids_by_size[12] = [1, 2, 3, 4]
+    assert picker.count(12) == 3
+    picker.invalidate(12)
+    assert picker.count(12) == 4
+    assert loader.loads == 2
+
+    picker.max_age = 0
+    loader.ids_by_size[12] = [1]
+    assert picker.count(12) == 1
+    assert loader.loads == 3
+
+# ids: set by the caller
+def test_game_picker_set_ids():
+    loader = IdLoader({12: [1, 2, 3]})
+    picker = GamePicker(loader)
+    assert not picker.has_ids(12)
+    picker.set_ids(12, GameIdRanges([7, 8]))
+    assert picker.has_ids(12)
+    assert picker.pick(12) in [7, 8] and picker.count(12) == 2
+    assert loader.loads == 0
+
+    picker.invalidate(12)
+    assert not picker.has_ids(12)
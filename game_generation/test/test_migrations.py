@@ -0,0 +1,166 @@
+import planetx_game.db_ops as db_ops
+from planetx_game import migrations
+from planetx_game.migrations.index_check import check_indexes
+from planetx_game.db_backends import SQLiteBackend, _SQLiteConnection
+from planetx_game.game import Game
+from planetx_game.board_type import twelve_type
+from planetx_game.session import *
+
+from datetime import datetime
+import sqlite3
+import pytest
+
+# migrations.migrate
+# Testing strategy:
+#     - partition: database: empty, migrated partway, up to date, made by the old SQLite schema
+#     - partition: tables: used by db_ops, used by node_server
+#     - partition: target: None, older than the database, newer than the latest version
+# migrations.index_check.check_indexes
+# Testing strategy:
+#     - partition: statements: every db_ops query, a query without an index, after an index is dropped
+
+def _tables_and_indexes(cxn):
+    cursor = cxn.cursor()
+    cursor.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name")
+    return cursor.fetchall()
+
+class FakeBackend:
+    name = "sqlite"
+
+    def execute_ddl(self, cursor, statement):
+        cursor.execute(statement)
+
+# database: empty, migrated partway, up to date, target: None, older, newer
+def test_migrate(tmp_path):
+    cxn = _SQLiteConnection(sqlite3.connect(str(tmp_path / "planetx.db")))
+    cursor = cxn.cursor()
+    assert migrations.schema_version(cursor) == 0
+
+    assert migrations.migrate(FakeBackend(), cxn, target=1) == [1]
+    assert migrations.schema_version(cursor) == 1
+    assert ("index", "games_board_size") not in _tables_and_indexes(cxn)
+    assert migrations.migrate(FakeBackend(), cxn, target=1) == []
+
+    assert migrations.migrate(FakeBackend(), cxn) == [2]
+    assert migrations.schema_version(cursor) == migrations.latest_version() == 2
+    assert ("index", "games_board_size") in _tables_and_indexes(cxn)
+    assert migrations.migrate(FakeBackend(), cxn) == []
+    assert migrations.migrate(FakeBackend(), cxn, target=1) == []
+    with pytest.raises(ValueError):
+        migrations.migrate(FakeBackend(), cxn, target=3)
+
+    cursor.execute("SELECT version, description FROM schema_migrations ORDER BY version")
+    assert cursor.fetchall() == [(1, migrations.MIGRATIONS[0].description), (2, migrations.MIGRATIONS[1].description)]
+
+# database: made by the old SQLite schema
+def test_migrate_old_schema(tmp_path):
+    # The tables were made before schema_migrations was kept
+    raw = sqlite3.connect(str(tmp_path / "planetx.db"))
+    raw.executescript(";".join(migrations.m0001_schema.sqlite))
+    raw.execute("INSERT INTO games (game_code, board_size, board_objects, research, conference, starting_information) "
+                "VALUES ('A2A2', 12, '', '', '', '')")
+    raw.commit()
+
+    backend = SQLiteBackend(str(tmp_path / "planetx.db"))
+    cxn = backend.connect()
+    names = [name for kind, name in _tables_and_indexes(cxn)]
+    assert "players_session_sector" in names and "actions_player_resolved" in names
+    cursor = cxn.cursor()
+    assert migrations.schema_version(cursor) == migrations.latest_version()
+    cursor.execute("SELECT game_code FROM games")
+    assert cursor.fetchall() == [("A2A2",)]
+
+# the tables and columns used by node_server
+def test_schema_node_server(tmp_path):
+    cursor = SQLiteBackend(str(tmp_path / "planetx.db")).connect().cursor()
+    cursor.execute("SELECT version FROM versions WHERE name = 'game'")
+    assert cursor.fetchall() == [(1,)]
+    columns = {}
+    for table in ["sessions", "players", "theories", "actions", "kickvotes"]:
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns[table] = [row[1] for row in cursor.fetchall()]
+    assert "current_turn" in columns["sessions"]
+    assert {"color", "kicked", "connected"} <= set(columns["players"])
+    assert {"accurate", "frozen", "turn"} <= set(columns["theories"])
+    assert "turn" in columns["actions"]
+    assert columns["kickvotes"] == ["kick_player", "vote_player", "vote"]
+
+@pytest.fixture(scope="module")
+def game_strs():
+    games = []
+    i = 0
+    while len(games) < 3:
+        game = Game.generate_from_board(twelve_type.unrank(i * 131), twelve_type)
+        if game is not None:
+            games.append(game.code())
+        i += 1
+    return games
+
+def _run_every_query(game_strs, tmp_path):
+    """
+    Runs every db_ops operation which executes a query
+    """
+    db_ops.add_game(Game.parse(game_strs[0]), "A2A2")
+    db_ops.add_games([Game.parse(game_strs[1])], ["B2B2"])
+    db_ops.add_games_by_str(game_strs[2:], ["C2C2"])
+    db_ops.bulk_add_games_by_str([(game_strs[:1], ["D2D2"])])
+    db_ops.load_games_by_str([(game_strs[1:2], ["E2E2"])], str(tmp_path / "games.tsv"))
+    gid, game_code, game = db_ops.pick_game(12)
+    db_ops.game_cache.clear()
+    db_ops.get_game_by_id(gid)
+    db_ops.game_cache.clear()
+    db_ops.get_game("A2A2")
+    db_ops.get_game_codes()
+    db_ops.get_existing_game_codes(["A2A2", "Z2Z2"])
+
+    session_id = db_ops.create_session("S2S2", 12, gid)
+    db_ops.get_session_codes()
+    db_ops.get_session_by_code("S2S2")
+    db_ops.get_session_by_id(session_id)
+    db_ops.new_player("S2S2", "Ada", True)
+    db_ops.new_player("S2S2", "Grace", False)
+    db_ops.get_players_for_session(session_id)
+    db_ops.get_players_for_session_code("S2S2")
+    db_ops.move_player(2, 1, 1)
+    db_ops.advance_player(1, 3)
+
+    db_ops.create_theory(session_id, 1, "A", 5)
+    db_ops.advance_theories(session_id)
+    db_ops.get_theories_for_session(session_id)
+    db_ops.get_theories_for_player_session(1)
+    db_ops.get_theories_since(session_id, 0)
+
+    db_ops.resolve_action(db_ops.get_current_action(1).action_id, None)
+    db_ops.create_action(ActionType.PLAYER_TURN, 2)
+    db_ops.get_current_actions_for_session(session_id)
+    db_ops.commit_turn(session_id, db_ops.get_current_action(2).action_id, Turn(TurnType.SURVEY, "E", (1, 4), 2, datetime.now()),
+                       moves=[(2, 2)], advance_theories=True, new_actions=[Action(ActionType.PLAYER_TURN, 1)],
+                       status=(Action(ActionType.PLAYER_TURN, 1), 1, False))
+    db_ops.set_current_action(session_id, Action(ActionType.PLAYER_TURN, 1))
+    db_ops.get_previous_turns(session_id)
+    db_ops.get_turns_since(session_id, 0)
+    db_ops.get_session_snapshot("S2S2")
+    db_ops.clear_games()
+
+# statements: every db_ops query, a query without an index, after an index is dropped
+def test_queries_use_indexes(game_strs, tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "planetx.db"))
+    db_ops.set_backend(backend)
+    try:
+        with db_ops.record_statements() as statements:
+            _run_every_query(game_strs, tmp_path)
+        assert len(statements) > 30
+        # The statements allowed to scan whole tables are ones which actually run
+        assert ("DELETE FROM sqlite_sequence WHERE name = %s", ("games",)) in statements
+
+        with db_ops.checkout() as cxn:
+            assert check_indexes(backend, cxn, statements) == []
+
+            unindexed = "SELECT * FROM players WHERE name = %s"
+            assert check_indexes(backend, cxn, [(unindexed, ("Ada",))]) == [(unindexed, ["players"])]
+
+            cxn.cursor().execute("DROP INDEX actions_player_resolved")
+            failures = check_indexes(backend, cxn, statements)
+            assert len(failures) > 0 and all("actions" in query for query, tables in failures)
+    finally:
+        db_ops.set_backend(None)
@@ -0,0 +1,121 @@
+import planetx_game.db_ops as db_ops
+import planetx_game.aio_db as aio_db
+from planetx_game.db_backends import SQLiteBackend
+from planetx_game.game import Game
+from planetx_game.board_type import twelve_type
+from planetx_game.session import *
+
+from datetime import datetime
+import asyncio
+import pytest
+
+# The session operations, run through db_ops and through aio_db with the SQLite backend
+# Testing strategy:
+#     - partition: api: sync, async
+#     - partition: session: missing, new, with players, theories and turns
+#     - partition: game pick: no games, some games
+#     - partition: async calls: one at a time, many at once on a file or in-memory database
+
+pytest.importorskip("aiosqlite")
+
+async def _call_and_close(function, *args, **kwargs):
+    try:
+        return await function(*args, **kwargs)
+    finally:
+        await aio_db.close()
+
+class AsyncOps:
+    """
+    Calls the aio_db version of each function, with the same arguments and results as db_ops,
+    in an event loop of its own
+    """
+    def __getattr__(self, name):
+        function = getattr(aio_db, name)
+        return lambda *args, **kwargs: asyncio.run(_call_and_close(function, *args, **kwargs))
+
+@pytest.fixture(params=["sync", "async"])
+def ops(request, tmp_path):
+    db_ops.set_backend(SQLiteBackend(str(tmp_path / "planetx.db")))
+    yield db_ops if request.param == "sync" else AsyncOps()
+    db_ops.set_backend(None)
+
+@pytest.fixture(scope="module")
+def game_strs():
+    games = []
+    i = 0
+    while len(games) < 2:
+        game = Game.generate_from_board(twelve_type.unrank(i * 131), twelve_type)
+        if game is not None:
+            games.append(game.code())
+        i += 1
+    return games
+
+def _new_session(game_strs):
+    db_ops.add_games_by_str(game_strs, ["A2A2", "B2B2"])
+    gid, game = db_ops.get_game("A2A2")
+    return db_ops.create_session("S2S2", 12, gid), gid
+
+# api: sync, async, game pick: no games, some games
+def test_pick_game(ops, game_strs):
+    assert ops.pick_game(12) is None
+    db_ops.add_games_by_str(game_strs, ["A2A2", "B2B2"])
+    gid, game_code, game = ops.pick_game(12)
+    assert game_code in ["A2A2", "B2B2"] and db_ops.get_game(game_code) == (gid, game)
+    assert sorted(ops.pick_game(12, True)[1] for i in range(2)) == ["A2A2", "B2B2"]
+
+# api: sync, async, session: missing, new, with players, theories and turns
+def test_session_operations(ops, game_strs):
+    assert ops.get_session_snapshot("S2S2") is None
+    session_id, gid = _new_session(game_strs)
+    assert ops.get_session_by_code("S2S2") == (session_id, "S2S2", 12, gid, True, 0, None, None)
+    assert ops.get_players_for_session(session_id) == [] and ops.get_previous_turns(session_id) == []
+
+    assert ops.new_player("S2S2", "Ada", True) == (session_id, 1, 1)
+    assert ops.new_player("S2S2", "Grace", False) == (session_id, 2, 2)
+    assert [(p.num, p.name) for p in ops.get_players_for_session(session_id)] == [(1, "Ada"), (2, "Grace")]
+
+    ops.create_theory(session_id, 1, "A", 5)
+    start_action = db_ops.get_current_action(1)
+    ops.resolve_action(start_action.action_id, None)
+    assert db_ops.get_current_action(1) is None
+
+    db_ops.create_action(ActionType.PLAYER_TURN, 2)
+    turn_time = datetime(2021, 3, 4, 5, 6, 7)
+    ops.commit_turn(session_id, db_ops.get_current_action(2).action_id, Turn(TurnType.SURVEY, "E", (1, 4), 2, turn_time),
+                    moves=[(2, 3)], advance_theories=True, status=(Action(ActionType.PLAYER_TURN, 1), 1, False))
+    assert [(t.player_id, t.turn_time, t.code()) for t in ops.get_previous_turns(session_id)] == [(2, turn_time, "SE1,4")]
+
+    snapshot = ops.get_session_snapshot("S2S2")
+    assert [(p.name, p.sector) for p in snapshot.players] == [("Ada", 0), ("Grace", 3)]
+    assert [(t.space_object, t.progress) for t in snapshot.theories] == [(SpaceObject.Asteroid, 1)]
+    assert (snapshot.action_type, snapshot.action_player, snapshot.current_sector) == (ActionType.PLAYER_TURN, 1, 1)
+
+# api: async, async calls: many at once on a file or in-memory database
+@pytest.mark.parametrize("in_memory", [False, True])
+def test_concurrent_async_calls(game_strs, tmp_path, in_memory):
+    db_ops.set_backend(SQLiteBackend(":memory:" if in_memory else str(tmp_path / "planetx.db")))
+    try:
+        db_ops.add_games_by_str(game_strs, ["A2A2", "B2B2"])
+        gid, game = db_ops.get_game("A2A2")
+        session_codes = ["S" + str(i) for i in range(20)]
+        for session_code in session_codes:
+            db_ops.create_session(session_code, 12, gid)
+
+        async def play():
+            await asyncio.gather(*[aio_db.new_player(session_code, "Player " + str(i), i == 0)
+                                   for session_code in session_codes for i in range(5)])
+            results = await asyncio.gather(*[aio_db.get_session_snapshot(session_code) for session_code in session_codes]
+                                           + [aio_db.pick_game(12) for i in range(50)])
+            stats = aio_db.connection_pool().stats()
+            await aio_db.close()
+            return results, stats
+
+        results, stats = asyncio.run(play())
+        snapshots, picks = results[:len(session_codes)], results[len(session_codes):]
+        assert all(sorted(p.num for p in snapshot.players) == [1, 2, 3, 4, 5] for snapshot in snapshots)
+        assert all(game_code in ["A2A2", "B2B2"] for gid, game_code, game in picks)
+        # Every call waited for one of the pool's connections, rather than opening its own
+        assert stats["in_use"] == 0 and stats["checkouts"] >= 170
+        assert stats["opened"] == stats["idle"] <= stats["size"] == (1 if in_memory else aio_db.DEFAULT_POOL_SIZE)
+    finally:
+        db_ops.set_backend(None)
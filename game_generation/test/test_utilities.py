@@ -942,6 +942,11 @@ def test_fill_no_within_many_on_invalid():
 def test_fill_no_within_many_no_solutions():
     compare_unordered_list_of_lists(
         list(fill_no_within({"A": 1, "B": 1, "C": 1}, ["F", None, None, None, "D", None, None, None, "E"], 2)), [])
+
+# keys = 1, board contains objects not in counts, max = 1, no empty sectors left over
+def test_fill_no_within_one_fills_board():
+    compare_unordered_list_of_lists(
+        list(fill_no_within({"A": 1}, [None, "B", "C"], 2)), [["A", "B", "C"]])
     
     
 # fill_no_self_touch
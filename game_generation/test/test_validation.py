@@ -0,0 +1,91 @@
+from planetx_game.board_type import *
+
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+from planetx_game.validation import *
+from planetx_game.board_file import BoardFileWriter, BoardFileReader
+
+# constraint_violations
+# Testing strategy:
+#     - partition: constraint: sectors, adjacent self, adjacent, band
+#     - partition: qualifier: none, at least one, every
+#     - partition: precision: strict, within
+
+constraints = [CometRule(12),
+               AdjacentSelfRule(SpaceObject.Asteroid, RuleQualifier.NONE),
+               AdjacentSelfRule(SpaceObject.Asteroid, RuleQualifier.AT_LEAST_ONE),
+               AdjacentSelfRule(SpaceObject.Asteroid, RuleQualifier.EVERY),
+               AdjacentRule(SpaceObject.GasCloud, SpaceObject.Empty, RuleQualifier.NONE),
+               AdjacentRule(SpaceObject.GasCloud, SpaceObject.Empty, RuleQualifier.AT_LEAST_ONE),
+               AdjacentRule(SpaceObject.GasCloud, SpaceObject.Empty, RuleQualifier.EVERY),
+               BandRule(SpaceObject.Asteroid, 6, Precision.STRICT),
+               BandRule(SpaceObject.Asteroid, 6, Precision.WITHIN)]
+
+def _random_boards(num_boards):
+    rng = random.Random(0)
+    objects = twelve_type._list_objects(twelve_type.num_objects)
+    boards = []
+    for i in range(num_boards):
+        rng.shuffle(objects)
+        boards.append(Board(objects.copy()))
+    return boards
+
+def _array(boards):
+    return np.array([[list(SpaceObject).index(obj) + 1 for obj in board] for board in boards], dtype=np.int8)
+
+@pytest.mark.parametrize("constraint", constraints, ids=str)
+def test_constraint_violations_matches_rule(constraint):
+    boards = _random_boards(500)
+    expected = [not constraint.is_satisfied(board) for board in boards]
+    assert list(constraint_violations(constraint, _array(boards))) == expected
+    
+# validate_boards / validate_board_file
+# Testing strategy:
+#     - partition: boards: all valid, some invalid, duplicated
+#     - partition: file: text, binary, binary whose writer was not closed
+
+# boards: all valid, file: text
+def test_validate_board_file_text(tmp_path):
+    filename = str(tmp_path / "boards.txt")
+    twelve_type.generate_boards_to_file(filename)
+    report = validate_board_file(twelve_type, filename)
+    assert report.is_valid()
+    assert report.num_boards == twelve_type.count_boards()
+    
+# boards: all valid, file: binary
+def test_validate_board_file_binary(tmp_path):
+    text_filename = str(tmp_path / "boards.txt")
+    binary_filename = str(tmp_path / "boards.bin")
+    twelve_type.generate_boards_to_file(text_filename)
+    twelve_type.generate_boards_to_file(binary_filename, binary=True)
+    assert np.array_equal(load_boards(text_filename, 12), load_boards(binary_filename, 12))
+    assert validate_board_file(twelve_type, binary_filename).is_valid()
+    
+# file: binary whose writer was not closed
+def test_validate_board_file_not_closed(tmp_path):
+    filename = str(tmp_path / "boards.bin")
+    boards = twelve_type.generate_all_boards()[:3]
+    writer = BoardFileWriter(filename, 12)
+    try:
+        for board in boards:
+            writer.write(board)
+        writer.file.flush()
+        with BoardFileReader(filename) as reader:
+            assert len(reader) == len(load_boards(filename, 12)) == 3
+        assert validate_board_file(twelve_type, filename).num_boards == 3
+    finally:
+        writer.file.close()
+
+# boards: some invalid, duplicated
+def test_validate_boards_invalid():
+    valid = twelve_type.generate_random_board(random.Random(0))
+    boards = [valid, Board.parse("AAAACCXEEGGD"), Board.parse("AAAACCXEEGGG"), valid]
+    report = validate_boards(twelve_type, _array(boards))
+    assert not report.is_valid()
+    assert list(report.wrong_objects) == [2]
+    assert list(report.duplicates) == [3]
+    for constraint, indices in report.violations:
+        assert 0 not in indices and 3 not in indices
+        assert (1 in indices) == (not constraint.is_satisfied(boards[1]))
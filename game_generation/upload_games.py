@@ -6,13 +6,18 @@ from game_generator import GameGenerator
 parser = argparse.ArgumentParser(description="Uploadd Planet X games to the database.")
 parser.add_argument("-i", "--input", type=str, help="The input file containing one board per line", required=True)
 parser.add_argument("-l", "--code-length", type=int, help="The length of the game codes", required=True)
-parser.add_argument("-c", "--chunk-size", default=float('inf'), type=int, help="The number of boards to upload at one time", required=False)
+parser.add_argument("-c", "--chunk-size", default=10000, type=int, help="The number of games to upload at one time (default: 10000)", required=False)
+parser.add_argument("--code-state", type=str, help="The file keeping the game code allocator's key and cursor (default: game_codes_<length>.json next to the database credentials)", required=False)
+parser.add_argument("-m", "--mode", choices=["insert", "multirow", "load"], default="insert", help="insert: add each chunk in its own transaction; multirow: add every game in one transaction of multi-row INSERTs; load: bulk load a tab separated file, with LOAD DATA LOCAL INFILE on MySQL (default: insert)", required=False)
+parser.add_argument("--rows-per-insert", type=int, default=1000, help="With --mode multirow, the number of games in each INSERT statement (default: 1000)", required=False)
 
 if __name__ == "__main__":
     args = parser.parse_args(sys.argv[1:])    
     print(args)
     
     try:
-        GameGenerator.add_to_database(args.input, args.code_length, chunk_size=args.chunk_size)
+        GameGenerator.add_to_database(args.input, args.code_length, chunk_size=args.chunk_size,
+                                      code_state_filename=args.code_state, mode=args.mode,
+                                      rows_per_insert=args.rows_per_insert)
     except Exception as e:
         print(e)
\ No newline at end of file
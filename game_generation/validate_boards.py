@@ -0,0 +1,25 @@
+import sys 
+import time
+import argparse
+
+from planetx_game.board_type import *
+from planetx_game.validation import validate_board_file
+
+parser = argparse.ArgumentParser(description="Check that a file of Planet X boards are valid boards of a specific size.")
+parser.add_argument("sectors", type=int, help="The number of sectors on the boards")
+parser.add_argument("-i", "--input", type=str, help="The board file to check, either binary or with one board per line", required=True)
+
+if __name__ == "__main__":
+    args = parser.parse_args(sys.argv[1:])
+    try:
+        board_type = sector_types[args.sectors]
+        start = time.time()
+        report = validate_board_file(board_type, args.input)
+        elapsed = time.time() - start
+        print(report)
+        print("Checked in " + str(round(elapsed, 2)) + "s (" + str(round(report.num_boards / max(elapsed, 1e-9))) + " boards/s)")
+        if not report.is_valid():
+            sys.exit(1)
+    except Exception as e:
+        print(e)
+        sys.exit(1)